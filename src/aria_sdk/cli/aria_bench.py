@@ -6,15 +6,19 @@ Run performance benchmarks.
 """
 
 import asyncio
+import json
 import time
 import click
 import numpy as np
-from datetime import datetime, timezone
-from uuid import uuid4
+from datetime import datetime, timedelta, timezone
 
-from aria_sdk.domain.entities import Envelope, RawSample, ImageData, Priority
-from aria_sdk.telemetry.codec import AriaCodec
-from aria_sdk.telemetry.compression import create_compressor
+from aria_sdk.domain.entities import Envelope, Priority
+from aria_sdk.telemetry.codec import ProtobufCodec
+from aria_sdk.telemetry.proto_codec import ProtoSchemaCodec
+from aria_sdk.telemetry.meda_adapter import MedaReading, MedaSensorType, MedaToEnvelopeConverter
+from aria_sdk.telemetry.compression import (
+    ZstdCompressor, StreamCompressor, StreamDecompressor, ParallelCompressor, get_compressor
+)
 from aria_sdk.telemetry.delta import AdaptiveDeltaCodec
 from aria_sdk.telemetry.fec import ReedSolomonFEC
 from aria_sdk.telemetry.crypto import CryptoBox
@@ -34,13 +38,16 @@ def codec(count: int, width: int, height: int):
     """Benchmark codec encode/decode."""
     click.echo(f"🏁 Codec Benchmark: {count} envelopes ({width}x{height})")
     
-    codec_obj = AriaCodec()
+    codec_obj = ProtobufCodec()
     
     # Create test envelope
     image = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
-    image_data = ImageData(data=image, width=width, height=height, channels=3, format="rgb8")
-    sample = RawSample(id=uuid4(), timestamp=datetime.now(timezone.utc), sensor_id="bench", data=image_data)
-    envelope = Envelope(id=uuid4(), timestamp=datetime.now(timezone.utc), robot_id="bench", priority=Priority.HIGH, payload=sample, metadata={})
+    envelope = Envelope.create(
+        topic="bench/camera/rgb8",
+        payload=image.tobytes(),
+        priority=Priority.P2,
+        source_node="bench",
+    )
     
     # Encode benchmark
     start = time.perf_counter()
@@ -68,17 +75,101 @@ def codec(count: int, width: int, height: int):
     click.echo(f"  Avg size: {avg_size:,.0f} bytes")
 
 
+def _meda_envelopes(count: int) -> list:
+    """Synthetic MEDA pressure envelopes (4-byte float payloads)."""
+    converter = MedaToEnvelopeConverter()
+    start = datetime(2021, 6, 9, tzinfo=timezone.utc)
+    pressure = 730.0 + np.cumsum(np.random.normal(0, 0.05, count))
+    readings = [
+        MedaReading(
+            sol=100,
+            lmst="00:00:00",
+            utc=start + timedelta(seconds=i),
+            sensor_type=MedaSensorType.PRESSURE,
+            value=float(value),
+            unit="Pa",
+        )
+        for i, value in enumerate(pressure)
+    ]
+    return converter.batch_convert(readings)
+
+
+def _detection_envelopes(count: int) -> list:
+    """Synthetic detection envelopes (JSON payloads, as in full_system_demo)."""
+    classes = ["rock", "crater", "dust_devil", "rover_track"]
+    envelopes = []
+    for i in range(count):
+        class_id = i % len(classes)
+        payload = json.dumps({
+            'class_id': class_id,
+            'class_name': classes[class_id],
+            'confidence': round(float(np.random.uniform(0.5, 1.0)), 4),
+            'bbox': [round(float(v), 1) for v in np.random.uniform(0, 640, 4)],
+        }).encode('utf-8')
+        envelopes.append(Envelope.create(
+            topic=f"perception/detection/{classes[class_id]}",
+            payload=payload,
+            priority=Priority.P2,
+            source_node="vision_system",
+            sequence_number=i,
+        ))
+    return envelopes
+
+
+@cli.command()
+@click.option('--count', '-n', default=10_000, help='Number of envelopes per workload')
+def formats(count: int):
+    """Compare ProtobufCodec and ProtoSchemaCodec (throughput and wire size)."""
+    click.echo(f"🏁 Wire Format Benchmark: {count:,} envelopes per workload")
+    
+    workloads = {
+        'meda': _meda_envelopes(count),
+        'detection': _detection_envelopes(count),
+    }
+    codecs = {
+        'ProtobufCodec': ProtobufCodec(),
+        'ProtoSchemaCodec': ProtoSchemaCodec(),
+    }
+    
+    click.echo(f"\n📊 Results:")
+    click.echo(f"  {'Workload':<10} {'Codec':<17} {'Encode msg/s':>13} "
+               f"{'Decode msg/s':>13} {'Avg size':>9}")
+    for workload, envelopes in workloads.items():
+        for name, codec_obj in codecs.items():
+            start = time.perf_counter()
+            encoded = [codec_obj.encode(env) for env in envelopes]
+            encode_time = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            decoded = [codec_obj.decode(data) for data in encoded]
+            decode_time = time.perf_counter() - start
+            
+            # Verify
+            assert all(d.payload == e.payload for d, e in zip(decoded, envelopes))
+            
+            avg_size = sum(len(data) for data in encoded) / len(encoded)
+            click.echo(
+                f"  {workload:<10} {name:<17} {count / encode_time:>13,.0f} "
+                f"{count / decode_time:>13,.0f} {avg_size:>7,.1f} B"
+            )
+
+
 @cli.command()
 @click.option('--size', '-s', default=1_000_000, help='Data size (bytes)')
 @click.option('--algorithm', '-a', type=click.Choice(['lz4', 'zstd']), default='lz4', help='Algorithm')
-def compression(size: int, algorithm: str):
+@click.option('--workers', type=int, default=None,
+              help='Compress 1 MB blocks on N threads (ParallelCompressor)')
+def compression(size: int, algorithm: str, workers: int):
     """Benchmark compression."""
     click.echo(f"🏁 Compression Benchmark: {size:,} bytes ({algorithm})")
     
     # Generate test data
     data = np.random.randint(0, 255, size, dtype=np.uint8).tobytes()
     
-    compressor = create_compressor(algorithm)
+    if workers:
+        compressor = ParallelCompressor(algorithm, workers=workers)
+    else:
+        compressor = get_compressor(algorithm)
     
     # Compress
     start = time.perf_counter()
@@ -106,47 +197,134 @@ def compression(size: int, algorithm: str):
     click.echo(f"  Decompress: {decompress_throughput:.1f} MB/s")
 
 
+@cli.command()
+@click.option('--count', '-n', default=10_000, help='Number of envelopes')
+@click.option('--key-interval', default=None, type=int, help='Key chunk every N envelopes')
+def stream(count: int, key_interval: int):
+    """Benchmark per-envelope vs streaming (window-keeping) compression."""
+    click.echo(f"🏁 Stream Compression Benchmark: {count} MEDA envelopes")
+    
+    codec_obj = ProtobufCodec()
+    messages = [codec_obj.encode(env) for env in _meda_envelopes(count)]
+    raw_size = sum(len(msg) for msg in messages)
+    
+    click.echo(f"\n📊 Results ({raw_size / count:.0f} B/envelope encoded):")
+    for algo in ('lz4', 'zstd'):
+        independent = get_compressor(algo)
+        start = time.perf_counter()
+        separate_size = sum(len(independent.compress(msg)) for msg in messages)
+        separate_time = time.perf_counter() - start
+        
+        tx, rx = StreamCompressor(algo, key_interval=key_interval), StreamDecompressor()
+        start = time.perf_counter()
+        chunks = [tx.compress(msg) for msg in messages]
+        stream_time = time.perf_counter() - start
+        assert all(rx.decompress(c) == m for c, m in zip(chunks, messages))
+        stream_size = sum(len(c) for c in chunks)
+        
+        click.echo(
+            f"  {algo:<5} per-envelope {raw_size / separate_size:5.2f}x "
+            f"({count / separate_time:>9,.0f} msg/s)   "
+            f"stream {raw_size / stream_size:5.2f}x ({count / stream_time:>9,.0f} msg/s)"
+        )
+
+
+@cli.command('zstd-dict')
+@click.option('--count', '-n', default=2000, help='Envelopes in the training and test sets')
+@click.option('--dict-size', default=16 * 1024, help='Maximum dictionary size (bytes)')
+@click.option('--save-dir', type=click.Path(), help='Save the trained dictionary here')
+def zstd_dict(count: int, dict_size: int, save_dir: str):
+    """Benchmark per-envelope Zstd with a trained dictionary."""
+    click.echo(f"🏁 Zstd Dictionary Benchmark: {count} detection envelopes")
+    
+    codec_obj = ProtobufCodec()
+    training = [codec_obj.encode(env) for env in _detection_envelopes(count)]
+    messages = [codec_obj.encode(env) for env in _detection_envelopes(count)]
+    
+    start = time.perf_counter()
+    dictionary = ZstdCompressor.train_dictionary(training, dict_size=dict_size)
+    train_time = time.perf_counter() - start
+    
+    compressors = {
+        'none': ZstdCompressor(),
+        'trained': ZstdCompressor(dictionary=dictionary),
+    }
+    raw_size = sum(len(msg) for msg in messages)
+    
+    click.echo(f"\n📊 Results (dictionary {dictionary.dict_id()}, "
+               f"{len(dictionary.as_bytes()):,} bytes, trained in {train_time*1000:.0f} ms):")
+    for name, compressor in compressors.items():
+        start = time.perf_counter()
+        compressed = [compressor.compress(msg) for msg in messages]
+        compress_time = time.perf_counter() - start
+        
+        assert all(compressor.decompress(c) == m for c, m in zip(compressed, messages))
+        
+        compressed_size = sum(len(c) for c in compressed)
+        click.echo(
+            f"  {name:<8} ratio {raw_size / compressed_size:5.2f}x  "
+            f"{compressed_size / count:6.1f} B/msg  {count / compress_time:>10,.0f} msg/s"
+        )
+    
+    if save_dir:
+        path = ZstdCompressor.save_dictionary(dictionary, save_dir)
+        click.echo(f"💾 Saved dictionary to: {path}")
+
+
 @cli.command()
 @click.option('--size', '-s', default=1_000_000, help='Data size (bytes)')
 @click.option('--loss', '-l', default=10, help='Loss percentage')
-def fec(size: int, loss: int):
+@click.option('--packet-size', default=1400, help='Packet size (bytes)')
+@click.option('--workers', default=None, type=int, help='Worker threads (default: CPU count)')
+def fec(size: int, loss: int, packet_size: int, workers: int):
     """Benchmark FEC."""
     click.echo(f"🏁 FEC Benchmark: {size:,} bytes ({loss}% loss)")
     
     # Create FEC
     k, m = 10, 4  # 10 data + 4 parity
-    fec_obj = ReedSolomonFEC(k, m)
+    fec_obj = ReedSolomonFEC(k, m, workers=workers)
     
-    # Generate test data
+    # Generate test data, split into packets and blocks of k packets
     data = np.random.randint(0, 255, size, dtype=np.uint8).tobytes()
+    packets = [data[i:i + packet_size] for i in range(0, len(data), packet_size)]
+    packets += [b''] * (-len(packets) % k)
+    blocks = [packets[i:i + k] for i in range(0, len(packets), k)]
     
     # Encode
     start = time.perf_counter()
-    shards = fec_obj.encode(data)
+    encoded = fec_obj.encode_blocks(blocks)
     encode_time = time.perf_counter() - start
     
-    # Simulate loss
-    num_to_erase = int(len(shards) * loss / 100)
-    erased_indices = np.random.choice(len(shards), num_to_erase, replace=False)
-    for idx in erased_indices:
-        shards[idx] = None
+    # Simulate independent packet loss (blocks that lose more than m are gone)
+    rng = np.random.default_rng()
+    received, originals, unrecoverable = [], [], 0
+    for block, shards in zip(blocks, encoded):
+        lost = rng.random(len(shards)) < loss / 100
+        if lost.sum() > m:
+            unrecoverable += 1
+            continue
+        received.append([None if gone else shard for shard, gone in zip(shards, lost)])
+        originals.append(block)
     
     # Decode
     start = time.perf_counter()
-    recovered = fec_obj.decode(shards, len(data))
+    recovered = fec_obj.decode_blocks(received)
     decode_time = time.perf_counter() - start
+    fec_obj.close()
     
-    # Verify
-    assert recovered == data
+    # Verify (recovered packets are zero-padded to the block's packet length)
+    for block, result in zip(originals, recovered):
+        assert all(r[:len(p)] == p for p, r in zip(block, result))
     
     # Results
     encode_throughput = len(data) / encode_time / 1e6
-    decode_throughput = len(data) / decode_time / 1e6
+    decode_throughput = len(data) * len(received) / len(blocks) / decode_time / 1e6
     
-    click.echo(f"\n📊 Results:")
+    click.echo(f"\n📊 Results ({len(blocks):,} blocks, {fec_obj.workers} workers):")
     click.echo(f"  Encode: {encode_throughput:.1f} MB/s")
     click.echo(f"  Decode: {decode_throughput:.1f} MB/s (with {loss}% loss)")
-    click.echo(f"  ✅ Successfully recovered data")
+    click.echo(f"  ✅ Recovered {len(received):,} blocks, "
+               f"{unrecoverable:,} lost more than {m} packets")
 
 
 @cli.command()
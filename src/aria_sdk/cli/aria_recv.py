@@ -9,20 +9,21 @@ import asyncio
 import click
 from pathlib import Path
 
-from aria_sdk.telemetry.codec import AriaCodec
+from aria_sdk.telemetry.codec import FrameDecoder
 
 
 @click.command()
 @click.option('--input', '-i', required=True, type=click.Path(exists=True), help='Input file')
+@click.option('--chunk-size', default=65536, help='Read size in bytes')
 @click.option('--verbose', '-v', is_flag=True, help='Verbose output')
-def main(input: str, verbose: bool):
+def main(input: str, chunk_size: int, verbose: bool):
     """Receive and decode telemetry data."""
-    asyncio.run(receive_data(input, verbose))
+    asyncio.run(receive_data(input, verbose, chunk_size))
 
 
-async def receive_data(input_path: str, verbose: bool):
-    """Decode envelopes from file."""
-    codec = AriaCodec()
+async def receive_data(input_path: str, verbose: bool, chunk_size: int = 65536):
+    """Decode envelopes from a file of concatenated ProtobufCodec frames."""
+    decoder = FrameDecoder()
     
     click.echo(f"📥 Reading from: {input_path}")
     
@@ -33,42 +34,35 @@ async def receive_data(input_path: str, verbose: bool):
     total_decoded = 0
     
     with open(input_path, 'rb') as f:
-        while True:
-            # Read length prefix
-            length_bytes = f.read(4)
-            if not length_bytes:
-                break
-            
-            length = int.from_bytes(length_bytes, 'big')
-            
-            # Read envelope data
-            data = f.read(length)
-            if len(data) != length:
-                click.echo(f"⚠️  Truncated data at envelope {count+1}")
-                break
-            
-            # Decode
-            try:
-                envelope = codec.decode(data)
+        while chunk := f.read(chunk_size):
+            for envelope in decoder.feed(chunk):
                 count += 1
-                total_decoded += length
+                total_decoded += len(envelope.payload)
                 
                 if verbose:
                     click.echo(f"\n📦 Envelope #{count}")
                     click.echo(f"  ID: {envelope.id}")
-                    click.echo(f"  Robot: {envelope.robot_id}")
+                    click.echo(f"  Topic: {envelope.topic}")
+                    click.echo(f"  Source: {envelope.metadata.source_node}")
                     click.echo(f"  Priority: {envelope.priority.name}")
                     click.echo(f"  Timestamp: {envelope.timestamp}")
                     click.echo(f"  Metadata: {envelope.metadata}")
                 else:
-                    click.echo(f"  [{count}] Decoded {length:,} bytes (robot={envelope.robot_id})")
-            
-            except Exception as e:
-                click.echo(f"❌ Failed to decode envelope {count+1}: {e}")
-                break
+                    click.echo(
+                        f"  [{count}] Decoded {len(envelope.payload):,} bytes "
+                        f"(topic={envelope.topic})"
+                    )
+    
+    if decoder.pending:
+        click.echo(f"⚠️  Truncated data: {decoder.pending:,} bytes after envelope {count}")
+    if decoder.errors or decoder.bytes_skipped:
+        click.echo(
+            f"⚠️  Skipped {decoder.bytes_skipped:,} bytes, {decoder.errors} corrupt frames "
+            f"(last error: {decoder.last_error})"
+        )
     
     click.echo(f"\n✅ Decoded {count} envelopes")
-    click.echo(f"📊 Total: {total_decoded:,} bytes")
+    click.echo(f"📊 Total payload: {total_decoded:,} bytes")
 
 
 if __name__ == '__main__':
@@ -27,7 +27,9 @@ class FragmentInfo:
 
     fragment_id: int
     total_fragments: int
-    fragment_offset: int
+    offset: int  # Byte offset in the original payload
+    length: int  # Fragment payload length
+    message_id: UUID  # Shared by all fragments of one message
 
 
 @dataclass
@@ -37,6 +39,7 @@ class FecInfo:
     k: int  # Original data shards
     m: int  # Redundancy shards
     block_id: int
+    index: int = 0  # Shard position in the block (< k: data, >= k: parity)
 
 
 @dataclass
@@ -58,6 +61,8 @@ class EnvelopeMetadata:
     fec_info: Optional[FecInfo] = None
     crypto_info: Optional[CryptoInfo] = None
     qos_class: str = "default"
+    # Payload is a delta against the previous one of this (source_node, topic) stream
+    is_delta: bool = False
 
 
 @dataclass
@@ -107,6 +107,8 @@ class IFEC(Protocol):
 class ICryptoBox(Protocol):
     """Cryptography interface"""
 
+    OVERHEAD: int  # Bytes encrypt() adds to the plaintext
+
     def sign(self, data: bytes) -> bytes:
         """Sign data"""
         ...
@@ -57,7 +57,7 @@ except ImportError:
 
 from aria_sdk.domain.entities import Detection, Envelope, Priority
 from aria_sdk.telemetry.codec import ProtobufCodec
-from aria_sdk.telemetry.compression import Lz4Compressor, ZstdCompressor
+from aria_sdk.telemetry.compression import Lz4Compressor, ZstdCompressor, AdaptiveCompressor
 from aria_sdk.storage.data_storage import DataStorage
 
 # Import cognitive components
@@ -195,6 +195,7 @@ class FullSystemDemo:
             self.codec = ProtobufCodec()
             self.lz4_compressor = Lz4Compressor(level=0)  # Fast compression
             self.zstd_compressor = ZstdCompressor(level=3)  # Balanced compression
+            self.adaptive_compressor = AdaptiveCompressor()  # Per-topic choice for transmission
             self.telemetry_stats = TelemetryStats()
         
         # Data storage
@@ -249,12 +250,12 @@ class FullSystemDemo:
         """
         # Build metadata
         metadata = {
-            'envelope_id': envelope.envelope_id,
+            'envelope_id': str(envelope.id),
             'topic': envelope.topic,
             'priority': envelope.priority.name,
-            'timestamp': envelope.timestamp,
-            'compression': 'lz4',
-            'payload_size': envelope.payload_size
+            'timestamp': envelope.timestamp.isoformat(),
+            'compression': 'adaptive',
+            'payload_size': len(envelope.payload)
         }
         metadata_json = json.dumps(metadata).encode('utf-8')
         
@@ -302,12 +303,9 @@ class FullSystemDemo:
         self.telemetry_stats.total_detections += len(detections)
         self.telemetry_stats.total_envelopes += len(envelopes)
         
-        # Encode each envelope individually and concatenate
+        # Encode all envelopes into one contiguous buffer of frames
         t0 = time.perf_counter()
-        encoded_parts = []
-        for envelope in envelopes:
-            encoded_parts.append(self.codec.encode(envelope))
-        encoded_batch = b''.join(encoded_parts)
+        encoded_batch = self.codec.encode_batch(envelopes)
         t1 = time.perf_counter()
         encode_time_ms = (t1 - t0) * 1000
         self.telemetry_stats.encoding_time += (t1 - t0)
@@ -329,17 +327,19 @@ class FullSystemDemo:
         self.telemetry_stats.zstd_time += (t1 - t0)
         self.telemetry_stats.total_zstd_bytes += len(zstd_compressed)
         
-        # Store telemetry data for each envelope (using LZ4 as primary)
+        # Store telemetry data for each envelope (codec chosen per topic)
         for envelope in envelopes:
             encoded = self.codec.encode(envelope)
-            compressed = self.lz4_compressor.compress(encoded)
+            t0 = time.perf_counter()
+            compressed = self.adaptive_compressor.compress(encoded, envelope.topic)
+            compress_time_ms = (time.perf_counter() - t0) * 1000
             self.storage.store_telemetry(
                 envelope=envelope,
                 encoded_data=encoded,
                 compressed_data=compressed,
-                compression_algo='lz4',
+                compression_algo=AdaptiveCompressor.frame_algorithm(compressed)[0],
                 encoding_time=encode_time_ms / len(envelopes),
-                compression_time=lz4_time_ms / len(envelopes)
+                compression_time=compress_time_ms
             )
             
             # Stream to receiver if connected
@@ -584,7 +584,7 @@ class FullSystemDemo:
                         break
                 
                 time.sleep(2)
-                
+        
         except KeyboardInterrupt:
             self.console.print("\n[yellow]⚠️  Stopped (Ctrl+C)[/yellow]")
         
@@ -706,7 +706,7 @@ def main():
             max_frames=args.max_frames,
             show_video=not args.no_video
         )
-        
+    
     except Exception as e:
         console = Console()
         console.print(f"\n[red]❌ Error: {e}[/red]")
@@ -21,7 +21,7 @@ from pathlib import Path
 from typing import List, Tuple
 
 from aria_sdk.domain.entities import Envelope, Priority
-from aria_sdk.telemetry.codec import ProtobufCodec
+from aria_sdk.telemetry.codec import ProtobufCodec, FrameDecoder
 from aria_sdk.telemetry.compression import Lz4Compressor, ZstdCompressor
 from aria_sdk.telemetry.meda_adapter import (
     MedaCsvReader,
@@ -87,17 +87,17 @@ class MedaDemo:
         
         # Step 3: Encode
         print("\nStep 3: Encoding with ProtobufCodec...")
-        encoded_list, encode_time = self._encode_envelopes(envelopes)
+        encoded_batch, encode_time = self._encode_envelopes(envelopes)
         
-        total_encoded_size = sum(len(e) for e in encoded_list)
-        print(f"✅ Encoded {len(encoded_list):,} envelopes in {encode_time*1000:.2f}ms")
+        total_encoded_size = len(encoded_batch)
+        print(f"✅ Encoded {len(envelopes):,} envelopes in {encode_time*1000:.2f}ms")
         print(f"   Total size: {total_encoded_size:,} bytes ({total_encoded_size/1024:.1f} KB)")
-        print(f"   Throughput: {len(encoded_list)/encode_time:,.0f} msg/sec")
+        print(f"   Throughput: {len(envelopes)/encode_time:,.0f} msg/sec")
         print(f"   Bandwidth: {total_encoded_size/encode_time/1e6:.2f} MB/sec")
         
         # Step 4: Compress with LZ4
         print("\nStep 4a: Compressing with LZ4 (fast)...")
-        lz4_data, lz4_time = self._compress_all(encoded_list, self.lz4)
+        lz4_data, lz4_time = self._compress_all(encoded_batch, self.lz4)
         lz4_ratio = total_encoded_size / len(lz4_data)
         
         print(f"✅ LZ4 compressed: {len(lz4_data):,} bytes ({len(lz4_data)/1024:.1f} KB)")
@@ -107,7 +107,7 @@ class MedaDemo:
         
         # Step 5: Compress with Zstd
         print("\nStep 4b: Compressing with Zstd (balanced)...")
-        zstd_data, zstd_time = self._compress_all(encoded_list, self.zstd)
+        zstd_data, zstd_time = self._compress_all(encoded_batch, self.zstd)
         zstd_ratio = total_encoded_size / len(zstd_data)
         
         print(f"✅ Zstd compressed: {len(zstd_data):,} bytes ({len(zstd_data)/1024:.1f} KB)")
@@ -169,21 +169,18 @@ class MedaDemo:
             print(f"     Priority: {env.priority.name}")
             print(f"     Payload: {len(env.payload)} bytes")
     
-    def _encode_envelopes(self, envelopes: List[Envelope]) -> Tuple[List[bytes], float]:
-        """Encode all envelopes and measure time."""
+    def _encode_envelopes(self, envelopes: List[Envelope]) -> Tuple[bytes, float]:
+        """Encode all envelopes into one buffer of frames and measure time."""
         start = time.perf_counter()
-        encoded = [self.codec.encode(env) for env in envelopes]
+        encoded = self.codec.encode_batch(envelopes)
         elapsed = time.perf_counter() - start
         return encoded, elapsed
     
-    def _compress_all(self, encoded_list: List[bytes], compressor) -> Tuple[bytes, float]:
+    def _compress_all(self, encoded_batch: bytes, compressor) -> Tuple[bytes, float]:
         """Compress all encoded data as single blob."""
-        # Concatenate all encoded envelopes
-        combined = b''.join(encoded_list)
-        
         # Compress
         start = time.perf_counter()
-        compressed = compressor.compress(combined)
+        compressed = compressor.compress(encoded_batch)
         elapsed = time.perf_counter() - start
         
         return compressed, elapsed
@@ -194,31 +191,19 @@ class MedaDemo:
         decompressed = compressor.decompress(compressed_data)
         
         print("   Decoding envelopes...")
-        # Decode each envelope from the decompressed blob
-        offset = 0
+        decoder = FrameDecoder(self.codec)
         decoded_count = 0
         
-        for i, original_env in enumerate(original_envelopes):
-            # Find envelope boundary (using magic bytes 0xAA 0xBB)
-            if offset + 7 > len(decompressed):
-                break
-            
-            # Read length from header
-            length = int.from_bytes(decompressed[offset+3:offset+7], 'big')
-            
-            # Extract full envelope data
-            envelope_data = decompressed[offset:offset+7+length]
-            
-            # Decode
-            decoded_env = self.codec.decode(envelope_data)
-            
+        for decoded_env, original_env in zip(decoder.feed(decompressed), original_envelopes):
             # Validate critical fields
             assert decoded_env.schema_id == original_env.schema_id
             assert decoded_env.topic == original_env.topic
             assert decoded_env.payload == original_env.payload
             
             decoded_count += 1
-            offset += 7 + length
+        
+        assert decoded_count == len(original_envelopes)
+        assert decoder.errors == 0 and decoder.bytes_skipped == 0 and decoder.pending == 0
         
         print(f"✅ Validated {decoded_count:,} envelopes - data integrity preserved!")
 
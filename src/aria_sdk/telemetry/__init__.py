@@ -2,7 +2,8 @@
 ARIA SDK - Telemetry Package
 
 This package provides the complete telemetry pipeline for ARIA SDK:
-- Codec: Protobuf serialization
+- Codec: Protobuf serialization (hand-rolled and generated-schema formats)
+- Batch: Columnar payloads for homogeneous sensor streams
 - Compression: LZ4/Zstd
 - Delta encoding: XOR-based
 - CCEM: Channel conditioning
@@ -15,10 +16,18 @@ This package provides the complete telemetry pipeline for ARIA SDK:
 - Router: Topic-based routing
 """
 
-from aria_sdk.telemetry.codec import ProtobufCodec
+from aria_sdk.telemetry.codec import ProtobufCodec, FrameDecoder, StringTable, StringTableMiss
+from aria_sdk.telemetry.proto_codec import ProtoSchemaCodec
+from aria_sdk.telemetry.batch import ColumnarBatch, ColumnarBatchCodec
 
 __all__ = [
     'ProtobufCodec',
+    'FrameDecoder',
+    'StringTable',
+    'StringTableMiss',
+    'ProtoSchemaCodec',
+    'ColumnarBatch',
+    'ColumnarBatchCodec',
     # TODO: Add more exports as modules are implemented
     # 'Lz4Compressor',
     # 'ZstdCompressor',
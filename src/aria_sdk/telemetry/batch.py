@@ -0,0 +1,218 @@
+"""
+ARIA SDK - Telemetry Columnar Batch Module
+
+Packs many readings from one homogeneous sensor stream into a single
+envelope payload, stored column by column instead of one envelope per
+reading.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+import struct
+
+import numpy as np
+import numpy.typing as npt
+
+from aria_sdk.telemetry.codec import FLAG_UTC
+
+
+# Schema ID bit marking an envelope whose payload is a columnar batch
+# (the low bits keep the per-reading schema ID, e.g. the MEDA sensor type)
+COLUMNAR_SCHEMA_FLAG = 0x8000_0000
+
+# magic, version, flags, count, first timestamp (epoch us), delta width
+_BATCH_HEADER = struct.Struct('<2sBBIqB')
+
+# Narrowest signed dtype that holds every timestamp delta
+_DELTA_DTYPES = (np.dtype('<i1'), np.dtype('<i2'), np.dtype('<i4'), np.dtype('<i8'))
+_DELTA_DTYPE_BY_SIZE = {dtype.itemsize: dtype for dtype in _DELTA_DTYPES}
+
+_VALUE_DTYPE = np.dtype('<f4')
+
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+
+
+def is_columnar(schema_id: int) -> bool:
+    """Check whether an envelope schema ID denotes a columnar batch payload."""
+    return bool(schema_id & COLUMNAR_SCHEMA_FLAG)
+
+
+@dataclass
+class ColumnarBatch:
+    """N readings from one stream, as parallel arrays."""
+    
+    timestamps_us: npt.NDArray[np.int64]    # Microseconds since the Unix epoch
+    values: npt.NDArray[np.float32]
+    quality: npt.NDArray[np.bool_]          # True = good reading
+    utc: bool = True                        # Timestamps are UTC (False = naive wall clock)
+    
+    def __post_init__(self):
+        if not len(self.timestamps_us) == len(self.values) == len(self.quality):
+            raise ValueError(
+                f"Column lengths differ: {len(self.timestamps_us)} timestamps, "
+                f"{len(self.values)} values, {len(self.quality)} quality flags"
+            )
+    
+    def __len__(self) -> int:
+        return len(self.values)
+    
+    @classmethod
+    def from_rows(
+        cls,
+        timestamps: Sequence[datetime],
+        values: Sequence[float],
+        quality: Sequence[int]
+    ) -> "ColumnarBatch":
+        """
+        Build a batch from row-oriented readings.
+        
+        Args:
+            timestamps: Reading timestamps (all naive or all timezone-aware)
+            values: Reading values
+            quality: Quality flags (non-zero = good)
+        
+        Returns:
+            ColumnarBatch
+        """
+        utc = len(timestamps) == 0 or timestamps[0].tzinfo is not None
+        epoch = _EPOCH_UTC if utc else _EPOCH_NAIVE
+        return cls(
+            timestamps_us=np.fromiter(
+                ((ts - epoch) // _ONE_US for ts in timestamps),
+                dtype=np.int64,
+                count=len(timestamps)
+            ),
+            values=np.asarray(values, dtype=np.float32),
+            quality=np.asarray(quality) != 0,
+            utc=utc
+        )
+    
+    def datetimes(self) -> list:
+        """Timestamps as datetime objects (UTC-aware or naive, as encoded)."""
+        epoch = _EPOCH_UTC if self.utc else _EPOCH_NAIVE
+        return [epoch + timedelta(microseconds=us) for us in self.timestamps_us.tolist()]
+
+
+class ColumnarBatchCodec:
+    """
+    Codec for columnar batch payloads.
+    
+    Payload format (little-endian, so columns load without byte swapping
+    on x86/ARM hosts):
+    - Header: magic 'CB', version, flags (FLAG_UTC), count N, first
+      timestamp (int64 epoch microseconds), timestamp delta width
+    - Timestamp deltas: N-1 signed ints of the narrowest width (1/2/4/8
+      bytes) that fits, e.g. int32 for 1 Hz sampling
+    - Values: N float32
+    - Quality bitmap: ceil(N/8) bytes, bit i (LSB first) = reading i good
+    
+    A 1 Hz stream costs ~8.1 bytes per reading, versus ~110 bytes for one
+    ProtobufCodec frame per reading, and the columns are far more
+    compressible than interleaved rows.
+    """
+    
+    MAGIC = b'CB'
+    VERSION = 1
+    
+    def encode(self, batch: ColumnarBatch) -> bytes:
+        """
+        Encode a batch to a payload.
+        
+        Args:
+            batch: Batch to encode
+        
+        Returns:
+            Serialized payload
+        
+        Raises:
+            ValueError: If encoding fails
+        """
+        try:
+            count = len(batch)
+            timestamps = np.asarray(batch.timestamps_us, dtype=np.int64)
+            deltas = np.diff(timestamps)
+            delta_dtype = _DELTA_DTYPES[0]
+            if deltas.size:
+                lo, hi = int(deltas.min()), int(deltas.max())
+                delta_dtype = next(
+                    dtype for dtype in _DELTA_DTYPES
+                    if np.iinfo(dtype).min <= lo and hi <= np.iinfo(dtype).max
+                )
+            
+            header = _BATCH_HEADER.pack(
+                self.MAGIC, self.VERSION, FLAG_UTC if batch.utc else 0, count,
+                int(timestamps[0]) if count else 0, delta_dtype.itemsize
+            )
+            return b''.join((
+                header,
+                deltas.astype(delta_dtype).tobytes(),
+                np.asarray(batch.values, dtype=_VALUE_DTYPE).tobytes(),
+                np.packbits(np.asarray(batch.quality, dtype=bool), bitorder='little').tobytes(),
+            ))
+        
+        except Exception as e:
+            raise ValueError(f"Encoding failed: {e}") from e
+    
+    def decode(self, payload: Union[bytes, memoryview]) -> ColumnarBatch:
+        """
+        Decode a payload to a batch.
+        
+        The value column is a read-only view of the payload (no copy).
+        
+        Args:
+            payload: Serialized payload (e.g. Envelope.payload or EnvelopeView.payload)
+        
+        Returns:
+            Decoded batch
+        
+        Raises:
+            ValueError: If decoding fails
+        """
+        try:
+            if len(payload) < _BATCH_HEADER.size:
+                raise ValueError(f"Truncated header: {len(payload)} bytes")
+            
+            magic, version, flags, count, first_us, delta_width = _BATCH_HEADER.unpack_from(
+                payload, 0
+            )
+            if magic != self.MAGIC:
+                raise ValueError(f"Invalid magic bytes: {magic.hex()}")
+            if version != self.VERSION:
+                raise ValueError(f"Unsupported version: {version}")
+            delta_dtype = _DELTA_DTYPE_BY_SIZE.get(delta_width)
+            if delta_dtype is None:
+                raise ValueError(f"Invalid timestamp delta width: {delta_width}")
+            
+            n_deltas = max(count - 1, 0)
+            values_pos = _BATCH_HEADER.size + n_deltas * delta_width
+            quality_pos = values_pos + count * _VALUE_DTYPE.itemsize
+            end = quality_pos + (count + 7) // 8
+            if end != len(payload):
+                raise ValueError(
+                    f"Payload length mismatch: expected {end} bytes, got {len(payload)}"
+                )
+            
+            timestamps = np.empty(count, dtype=np.int64)
+            if count:
+                deltas = np.frombuffer(
+                    payload, dtype=delta_dtype, count=n_deltas, offset=_BATCH_HEADER.size
+                )
+                timestamps[0] = first_us
+                np.cumsum(deltas, dtype=np.int64, out=timestamps[1:])
+                timestamps[1:] += first_us
+            
+            quality_bits = np.frombuffer(
+                payload, dtype=np.uint8, count=end - quality_pos, offset=quality_pos
+            )
+            return ColumnarBatch(
+                timestamps_us=timestamps,
+                values=np.frombuffer(payload, dtype=_VALUE_DTYPE, count=count, offset=values_pos),
+                quality=np.unpackbits(quality_bits, count=count, bitorder='little').astype(bool),
+                utc=bool(flags & FLAG_UTC)
+            )
+        
+        except Exception as e:
+            raise ValueError(f"Decoding failed: {e}") from e
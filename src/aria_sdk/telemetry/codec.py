@@ -4,31 +4,348 @@ ARIA SDK - Telemetry Codec Module
 Provides Protobuf-based serialization for all telemetry envelopes.
 """
 
-from typing import Optional
+from dataclasses import replace
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import struct
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
 
 from aria_sdk.domain.entities import Envelope, Priority, EnvelopeMetadata, FragmentInfo, FecInfo, CryptoInfo
 from aria_sdk.domain.protocols import ICodec
 
 
+# Priority lookup by wire value (avoids the Enum call machinery per frame)
+_PRIORITIES = tuple(sorted(Priority, key=int))
+
+# Precompiled field layouts (network byte order)
+_FRAME_HEADER = struct.Struct('!2sBI')     # magic, version, body length
+_U16 = struct.Struct('!H')
+_U32 = struct.Struct('!I')
+_TIMESTAMP_V2 = struct.Struct('!qB')       # epoch ns, flags
+_FRAGMENT = struct.Struct('!IIII')         # fragment id/total/offset/length
+_FEC = struct.Struct('!BBIB')              # FEC k, m, block id, shard index
+
+# Optional metadata sections (bit field after the sequence number)
+SECTION_FRAGMENT = 0x01
+SECTION_FEC = 0x02
+
+# Version 2 frame flags
+FLAG_UTC = 0x01         # Timestamp is timezone-aware (decoded as UTC)
+FLAG_STRING_TABLE = 0x02    # Topic/source node are interned (see StringTable)
+FLAG_DELTA = 0x04       # Payload is a delta (EnvelopeMetadata.is_delta)
+_EPOCH_SHIFT = 4        # String table epoch lives in the high nibble of flags
+
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+
+# Version 2 timestamps are a signed int64 of nanoseconds (~1677-09-21 .. 2262-04-11)
+_EPOCH_NS_MIN = -(1 << 63)
+_EPOCH_NS_MAX = (1 << 63) - 1
+
+
+def _to_epoch_ns(timestamp: datetime) -> Tuple[int, int]:
+    """
+    Convert a datetime to (nanoseconds since the Unix epoch, flags).
+    
+    Naive datetimes are measured from a naive epoch so they round-trip
+    exactly as wall-clock time; aware datetimes are normalised to UTC.
+    
+    Raises:
+        ValueError: If the timestamp does not fit the int64 nanosecond
+            range of version 2 (use ProtobufCodec(version=1) for those)
+    """
+    if timestamp.tzinfo is None:
+        delta = timestamp - _EPOCH_NAIVE
+        flags = 0
+    else:
+        delta = timestamp - _EPOCH_UTC
+        flags = FLAG_UTC
+    seconds = delta.days * 86_400 + delta.seconds
+    timestamp_ns = seconds * 1_000_000_000 + delta.microseconds * 1_000
+    if not _EPOCH_NS_MIN <= timestamp_ns <= _EPOCH_NS_MAX:
+        raise ValueError(
+            f"Timestamp {timestamp.isoformat()} is outside the version 2 range "
+            f"(1677-09-21 to 2262-04-11); encode with version=1"
+        )
+    return timestamp_ns, flags
+
+
+# Below this bound fromtimestamp() takes whole seconds directly (until 2106)
+_FAST_EPOCH_NS_LIMIT = (1 << 32) * 1_000_000_000
+
+
+def _from_epoch_ns(timestamp_ns: int, flags: int) -> datetime:
+    """
+    Inverse of _to_epoch_ns (datetime resolution is 1 microsecond).
+    
+    Sub-microsecond nanoseconds are floored on every path.
+    """
+    if 0 <= timestamp_ns < _FAST_EPOCH_NS_LIMIT:
+        seconds, nanos = divmod(timestamp_ns, 1_000_000_000)
+        timestamp = datetime.fromtimestamp(seconds, timezone.utc)
+        timestamp = timestamp.replace(microsecond=nanos // 1_000)
+        return timestamp if flags & FLAG_UTC else timestamp.replace(tzinfo=None)
+    epoch = _EPOCH_UTC if flags & FLAG_UTC else _EPOCH_NAIVE
+    return epoch + timedelta(microseconds=timestamp_ns // 1_000)
+
+
+class _FrameLayout(struct.Struct):
+    """Frame struct that also records where the payload bytes start."""
+    
+    payload_offset: int
+
+
+@lru_cache(maxsize=256)
+def _frame_layout(
+    version: int,
+    timestamp_len: int,
+    topic_fmt: str,
+    payload_len: int,
+    source_node_fmt: str,
+    sections: int,
+) -> _FrameLayout:
+    """
+    Precompiled struct for one frame shape.
+    
+    A telemetry stream usually repeats a handful of shapes (same topic, same
+    payload size), so each frame is packed/unpacked with a single cached
+    Struct call instead of one call per field. String fields are given as
+    struct format pieces (plain ``H{n}s`` or a StringTable field).
+    """
+    if version == 1:
+        timestamp_fmt = f'H{timestamp_len}s'    # timestamp (ISO 8601)
+    else:
+        timestamp_fmt = 'qB'                    # timestamp (epoch ns), flags
+    head = (
+        '!2sBI'                         # magic, version, body length
+        '16s'                           # envelope ID
+        + timestamp_fmt +
+        'IB'                            # schema ID, priority
+        + topic_fmt +                   # topic
+        'I'                             # payload length
+    )
+    fmt = (
+        head
+        + f'{payload_len}s'             # payload
+        + source_node_fmt +             # source node
+        'I'                             # sequence number
+        'B'                             # section flags
+    )
+    if sections & SECTION_FRAGMENT:
+        fmt += 'IIII16s'                # fragment id/total/offset/length, message ID
+    if sections & SECTION_FEC:
+        fmt += 'BBIB'                   # FEC k, m, block id, shard index
+    layout = _FrameLayout(fmt)
+    layout.payload_offset = struct.calcsize(head)
+    return layout
+
+
+class StringTableMiss(ValueError):
+    """Raised when a frame references an interned string the decoder never saw."""
+    
+    def __init__(self, string_id: int, epoch: int):
+        super().__init__(f"Unknown interned string {string_id} (table epoch {epoch})")
+        self.string_id = string_id
+        self.epoch = epoch
+
+
+class StringTable:
+    """
+    Session-scoped interning table for topic and source-node strings.
+    
+    The first frame carrying a string sends it inline together with a 2-byte
+    ID; later frames send only the ID. The encoder assigns IDs and the
+    decoder learns them from the inline definitions, so each codec keeps
+    one table per direction.
+    
+    Field encoding (u16 tag first):
+    - tag & 0x8000: reference to string ID ``tag & 0x7FFF``
+    - otherwise: inline definition - tag is the UTF-8 length, followed by
+      the string bytes and its u16 ID (NO_ID if the table is full)
+    
+    Recovery from lost frames:
+    - Every ``refresh_interval`` references a string is re-sent inline, so
+      a receiver that missed its definition resyncs on its own.
+    - reset() starts a new table epoch (4 bits, carried in every frame's
+      flags); a decoder that sees a different epoch drops its table. Reset
+      the sender when the receiver reports a StringTableMiss.
+    """
+    
+    REF = 0x8000
+    NO_ID = 0x7FFF
+    EPOCHS = 16
+    
+    def __init__(self, refresh_interval: Optional[int] = 256, max_entries: int = NO_ID):
+        """
+        Initialize table.
+        
+        Args:
+            refresh_interval: References between inline re-definitions
+                (None = define each string only once)
+            max_entries: Maximum interned strings per epoch (<= 0x7FFF);
+                further strings are sent inline without an ID
+        """
+        if refresh_interval is not None and refresh_interval < 1:
+            raise ValueError(f"refresh_interval must be >= 1, got {refresh_interval}")
+        if not 0 <= max_entries <= self.NO_ID:
+            raise ValueError(f"max_entries must be in [0, {self.NO_ID}], got {max_entries}")
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        self.epoch = 0
+        self._ids: Dict[str, int] = {}          # encoder: string -> ID
+        self._uses: Dict[int, int] = {}         # encoder: references since last definition
+        self._strings: Dict[int, str] = {}      # decoder: ID -> string
+    
+    def __len__(self) -> int:
+        return max(len(self._ids), len(self._strings))
+    
+    def reset(self) -> None:
+        """Start a new epoch with an empty table."""
+        self.epoch = (self.epoch + 1) % self.EPOCHS
+        self._ids.clear()
+        self._uses.clear()
+        self._strings.clear()
+    
+    def encode_field(self, value: str) -> Tuple[str, tuple]:
+        """
+        Intern a string for the encoder.
+        
+        Args:
+            value: String to send
+        
+        Returns:
+            Tuple of (struct format piece, values to pack)
+        """
+        string_id = self._ids.get(value)
+        if string_id is not None:
+            uses = self._uses[string_id] + 1
+            if self.refresh_interval is None or uses < self.refresh_interval:
+                self._uses[string_id] = uses
+                return 'H', (self.REF | string_id,)
+            self._uses[string_id] = 0
+        elif len(self._ids) < self.max_entries:
+            string_id = len(self._ids)
+            self._ids[value] = string_id
+            self._uses[string_id] = 0
+        else:
+            string_id = self.NO_ID
+        
+        data = value.encode('utf-8')
+        if len(data) >= self.REF:
+            raise ValueError(f"String too long to intern: {len(data)} bytes")
+        return f'H{len(data)}sH', (len(data), data, string_id)
+    
+    def sync(self, epoch: int) -> None:
+        """Adopt the sender's epoch on the decoder, dropping a stale table."""
+        if epoch != self.epoch:
+            self._strings.clear()
+            self.epoch = epoch
+    
+    def read_field(self, buf: memoryview, pos: int) -> Tuple[str, int]:
+        """
+        Read one interned field for the decoder.
+        
+        Args:
+            buf: Frame buffer
+            pos: Offset of the field tag
+        
+        Returns:
+            Tuple of (string, offset after the field)
+        
+        Raises:
+            StringTableMiss: If the field references an unknown ID
+        """
+        tag, = _U16.unpack_from(buf, pos)
+        pos += 2
+        if tag & self.REF:
+            string_id = tag & self.NO_ID
+            try:
+                return self._strings[string_id], pos
+            except KeyError:
+                raise StringTableMiss(string_id, self.epoch) from None
+        
+        value = str(buf[pos:pos+tag], 'utf-8')
+        pos += tag
+        string_id, = _U16.unpack_from(buf, pos)
+        if string_id != self.NO_ID:
+            self._strings[string_id] = value
+        return value, pos + 2
+
+
 class ProtobufCodec(ICodec):
     """
     Protobuf codec for telemetry envelopes.
     
     Wire format:
     - Magic bytes: 0xAA 0xBB (2 bytes) for framing detection
-    - Version: 1 byte (currently 0x01)
+    - Version: 1 byte (currently 0x02)
     - Payload length: 4 bytes (big-endian uint32)
     - Serialized protobuf message
     
-    TODO: Generate actual .proto definitions and use protobuf library.
-    This is a simplified binary format for demonstration.
+    Version 2 stores the timestamp as an int64 epoch-nanosecond value plus a
+    flags byte (9 bytes) instead of a length-prefixed ISO 8601 string
+    (~28-34 bytes). Version 1 frames are still accepted by the decoder, and
+    can still be produced with ``ProtobufCodec(version=1)``.
+    
+    Frames are self-delimiting, so a batch is simply the concatenation of
+    its frames (see encode_batch / decode_batch).
+    
+    With ``intern_strings=True`` (version 2 only) topic and source node are
+    sent through a session StringTable: a 2-byte reference replaces the
+    string after its first occurrence. Frames are then order-dependent - a
+    receiver that missed a definition raises StringTableMiss until the
+    string is refreshed or the sender calls reset_string_table().
+    
+    Version 2 also carries EnvelopeMetadata.is_delta as a flag bit (see
+    telemetry.delta.DeltaCodecBank). Fragment and FEC metadata are optional
+    sections announced by a flags byte after the sequence number.
+    
+    This is a hand-rolled binary format; ProtoSchemaCodec (proto_codec.py)
+    serializes the same envelopes with the generated proto/telemetry.proto
+    classes.
     """
     
     MAGIC = b'\xAA\xBB'
-    VERSION = 1
+    VERSION = 2
+    SUPPORTED_VERSIONS = (1, 2)
+    HEADER_SIZE = _FRAME_HEADER.size
+    
+    def __init__(
+        self,
+        version: int = VERSION,
+        intern_strings: bool = False,
+        refresh_interval: Optional[int] = 256
+    ):
+        """
+        Initialize codec.
+        
+        Args:
+            version: Wire-format version to encode with (decoding accepts
+                all SUPPORTED_VERSIONS)
+            intern_strings: Intern topic/source node strings when encoding
+            refresh_interval: References between inline re-definitions of
+                an interned string (see StringTable)
+        """
+        if version not in self.SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported version: {version}")
+        if intern_strings and version < 2:
+            raise ValueError("String interning requires version 2")
+        self.version = version
+        
+        # Encoder and decoder tables are independent (one per direction)
+        self._tx_strings = StringTable(refresh_interval) if intern_strings else None
+        self._rx_strings = StringTable()
+    
+    def reset_string_table(self) -> None:
+        """
+        Start a new string table epoch on the encoder.
+        
+        The next frame re-defines every string inline, and receivers drop
+        their stale tables when they see the new epoch.
+        """
+        if self._tx_strings is not None:
+            self._tx_strings.reset()
     
     def encode(self, envelope: Envelope) -> bytes:
         """
@@ -36,75 +353,101 @@ class ProtobufCodec(ICodec):
         
         Args:
             envelope: The envelope to encode
-            
+        
         Returns:
             Serialized bytes
-            
+        
+        Raises:
+            ValueError: If encoding fails
+        """
+        return self.encode_batch((envelope,))
+    
+    def encode_batch(self, envelopes: Iterable[Envelope]) -> bytes:
+        """
+        Encode several envelopes into one contiguous buffer of frames.
+        
+        All frames are sized up front and packed with ``pack_into`` into a
+        single preallocated bytearray, so the cost is one output allocation
+        per batch instead of one per field.
+        
+        Args:
+            envelopes: Envelopes to encode
+        
+        Returns:
+            Concatenated frames (identical to joining encode() of each envelope)
+        
         Raises:
             ValueError: If encoding fails
         """
         try:
-            # Build simplified binary format (TODO: replace with real protobuf)
-            parts = []
-            
-            # Header
-            parts.append(self.MAGIC)
-            parts.append(struct.pack('B', self.VERSION))
-            
-            # Envelope ID (UUID as 16 bytes)
-            parts.append(envelope.id.bytes)
-            
-            # Timestamp (ISO 8601 string)
-            timestamp_str = envelope.timestamp.isoformat().encode('utf-8')
-            parts.append(struct.pack('!H', len(timestamp_str)))
-            parts.append(timestamp_str)
-            
-            # Schema ID (4 bytes)
-            parts.append(struct.pack('!I', envelope.schema_id))
-            
-            # Priority (1 byte)
-            parts.append(struct.pack('B', envelope.priority.value))
-            
-            # Topic (length-prefixed string)
-            topic_bytes = envelope.topic.encode('utf-8')
-            parts.append(struct.pack('!H', len(topic_bytes)))
-            parts.append(topic_bytes)
-            
-            # Payload (length-prefixed bytes)
-            parts.append(struct.pack('!I', len(envelope.payload)))
-            parts.append(envelope.payload)
-            
-            # Metadata - source_node and sequence_number
-            source_node_bytes = envelope.metadata.source_node.encode('utf-8')
-            parts.append(struct.pack('!H', len(source_node_bytes)))
-            parts.append(source_node_bytes)
-            parts.append(struct.pack('!I', envelope.metadata.sequence_number))
-            
-            # Metadata (simplified - only fragment info for now)
-            if envelope.metadata and envelope.metadata.fragment_info:
-                parts.append(b'\x01')  # Has fragment info
-                frag = envelope.metadata.fragment_info
-                parts.append(struct.pack('!I', frag.fragment_id))
-                parts.append(struct.pack('!I', frag.total_fragments))
-                parts.append(struct.pack('!I', frag.offset))
-                parts.append(struct.pack('!I', frag.length))
-                parts.append(frag.message_id.bytes)
-            else:
-                parts.append(b'\x00')  # No fragment info
-            
-            # Combine all parts
-            payload_data = b''.join(parts[2:])  # Everything after header
-            
-            # Build final message with length prefix
-            final_parts = [
-                self.MAGIC,
-                struct.pack('B', self.VERSION),
-                struct.pack('!I', len(payload_data)),
-                payload_data
-            ]
-            
-            return b''.join(final_parts)
+            prepared = [self._prepare(envelope) for envelope in envelopes]
+            buf = bytearray(sum(layout.size for layout, _ in prepared))
+            offset = 0
+            for layout, values in prepared:
+                layout.pack_into(buf, offset, *values)
+                offset += layout.size
+            return bytes(buf)
+        
+        except Exception as e:
+            raise ValueError(f"Encoding failed: {e}") from e
+    
+    def frame_overhead(self, envelope: Envelope) -> int:
+        """
+        Frame bytes an envelope adds around its payload.
+        
+        Covers the header, metadata and the fragment/FEC sections present in
+        envelope.metadata. With string interning this is the worst case
+        (both strings defined inline); the string table is not touched.
+        
+        Args:
+            envelope: Envelope as it will be sent (its payload is ignored)
+        
+        Returns:
+            Frame size minus payload size, in bytes
+        """
+        topic_len = len(envelope.topic.encode('utf-8'))
+        source_node_len = len(envelope.metadata.source_node.encode('utf-8'))
+        string_id = 'H' if self._tx_strings is not None else ''
+        timestamp_len = (
+            len(envelope.timestamp.isoformat().encode('utf-8')) if self.version == 1 else 0
+        )
+        sections = (
+            (SECTION_FRAGMENT if envelope.metadata.fragment_info is not None else 0)
+            | (SECTION_FEC if envelope.metadata.fec_info is not None else 0)
+        )
+        return _frame_layout(
+            self.version, timestamp_len, f'H{topic_len}s{string_id}', 0,
+            f'H{source_node_len}s{string_id}', sections
+        ).size
+    
+    def encode_parts(self, envelope: Envelope) -> Tuple[bytes, bytes]:
+        """
+        Encode the frame around an envelope's payload, leaving the payload out.
+        
+        ``head + envelope.payload + tail`` is the frame encode() would
+        produce, so the payload can go to the socket as its own buffer
+        (scatter-gather, e.g. socket.sendmsg) without ever being copied.
+        
+        Args:
+            envelope: The envelope to encode
+        
+        Returns:
+            Tuple of (head, tail)
+        
+        Raises:
+            ValueError: If encoding fails
+        """
+        try:
+            payload_len = len(envelope.payload)
+            layout, values = self._prepare(replace(envelope, payload=b''))
+            frame = layout.pack(*values)
             
+            pos = layout.payload_offset
+            head = bytearray(frame[:pos])
+            _U32.pack_into(head, 3, layout.size - _FRAME_HEADER.size + payload_len)
+            _U32.pack_into(head, pos - 4, payload_len)
+            return bytes(head), frame[pos:]
+        
         except Exception as e:
             raise ValueError(f"Encoding failed: {e}") from e
     
@@ -114,153 +457,579 @@ class ProtobufCodec(ICodec):
         
         Args:
             data: Serialized envelope bytes
-            
+        
         Returns:
             Decoded envelope
-            
+        
         Raises:
+            StringTableMiss: If the frame references an unknown interned string
             ValueError: If decoding fails
         """
         try:
-            offset = 0
-            
-            # Check magic bytes
-            magic = data[offset:offset+2]
-            if magic != self.MAGIC:
-                raise ValueError(f"Invalid magic bytes: {magic.hex()}")
-            offset += 2
-            
-            # Check version
-            version = struct.unpack('B', data[offset:offset+1])[0]
-            if version != self.VERSION:
-                raise ValueError(f"Unsupported version: {version}")
-            offset += 1
-            
-            # Read payload length
-            payload_len = struct.unpack('!I', data[offset:offset+4])[0]
-            offset += 4
-            
-            # Envelope ID (UUID)
-            envelope_id = UUID(bytes=data[offset:offset+16])
-            offset += 16
-            
-            # Timestamp
-            timestamp_len = struct.unpack('!H', data[offset:offset+2])[0]
-            offset += 2
-            timestamp_str = data[offset:offset+timestamp_len].decode('utf-8')
-            timestamp = datetime.fromisoformat(timestamp_str)
-            offset += timestamp_len
-            
-            # Schema ID
-            schema_id = struct.unpack('!I', data[offset:offset+4])[0]
-            offset += 4
-            
-            # Priority
-            priority_val = struct.unpack('B', data[offset:offset+1])[0]
-            priority = Priority(priority_val)
-            offset += 1
-            
-            # Topic
-            topic_len = struct.unpack('!H', data[offset:offset+2])[0]
-            offset += 2
-            topic = data[offset:offset+topic_len].decode('utf-8')
-            offset += topic_len
-            
-            # Payload
-            payload_size = struct.unpack('!I', data[offset:offset+4])[0]
-            offset += 4
-            payload = data[offset:offset+payload_size]
-            offset += payload_size
-            
-            # Metadata - source_node and sequence_number
-            source_node_len = struct.unpack('!H', data[offset:offset+2])[0]
-            offset += 2
-            source_node = data[offset:offset+source_node_len].decode('utf-8')
-            offset += source_node_len
-            sequence_number = struct.unpack('!I', data[offset:offset+4])[0]
-            offset += 4
-            
-            # Metadata (fragment info)
-            has_fragment = struct.unpack('B', data[offset:offset+1])[0]
-            offset += 1
-            
-            fragment_info: Optional[FragmentInfo] = None
-            if has_fragment:
-                frag_id = struct.unpack('!I', data[offset:offset+4])[0]
-                offset += 4
-                total_frags = struct.unpack('!I', data[offset:offset+4])[0]
-                offset += 4
-                frag_offset = struct.unpack('!I', data[offset:offset+4])[0]
-                offset += 4
-                frag_length = struct.unpack('!I', data[offset:offset+4])[0]
-                offset += 4
-                msg_id = UUID(bytes=data[offset:offset+16])
-                offset += 16
-                
-                fragment_info = FragmentInfo(
-                    fragment_id=frag_id,
-                    total_fragments=total_frags,
-                    offset=frag_offset,
-                    length=frag_length,
-                    message_id=msg_id
-                )
-            
-            # Create metadata
-            metadata = EnvelopeMetadata(
-                source_node=source_node,
-                sequence_number=sequence_number,
-                fragment_info=fragment_info
-            )
-            
-            return Envelope(
-                id=envelope_id,
-                timestamp=timestamp,
-                schema_id=schema_id,
-                priority=priority,
-                topic=topic,
-                payload=payload,
-                metadata=metadata
-            )
-            
+            envelope, _ = self._unpack_frame(data, 0)
+            return envelope
+        except StringTableMiss:
+            raise
         except Exception as e:
             raise ValueError(f"Decoding failed: {e}") from e
+    
+    def decode_view(
+        self,
+        data: Union[bytes, bytearray, memoryview],
+        offset: int = 0
+    ) -> 'EnvelopeView':
+        """
+        Decode lazily: return a view over the frame instead of an Envelope.
+        
+        Only the frame header is validated up front. Fields are parsed on
+        first access and the payload is exposed as a zero-copy memoryview,
+        so routing on topic/priority skips UUID, datetime and metadata
+        construction entirely.
+        
+        Args:
+            data: Buffer holding the serialized frame (not copied)
+            offset: Start of the frame within data
+        
+        Returns:
+            EnvelopeView backed by data
+        
+        Raises:
+            StringTableMiss: If the frame references an unknown interned string
+            ValueError: If the frame header is invalid or the frame is truncated
+        """
+        try:
+            buf = data if isinstance(data, memoryview) else memoryview(data)
+            version, end = self._check_header(buf, offset)
+            return EnvelopeView(buf, offset, end, version, self._rx_strings)
+        except StringTableMiss:
+            raise
+        except Exception as e:
+            raise ValueError(f"Decoding failed: {e}") from e
+    
+    def decode_batch(self, data: bytes) -> List[Envelope]:
+        """
+        Decode a buffer of concatenated frames (e.g. from encode_batch).
+        
+        Args:
+            data: Concatenated serialized envelopes
+        
+        Returns:
+            Decoded envelopes, in wire order
+        
+        Raises:
+            StringTableMiss: If a frame references an unknown interned string
+            ValueError: If any frame is invalid or the buffer ends mid-frame
+        """
+        envelopes = []
+        offset = 0
+        end = len(data)
+        try:
+            while offset < end:
+                envelope, offset = self._unpack_frame(data, offset)
+                envelopes.append(envelope)
+        except StringTableMiss:
+            raise
+        except Exception as e:
+            raise ValueError(f"Decoding failed at frame {len(envelopes)}: {e}") from e
+        return envelopes
+    
+    def _prepare(self, envelope: Envelope) -> Tuple[struct.Struct, tuple]:
+        """Resolve the frame layout and field values for an envelope."""
+        payload = envelope.payload
+        if type(payload) is not bytes:
+            payload = bytes(payload)
+        frag = envelope.metadata.fragment_info
+        fec = envelope.metadata.fec_info
+        sections = (
+            (SECTION_FRAGMENT if frag is not None else 0)
+            | (SECTION_FEC if fec is not None else 0)
+        )
+        strings = self._tx_strings
+        
+        if strings is None:
+            topic_bytes = envelope.topic.encode('utf-8')
+            source_node_bytes = envelope.metadata.source_node.encode('utf-8')
+            topic_fmt = f'H{len(topic_bytes)}s'
+            topic_values = (len(topic_bytes), topic_bytes)
+            source_node_fmt = f'H{len(source_node_bytes)}s'
+            source_node_values = (len(source_node_bytes), source_node_bytes)
+        else:
+            topic_fmt, topic_values = strings.encode_field(envelope.topic)
+            source_node_fmt, source_node_values = strings.encode_field(
+                envelope.metadata.source_node
+            )
+        
+        if self.version == 1:
+            if envelope.metadata.is_delta:
+                raise ValueError("Delta payloads require version 2")
+            timestamp_bytes = envelope.timestamp.isoformat().encode('utf-8')
+            timestamp_len = len(timestamp_bytes)
+            timestamp_values = (timestamp_len, timestamp_bytes)
+        else:
+            timestamp_len = 0
+            timestamp_ns, flags = _to_epoch_ns(envelope.timestamp)
+            if strings is not None:
+                flags |= FLAG_STRING_TABLE | (strings.epoch << _EPOCH_SHIFT)
+            if envelope.metadata.is_delta:
+                flags |= FLAG_DELTA
+            timestamp_values = (timestamp_ns, flags)
+        
+        layout = _frame_layout(
+            self.version, timestamp_len, topic_fmt, len(payload), source_node_fmt,
+            sections
+        )
+        values = (
+            self.MAGIC, self.version, layout.size - _FRAME_HEADER.size,
+            envelope.id.bytes,
+            *timestamp_values,
+            envelope.schema_id, envelope.priority,
+            *topic_values,
+            len(payload), payload,
+            *source_node_values,
+            envelope.metadata.sequence_number,
+        )
+        values += (sections,)
+        if frag is not None:
+            values += (
+                frag.fragment_id, frag.total_fragments, frag.offset, frag.length,
+                frag.message_id.bytes
+            )
+        if fec is not None:
+            values += (fec.k, fec.m, fec.block_id, fec.index)
+        
+        return layout, values
+    
+    def _check_header(self, data: bytes, offset: int) -> Tuple[int, int]:
+        """Validate the frame header at offset; returns (version, end offset)."""
+        if len(data) - offset < _FRAME_HEADER.size:
+            raise ValueError(f"Truncated header: {len(data) - offset} bytes")
+        
+        # Check magic bytes and version, read payload length
+        magic, version, payload_len = _FRAME_HEADER.unpack_from(data, offset)
+        if magic != self.MAGIC:
+            raise ValueError(f"Invalid magic bytes: {magic.hex()}")
+        if version not in self.SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported version: {version}")
+        
+        end = offset + _FRAME_HEADER.size + payload_len
+        if end > len(data):
+            raise ValueError(
+                f"Truncated frame: need {payload_len} bytes, "
+                f"have {len(data) - offset - _FRAME_HEADER.size}"
+            )
+        return version, end
+    
+    def _unpack_frame(self, data: bytes, offset: int) -> Tuple[Envelope, int]:
+        """Decode the frame starting at offset; returns (envelope, end offset)."""
+        version, end = self._check_header(data, offset)
+        payload_len = end - offset - _FRAME_HEADER.size
+        
+        # Walk the length prefixes to find the frame shape
+        pos = offset + _FRAME_HEADER.size + 16
+        if version == 1:
+            timestamp_len, = _U16.unpack_from(data, pos)
+            pos += 2 + timestamp_len + 5
+        else:
+            if data[pos + 8] & FLAG_STRING_TABLE:
+                # Interned fields must go through the table in frame order
+                view = EnvelopeView(memoryview(data), offset, end, version, self._rx_strings)
+                return view.to_envelope(), end
+            timestamp_len = 0
+            pos += 9 + 5
+        topic_len, = _U16.unpack_from(data, pos)
+        pos += 2 + topic_len
+        payload_size, = _U32.unpack_from(data, pos)
+        pos += 4 + payload_size
+        source_node_len, = _U16.unpack_from(data, pos)
+        pos += 2 + source_node_len + 4
+        if pos >= end:
+            raise ValueError(f"Frame overrun: fields end at {pos}, frame ends at {end}")
+        sections = data[pos]
+        
+        layout = _frame_layout(
+            version, timestamp_len, f'H{topic_len}s', payload_size, f'H{source_node_len}s',
+            sections
+        )
+        if offset + layout.size != end:
+            raise ValueError(f"Frame length mismatch: header says {payload_len} bytes")
+        
+        fields = layout.unpack_from(data, offset)
+        (
+            _, _, _,
+            id_bytes,
+            timestamp_field, timestamp_extra,
+            schema_id, priority_val,
+            _, topic_bytes,
+            _, payload,
+            _, source_node_bytes,
+            sequence_number,
+            _,
+        ) = fields[:16]
+        
+        fragment_info: Optional[FragmentInfo] = None
+        if sections & SECTION_FRAGMENT:
+            frag_id, total_frags, frag_offset, frag_length, msg_id = fields[16:21]
+            fragment_info = FragmentInfo(
+                fragment_id=frag_id,
+                total_fragments=total_frags,
+                offset=frag_offset,
+                length=frag_length,
+                message_id=UUID(bytes=msg_id)
+            )
+        
+        fec_info: Optional[FecInfo] = None
+        if sections & SECTION_FEC:
+            k, m, block_id, index = fields[-4:]
+            fec_info = FecInfo(k=k, m=m, block_id=block_id, index=index)
+        
+        # Create metadata
+        metadata = EnvelopeMetadata(
+            source_node=source_node_bytes.decode('utf-8'),
+            sequence_number=sequence_number,
+            fragment_info=fragment_info,
+            fec_info=fec_info,
+            is_delta=version >= 2 and bool(timestamp_extra & FLAG_DELTA)
+        )
+        
+        if version == 1:
+            timestamp = datetime.fromisoformat(timestamp_extra.decode('utf-8'))
+        else:
+            timestamp = _from_epoch_ns(timestamp_field, timestamp_extra)
+        
+        envelope = Envelope(
+            id=UUID(bytes=id_bytes),
+            timestamp=timestamp,
+            schema_id=schema_id,
+            priority=_PRIORITIES[priority_val],
+            topic=topic_bytes.decode('utf-8'),
+            payload=payload,
+            metadata=metadata
+        )
+        return envelope, end
 
 
-# TODO: Replace with proper protobuf definitions
-# 
-# Example .proto file structure:
-#
-# syntax = "proto3";
-# package aria.telemetry;
-#
-# message Envelope {
-#   string id = 1;            // UUID as string
-#   int64 timestamp = 2;      // Unix timestamp (nanoseconds)
-#   Priority priority = 3;
-#   string topic = 4;
-#   bytes payload = 5;
-#   EnvelopeMetadata metadata = 6;
-# }
-#
-# enum Priority {
-#   P0_CRITICAL = 0;
-#   P1_HIGH = 1;
-#   P2_NORMAL = 2;
-#   P3_LOW = 3;
-# }
-#
-# message EnvelopeMetadata {
-#   FragmentInfo fragment_info = 1;
-#   FecInfo fec_info = 2;
-#   CryptoInfo crypto_info = 3;
-# }
-#
-# message FragmentInfo {
-#   uint32 fragment_id = 1;
-#   uint32 total_fragments = 2;
-#   uint32 offset = 3;
-#   uint32 length = 4;
-#   string message_id = 5;
-# }
-#
-# Generate with: protoc --python_out=. telemetry.proto
+class EnvelopeView:
+    """
+    Lazily decoded envelope backed by a memoryview of the received frame.
+    
+    Returned by ProtobufCodec.decode_view(). Each field is parsed on first
+    access (decoded objects are cached); ``payload`` is a zero-copy
+    memoryview slice. The view keeps the underlying buffer alive (and a
+    bytearray buffer cannot be resized while a view exists). Call
+    to_envelope() to materialize a regular Envelope.
+    """
+    
+    __slots__ = (
+        '_buf', '_offset', '_end', 'version', '_schema_pos', '_payload_pos',
+        '_id', '_timestamp', '_topic', '_source_node', '_sequence_pos', '_metadata',
+    )
+    
+    def __init__(
+        self,
+        buf: memoryview,
+        offset: int,
+        end: int,
+        version: int,
+        strings: Optional[StringTable] = None
+    ):
+        """
+        Initialize view (use ProtobufCodec.decode_view instead).
+        
+        Args:
+            buf: Buffer holding the frame
+            offset: Start of the frame (magic bytes)
+            end: End of the frame
+            version: Wire-format version from the frame header
+            strings: Decoder string table, for frames with interned strings
+        """
+        self._buf = buf
+        self._offset = offset
+        self._end = end
+        self.version = version
+        
+        self._payload_pos: Optional[int] = None
+        self._id: Optional[UUID] = None
+        self._timestamp: Optional[datetime] = None
+        self._topic: Optional[str] = None
+        self._source_node: Optional[str] = None
+        self._sequence_pos: Optional[int] = None
+        self._metadata: Optional[EnvelopeMetadata] = None
+        
+        # Offset of the schema ID / priority pair
+        pos = offset + _FRAME_HEADER.size + 16
+        if version == 1:
+            pos += 2 + _U16.unpack_from(buf, pos)[0]
+            self._schema_pos = pos
+            return
+        
+        flags = buf[pos + 8]
+        pos += _TIMESTAMP_V2.size
+        self._schema_pos = pos
+        
+        if flags & FLAG_STRING_TABLE:
+            # Resolve interned strings now: table updates must follow frame order
+            if strings is None:
+                raise ValueError("Frame uses string interning but no string table was given")
+            strings.sync(flags >> _EPOCH_SHIFT)
+            self._topic, pos = strings.read_field(buf, pos + 5)
+            self._payload_pos = pos
+            pos += 4 + _U32.unpack_from(buf, pos)[0]
+            self._source_node, self._sequence_pos = strings.read_field(buf, pos)
+    
+    @property
+    def frame_size(self) -> int:
+        """Size of the whole encoded frame in bytes."""
+        return self._end - self._offset
+    
+    @property
+    def id(self) -> UUID:
+        """Envelope ID."""
+        if self._id is None:
+            pos = self._offset + _FRAME_HEADER.size
+            self._id = UUID(bytes=bytes(self._buf[pos:pos+16]))
+        return self._id
+    
+    @property
+    def timestamp(self) -> datetime:
+        """Envelope timestamp."""
+        if self._timestamp is None:
+            pos = self._offset + _FRAME_HEADER.size + 16
+            if self.version == 1:
+                timestamp_len, = _U16.unpack_from(self._buf, pos)
+                timestamp_str = str(self._buf[pos+2:pos+2+timestamp_len], 'utf-8')
+                self._timestamp = datetime.fromisoformat(timestamp_str)
+            else:
+                self._timestamp = _from_epoch_ns(*_TIMESTAMP_V2.unpack_from(self._buf, pos))
+        return self._timestamp
+    
+    @property
+    def schema_id(self) -> int:
+        """Payload schema ID."""
+        return _U32.unpack_from(self._buf, self._schema_pos)[0]
+    
+    @property
+    def priority(self) -> Priority:
+        """Envelope priority."""
+        return _PRIORITIES[self._buf[self._schema_pos + 4]]
+    
+    @property
+    def topic(self) -> str:
+        """Envelope topic."""
+        if self._topic is None:
+            pos = self._schema_pos + 5
+            topic_len, = _U16.unpack_from(self._buf, pos)
+            pos += 2
+            self._topic = str(self._buf[pos:pos+topic_len], 'utf-8')
+            self._payload_pos = pos + topic_len
+        return self._topic
+    
+    @property
+    def payload_size(self) -> int:
+        """Payload length in bytes."""
+        if self._payload_pos is None:
+            self.topic
+        return _U32.unpack_from(self._buf, self._payload_pos)[0]
+    
+    @property
+    def payload(self) -> memoryview:
+        """Zero-copy view of the payload bytes."""
+        size = self.payload_size
+        pos = self._payload_pos + 4
+        return self._buf[pos:pos+size]
+    
+    @property
+    def metadata(self) -> EnvelopeMetadata:
+        """Envelope metadata (source node, sequence number, fragment/FEC info)."""
+        if self._metadata is None:
+            self._metadata = self._parse_metadata()
+        return self._metadata
+    
+    def _parse_metadata(self) -> EnvelopeMetadata:
+        """Parse the metadata section that follows the payload."""
+        if self._sequence_pos is None:
+            payload_size = self.payload_size     # Locates the payload first
+            pos = self._payload_pos + 4 + payload_size
+            source_node_len, = _U16.unpack_from(self._buf, pos)
+            pos += 2
+            source_node = str(self._buf[pos:pos+source_node_len], 'utf-8')
+            pos += source_node_len
+        else:
+            source_node = self._source_node
+            pos = self._sequence_pos
+        sequence_number, = _U32.unpack_from(self._buf, pos)
+        pos += 4
+        
+        sections = self._buf[pos]
+        pos += 1
+        
+        fragment_info: Optional[FragmentInfo] = None
+        if sections & SECTION_FRAGMENT:
+            frag_id, total_frags, frag_offset, frag_length = _FRAGMENT.unpack_from(self._buf, pos)
+            msg_pos = pos + _FRAGMENT.size
+            fragment_info = FragmentInfo(
+                fragment_id=frag_id,
+                total_fragments=total_frags,
+                offset=frag_offset,
+                length=frag_length,
+                message_id=UUID(bytes=bytes(self._buf[msg_pos:msg_pos+16]))
+            )
+            pos = msg_pos + 16
+        
+        fec_info: Optional[FecInfo] = None
+        if sections & SECTION_FEC:
+            k, m, block_id, index = _FEC.unpack_from(self._buf, pos)
+            fec_info = FecInfo(k=k, m=m, block_id=block_id, index=index)
+            pos += _FEC.size
+        if pos != self._end:
+            raise ValueError(
+                f"Frame length mismatch: fields end at {pos}, frame ends at {self._end}"
+            )
+        
+        is_delta = False
+        if self.version >= 2:
+            is_delta = bool(self._buf[self._offset + _FRAME_HEADER.size + 24] & FLAG_DELTA)
+        
+        return EnvelopeMetadata(
+            source_node=source_node,
+            sequence_number=sequence_number,
+            fragment_info=fragment_info,
+            fec_info=fec_info,
+            is_delta=is_delta
+        )
+    
+    def to_envelope(self) -> Envelope:
+        """
+        Materialize a regular Envelope (copies the payload).
+        
+        Returns:
+            Fully decoded envelope
+        """
+        return Envelope(
+            id=self.id,
+            timestamp=self.timestamp,
+            schema_id=self.schema_id,
+            priority=self.priority,
+            topic=self.topic,
+            payload=bytes(self.payload),
+            metadata=self.metadata
+        )
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for a stream of concatenated ProtobufCodec frames.
+    
+    Bytes can be fed in arbitrary chunks (socket reads, file blocks): frames
+    split across chunks are buffered until complete. After corruption the
+    decoder resynchronizes by scanning for the next 0xAA 0xBB magic followed
+    by a plausible header, so one bad frame costs only itself.
+    
+    Example:
+        decoder = FrameDecoder()
+        while chunk := sock.recv(65536):
+            for envelope in decoder.feed(chunk):
+                handle(envelope)
+    """
+    
+    def __init__(
+        self,
+        codec: Optional[ProtobufCodec] = None,
+        max_frame_size: int = 16 * 1024 * 1024
+    ):
+        """
+        Initialize decoder.
+        
+        Args:
+            codec: Codec used to decode each frame (keeps its string table
+                across frames); a new ProtobufCodec by default
+            max_frame_size: Largest accepted frame body; bigger length
+                fields are treated as corruption
+        """
+        self.codec = codec if codec is not None else ProtobufCodec()
+        self.max_frame_size = max_frame_size
+        self._buf = bytearray()
+        
+        # Statistics
+        self.frames_decoded = 0
+        self.bytes_skipped = 0
+        self.errors = 0
+        self.last_error: Optional[Exception] = None
+    
+    @property
+    def pending(self) -> int:
+        """Bytes buffered while waiting for the rest of a frame."""
+        return len(self._buf)
+    
+    def reset(self) -> None:
+        """Discard buffered bytes (e.g. after reconnecting)."""
+        self._buf.clear()
+    
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> Iterator[Envelope]:
+        """
+        Add received bytes and decode every frame completed by them.
+        
+        Corrupted frames are skipped (counted in ``errors``, with the cause
+        in ``last_error``) rather than raised, so one bad frame never stalls
+        the stream.
+        
+        Args:
+            data: Next chunk of the byte stream
+        
+        Returns:
+            Iterator over the decoded envelopes, in stream order
+        """
+        buf = self._buf
+        buf += data
+        magic = ProtobufCodec.MAGIC
+        header_size = _FRAME_HEADER.size
+        supported = self.codec.SUPPORTED_VERSIONS
+        envelopes = []
+        pos = 0
+        
+        while True:
+            start = buf.find(magic, pos)
+            if start < 0:
+                # Keep a trailing first magic byte: the second may be in the next
+                # chunk (unless it ended a frame that was just decoded)
+                keep = max(pos, len(buf) - 1 if buf[-1:] == magic[:1] else len(buf))
+                self.bytes_skipped += keep - pos
+                pos = keep
+                break
+            self.bytes_skipped += start - pos
+            pos = start
+            
+            if len(buf) - pos < header_size:
+                break
+            _, version, body_len = _FRAME_HEADER.unpack_from(buf, pos)
+            if version not in supported or body_len > self.max_frame_size:
+                # Magic bytes inside other data, not a frame start
+                self.bytes_skipped += 1
+                pos += 1
+                continue
+            
+            end = pos + header_size + body_len
+            if end > len(buf):
+                break
+            
+            try:
+                # Decode a copy: a live view into the stream buffer would block resizing it
+                envelope, _ = self.codec._unpack_frame(buf[pos:end], 0)
+            except StringTableMiss as e:
+                # Well-formed frame the table cannot resolve: drop only this frame
+                self.errors += 1
+                self.last_error = e
+                pos = end
+                continue
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+                self.bytes_skipped += 1
+                pos += 1
+                continue
+            
+            envelopes.append(envelope)
+            pos = end
+        
+        del buf[:pos]
+        self.frames_decoded += len(envelopes)
+        return iter(envelopes)
@@ -1,16 +1,51 @@
 """
 ARIA SDK - Telemetry Compression Module
 
-Provides LZ4 and Zstd compression for telemetry payloads.
+Provides LZ4 and Zstd compression for telemetry payloads, per message or as
+stateful per-link streams.
 """
 
-from typing import Optional
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import os
+import struct
+import threading
+import time
+import lz4.block
 import lz4.frame
 import zstandard as zstd
 
 from aria_sdk.domain.protocols import ICompressor
 
 
+Buffer = Union[bytearray, memoryview]
+
+
+def _copy_into(data: bytes, out: Buffer) -> int:
+    """Copy data to the start of out; returns the length written."""
+    if len(data) > len(out):
+        raise ValueError(f"Output buffer too small: need {len(data)} bytes, have {len(out)}")
+    memoryview(out)[:len(data)] = data
+    return len(data)
+
+
+def _read_into(reader, out: Buffer) -> int:
+    """Drain a zstandard stream reader into out; returns the length written."""
+    view = memoryview(out)
+    pos = 0
+    while pos < len(view):
+        n = reader.readinto(view[pos:])
+        if not n:
+            return pos
+        pos += n
+    if reader.read(1):
+        raise ValueError(f"Output buffer too small: have {len(view)} bytes")
+    return pos
+
+
 class Lz4Compressor(ICompressor):
     """
     LZ4 compression - optimized for speed and low latency.
@@ -35,10 +70,10 @@ class Lz4Compressor(ICompressor):
         
         Args:
             data: Raw bytes to compress
-            
+        
         Returns:
             Compressed bytes
-            
+        
         Raises:
             RuntimeError: If compression fails
         """
@@ -57,10 +92,10 @@ class Lz4Compressor(ICompressor):
         
         Args:
             data: Compressed bytes
-            
+        
         Returns:
             Decompressed bytes
-            
+        
         Raises:
             RuntimeError: If decompression fails
         """
@@ -68,6 +103,55 @@ class Lz4Compressor(ICompressor):
             return lz4.frame.decompress(data)
         except Exception as e:
             raise RuntimeError(f"LZ4 decompression failed: {e}") from e
+    
+    def compress_bound(self, size: int) -> int:
+        """Upper bound of the compressed size of ``size`` input bytes."""
+        blocks = size // lz4.frame.BLOCKSIZE_MAX1MB + 1
+        return size + size // 255 + 16 * blocks + 32
+    
+    def compress_into(self, data: bytes, out: Buffer) -> int:
+        """
+        Compress data into a caller-supplied buffer.
+        
+        The lz4 bindings have no output-buffer API, so this compresses and
+        copies: every call still allocates one output object. It exists so
+        LZ4 and Zstd are interchangeable for pooled callers; use
+        ZstdCompressor (level 1 is close to LZ4 speed) where the per-message
+        allocation matters.
+        
+        Args:
+            data: Raw bytes to compress
+            out: Destination (at least compress_bound(len(data)) bytes)
+        
+        Returns:
+            Number of bytes written to the start of out
+        
+        Raises:
+            RuntimeError: If compression fails or out is too small
+        """
+        try:
+            return _copy_into(self.compress(data), out)
+        except Exception as e:
+            raise RuntimeError(f"LZ4 compression failed: {e}") from e
+    
+    def decompress_into(self, data: bytes, out: Buffer) -> int:
+        """
+        Decompress LZ4 data into a caller-supplied buffer (copies, see compress_into).
+        
+        Args:
+            data: Compressed bytes
+            out: Destination buffer
+        
+        Returns:
+            Number of bytes written to the start of out
+        
+        Raises:
+            RuntimeError: If decompression fails or out is too small
+        """
+        try:
+            return _copy_into(lz4.frame.decompress(data), out)
+        except Exception as e:
+            raise RuntimeError(f"LZ4 decompression failed: {e}") from e
 
 
 class ZstdCompressor(ICompressor):
@@ -77,18 +161,124 @@ class ZstdCompressor(ICompressor):
     Best for: Batch telemetry, recorded data, archival
     Compression ratio: ~3-5x
     Speed: Fast (~250 MB/s)
+    
+    Small messages (e.g. 60-200 byte detection JSON) barely compress on their
+    own. Train a dictionary on a sample corpus (a recorded session, a MEDA
+    sol) with train_dictionary() and pass it as ``dictionary``: every frame
+    then carries the dictionary ID in its zstd header, and decompress()
+    picks the matching dictionary from the ones registered with
+    add_dictionary() or found in ``dictionary_dir``.
     """
     
-    def __init__(self, level: int = 3):
+    DICT_SUFFIX = '.zdict'
+    
+    def __init__(
+        self,
+        level: int = 3,
+        dictionary: Optional[zstd.ZstdCompressionDict] = None,
+        dictionary_dir: Optional[Union[str, Path]] = None
+    ):
         """
         Initialize Zstd compressor.
         
         Args:
             level: Compression level (1-22). 3=default, 22=max compression
+            dictionary: Dictionary to compress with (also registered for decompression)
+            dictionary_dir: Directory searched for ``<dict_id>.zdict`` files when a
+                frame references an unknown dictionary
         """
         self.level = max(1, min(22, level))
-        self.cctx = zstd.ZstdCompressor(level=self.level)
+        self.dictionary = dictionary
+        self.dictionary_dir = Path(dictionary_dir) if dictionary_dir else None
+        if dictionary is not None:
+            dictionary.precompute_compress(level=self.level)
+            self.cctx = zstd.ZstdCompressor(level=self.level, dict_data=dictionary)
+        else:
+            self.cctx = zstd.ZstdCompressor(level=self.level)
         self.dctx = zstd.ZstdDecompressor()
+        
+        # Decompression contexts by dictionary ID
+        self._dict_dctx: Dict[int, zstd.ZstdDecompressor] = {}
+        if dictionary is not None:
+            self.add_dictionary(dictionary)
+    
+    @staticmethod
+    def train_dictionary(
+        samples: Iterable[bytes],
+        dict_size: int = 16 * 1024,
+        dict_id: int = 0,
+        level: int = 3
+    ) -> zstd.ZstdCompressionDict:
+        """
+        Train a dictionary from representative messages.
+        
+        Args:
+            samples: Sample messages (a few hundred or more, each as sent)
+            dict_size: Maximum dictionary size in bytes
+            dict_id: Dictionary ID written to each frame (0 = random)
+            level: Compression level the dictionary is tuned for
+        
+        Returns:
+            Trained dictionary
+        
+        Raises:
+            RuntimeError: If training fails (e.g. too few samples)
+        """
+        try:
+            return zstd.train_dictionary(dict_size, list(samples), dict_id=dict_id, level=level)
+        except Exception as e:
+            raise RuntimeError(f"Zstd dictionary training failed: {e}") from e
+    
+    @classmethod
+    def save_dictionary(
+        cls,
+        dictionary: zstd.ZstdCompressionDict,
+        directory: Union[str, Path]
+    ) -> Path:
+        """
+        Write a dictionary as ``<dict_id>.zdict`` (the name load_dictionaries expects).
+        
+        Args:
+            dictionary: Dictionary to save
+            directory: Target directory (created if missing)
+        
+        Returns:
+            Path of the written file
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{dictionary.dict_id()}{cls.DICT_SUFFIX}"
+        path.write_bytes(dictionary.as_bytes())
+        return path
+    
+    def add_dictionary(self, dictionary: zstd.ZstdCompressionDict) -> int:
+        """
+        Register a dictionary for decompression.
+        
+        Args:
+            dictionary: Dictionary to register
+        
+        Returns:
+            The dictionary ID
+        """
+        dict_id = dictionary.dict_id()
+        self._dict_dctx[dict_id] = zstd.ZstdDecompressor(dict_data=dictionary)
+        return dict_id
+    
+    def load_dictionaries(self, directory: Union[str, Path]) -> int:
+        """
+        Register every ``*.zdict`` dictionary in a directory.
+        
+        Args:
+            directory: Directory holding saved dictionaries
+        
+        Returns:
+            Number of dictionaries loaded
+        """
+        paths = sorted(Path(directory).glob(f"*{self.DICT_SUFFIX}"))
+        for path in paths:
+            self.add_dictionary(zstd.ZstdCompressionDict(path.read_bytes()))
+        return len(paths)
     
     def compress(self, data: bytes) -> bytes:
         """
@@ -96,10 +286,10 @@ class ZstdCompressor(ICompressor):
         
         Args:
             data: Raw bytes to compress
-            
+        
         Returns:
             Compressed bytes
-            
+        
         Raises:
             RuntimeError: If compression fails
         """
@@ -114,17 +304,715 @@ class ZstdCompressor(ICompressor):
         
         Args:
             data: Compressed bytes
+        
+        Returns:
+            Decompressed bytes
+        
+        Raises:
+            RuntimeError: If decompression fails or the dictionary is unknown
+        """
+        try:
+            dict_id = zstd.get_frame_parameters(data).dict_id
+            return self._decompressor(dict_id).decompress(data)
+        except Exception as e:
+            raise RuntimeError(f"Zstd decompression failed: {e}") from e
+    
+    def compress_bound(self, size: int) -> int:
+        """Upper bound of the compressed size of ``size`` input bytes (ZSTD_compressBound)."""
+        margin = ((128 * 1024 - size) >> 11) if size < 128 * 1024 else 0
+        return size + (size >> 8) + margin
+    
+    def compress_into(self, data: bytes, out: Buffer) -> int:
+        """
+        Compress data into a caller-supplied buffer.
+        
+        The frame is streamed directly into out, with no intermediate
+        output object, whatever the message size.
+        
+        Args:
+            data: Raw bytes to compress
+            out: Destination (at least compress_bound(len(data)) bytes)
+        
+        Returns:
+            Number of bytes written to the start of out
+        
+        Raises:
+            RuntimeError: If compression fails or out is too small
+        """
+        try:
+            if not data:
+                # The stream reader never reaches EOF on empty input
+                return _copy_into(self.cctx.compress(data), out)
+            return _read_into(self.cctx.stream_reader(data, size=len(data)), out)
+        except Exception as e:
+            raise RuntimeError(f"Zstd compression failed: {e}") from e
+    
+    def decompress_into(self, data: bytes, out: Buffer) -> int:
+        """
+        Decompress Zstd data into a caller-supplied buffer.
+        
+        The content is streamed directly into out, with no intermediate
+        output object.
+        
+        Args:
+            data: Compressed bytes
+            out: Destination buffer
+        
+        Returns:
+            Number of bytes written to the start of out
+        
+        Raises:
+            RuntimeError: If decompression fails, the dictionary is unknown
+                or out is too small
+        """
+        try:
+            dctx = self._decompressor(zstd.get_frame_parameters(data).dict_id)
+            return _read_into(dctx.stream_reader(data), out)
+        except Exception as e:
+            raise RuntimeError(f"Zstd decompression failed: {e}") from e
+    
+    def _decompressor(self, dict_id: int) -> zstd.ZstdDecompressor:
+        """Decompression context for a frame's dictionary ID (0 = none)."""
+        if not dict_id:
+            return self.dctx
+        
+        dctx = self._dict_dctx.get(dict_id)
+        if dctx is None and self.dictionary_dir is not None:
+            path = self.dictionary_dir / f"{dict_id}{self.DICT_SUFFIX}"
+            if path.exists():
+                self.add_dictionary(zstd.ZstdCompressionDict(path.read_bytes()))
+                dctx = self._dict_dctx[dict_id]
+        if dctx is None:
+            raise ValueError(f"Unknown dictionary ID: {dict_id}")
+        return dctx
+
+
+class StreamDesync(RuntimeError):
+    """Raised when a stream chunk cannot be decoded because earlier chunks were lost."""
+    
+    def __init__(self, expected: int, received: int):
+        super().__init__(
+            f"Stream desynchronized: expected chunk {expected}, got {received} "
+            f"(waiting for a key chunk)"
+        )
+        self.expected = expected
+        self.received = received
+
+
+# Stream chunk header: tag (algorithm | STREAM_KEY), sequence number
+_STREAM_HEADER = struct.Struct('!BI')
+STREAM_KEY = 0x80           # Chunk starts a fresh context (decodable on its own)
+_STREAM_ALGOS = {'lz4': 0x01, 'zstd': 0x02}
+_SEQ_MASK = 0xFFFFFFFF
+
+
+class StreamCompressor:
+    """
+    Stateful per-link compressor that keeps its match window across messages.
+    
+    Each compress() call returns one self-contained chunk holding exactly the
+    given message (the context is flushed at the message boundary), but the
+    history window is kept, so consecutive similar envelopes on a link
+    compress against each other instead of each starting from scratch.
+    
+    Chunk format:
+    - Tag: 1 byte - algorithm ID, plus STREAM_KEY (0x80) on key chunks
+    - Sequence number: 4 bytes (big-endian uint32, wraps)
+    - Compressed data (LZ4: 4-byte size prefix + block; Zstd: flushed block)
+    
+    Semantics:
+    - A key chunk starts a fresh context and decodes without any history.
+      The first chunk, the first after reset(), and every ``key_interval``-th
+      chunk are key chunks.
+    - Any other chunk needs every previous chunk since the last key chunk.
+      After a loss the StreamDecompressor raises StreamDesync until the next
+      key chunk; call reset() (e.g. on a NACK) to force one early.
+    
+    LZ4 history is limited to ``window_size`` bytes (max 64 KB; re-loading a
+    large window costs time on every message). Zstd uses the level's window.
+    """
+    
+    LZ4_MAX_WINDOW = 64 * 1024
+    
+    def __init__(
+        self,
+        algo: str = 'zstd',
+        level: Optional[int] = None,
+        key_interval: Optional[int] = None,
+        window_size: int = 16 * 1024
+    ):
+        """
+        Initialize stream compressor.
+        
+        Args:
+            algo: Compression algorithm ('lz4' or 'zstd')
+            level: Compression level (None=default: LZ4 0, Zstd 3)
+            key_interval: Emit a key chunk every N chunks (None=only on reset)
+            window_size: LZ4 history size in bytes (ignored for Zstd)
+        """
+        algo = algo.lower()
+        if algo not in _STREAM_ALGOS:
+            raise ValueError(f"Unknown compression algorithm: {algo}. Use 'lz4' or 'zstd'")
+        if not 0 < window_size <= self.LZ4_MAX_WINDOW:
+            raise ValueError(
+                f"window_size must be in (0, {self.LZ4_MAX_WINDOW}], got {window_size}"
+            )
+        if key_interval is not None and key_interval < 1:
+            raise ValueError(f"key_interval must be >= 1, got {key_interval}")
+        
+        self.algo = algo
+        self.level = level if level is not None else (0 if algo == 'lz4' else 3)
+        self.key_interval = key_interval
+        self.window_size = window_size
+        self._tag = _STREAM_ALGOS[algo]
+        self._sequence = 0
+        self._since_key = 0
+        self._key_pending = True
+        
+        if algo == 'zstd':
+            self._cctx = zstd.ZstdCompressor(level=max(1, min(22, self.level)))
+            self._zstd_stream = None
+        self._history = b''
+    
+    def reset(self) -> None:
+        """Drop the history: the next chunk is a key chunk."""
+        self._key_pending = True
+    
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress one message into a chunk.
+        
+        Args:
+            data: Raw bytes (typically one encoded envelope)
+        
+        Returns:
+            Chunk (header + compressed data)
+        
+        Raises:
+            RuntimeError: If compression fails
+        """
+        try:
+            key = self._key_pending or (
+                self.key_interval is not None and self._since_key >= self.key_interval
+            )
+            if key:
+                self._history = b''
+                if self.algo == 'zstd':
+                    self._zstd_stream = self._cctx.compressobj()
+                self._key_pending = False
+                self._since_key = 0
+            
+            if self.algo == 'lz4':
+                body = self._compress_lz4(data)
+            else:
+                body = (self._zstd_stream.compress(data)
+                        + self._zstd_stream.flush(zstd.COMPRESSOBJ_FLUSH_BLOCK))
             
+            header = _STREAM_HEADER.pack(self._tag | (STREAM_KEY if key else 0), self._sequence)
+            self._sequence = (self._sequence + 1) & _SEQ_MASK
+            self._since_key += 1
+            return header + body
+        
+        except Exception as e:
+            # The context may be half-updated: start over with a key chunk
+            self._key_pending = True
+            raise RuntimeError(f"{self.algo.upper()} stream compression failed: {e}") from e
+    
+    def _compress_lz4(self, data: bytes) -> bytes:
+        """Compress an LZ4 block against the history window."""
+        if self.level >= 3:
+            body = lz4.block.compress(
+                data, mode='high_compression', compression=self.level, dict=self._history
+            )
+        else:
+            body = lz4.block.compress(data, dict=self._history)
+        self._history = (self._history + data)[-self.window_size:]
+        return body
+
+
+class StreamDecompressor:
+    """
+    Decoder for the chunks of one StreamCompressor.
+    
+    Chunks must be fed in order. A sequence gap (lost or reordered chunk)
+    raises StreamDesync, and every following non-key chunk is rejected the
+    same way until a key chunk restores the context.
+    """
+    
+    def __init__(self):
+        """Initialize stream decompressor (unsynced until the first key chunk)."""
+        self._expected: Optional[int] = None
+        self._algo: Optional[int] = None
+        self._zstd_stream = None
+        self._history = b''
+    
+    @property
+    def synced(self) -> bool:
+        """Whether the next in-sequence chunk can be decoded."""
+        return self._expected is not None
+    
+    def decompress(self, chunk: bytes) -> bytes:
+        """
+        Decompress one chunk back into its message.
+        
+        Args:
+            chunk: Chunk produced by StreamCompressor.compress
+        
         Returns:
             Decompressed bytes
+        
+        Raises:
+            StreamDesync: If earlier chunks are missing
+            RuntimeError: If the chunk is malformed
+        """
+        try:
+            tag, sequence = _STREAM_HEADER.unpack_from(chunk, 0)
+        except Exception as e:
+            raise RuntimeError(f"Stream decompression failed: {e}") from e
+        
+        algo = tag & ~STREAM_KEY
+        if algo not in _STREAM_ALGOS.values():
+            raise RuntimeError(f"Stream decompression failed: unknown algorithm {algo:#x}")
+        
+        if tag & STREAM_KEY:
+            self._algo = algo
+            self._history = b''
+            if algo == _STREAM_ALGOS['zstd']:
+                self._zstd_stream = zstd.ZstdDecompressor().decompressobj()
+        elif self._expected is None or sequence != self._expected or algo != self._algo:
+            expected = self._expected if self._expected is not None else -1
+            self._expected = None
+            raise StreamDesync(expected, sequence)
+        
+        body = memoryview(chunk)[_STREAM_HEADER.size:]
+        try:
+            if algo == _STREAM_ALGOS['lz4']:
+                data = lz4.block.decompress(body, dict=self._history)
+                self._history = (self._history + data)[-StreamCompressor.LZ4_MAX_WINDOW:]
+            else:
+                data = self._zstd_stream.decompress(body)
+        except Exception as e:
+            self._expected = None
+            raise RuntimeError(f"Stream decompression failed: {e}") from e
+        
+        self._expected = (sequence + 1) & _SEQ_MASK
+        return data
+
+
+# Parallel container header: magic, version, algorithm, block size, total size, block count
+_PARALLEL_HEADER = struct.Struct('!2sBBIQI')
+
+
+class ParallelCompressor(ICompressor):
+    """
+    Multi-threaded block compressor for large payloads (camera frames,
+    recorded sessions).
+    
+    The input is split into ``block_size`` blocks that are compressed
+    independently on a thread pool (lz4 and zstandard release the GIL, so
+    throughput scales with cores). Independent blocks also make the output
+    randomly accessible: decompress_block() decodes one block without
+    touching the others.
+    
+    The thread pool is created on first use; call close() or use the
+    compressor as a context manager to shut its threads down.
+    
+    Container format:
+    - Header: magic 'PC', version, algorithm ID, block size (uint32),
+      total uncompressed size (uint64), block count N (uint32)
+    - Index: N x uint32 compressed block lengths
+    - Blocks: raw LZ4 blocks or Zstd frames. A block whose stored length
+      equals its uncompressed length is stored uncompressed (incompressible
+      data never expands by more than the index entry).
+    """
+    
+    MAGIC = b'PC'
+    VERSION = 1
+    
+    def __init__(
+        self,
+        algo: str = 'zstd',
+        level: Optional[int] = None,
+        block_size: int = 1024 * 1024,
+        workers: Optional[int] = None
+    ):
+        """
+        Initialize parallel compressor.
+        
+        Args:
+            algo: Compression algorithm ('lz4' or 'zstd')
+            level: Compression level (None=default: LZ4 0, Zstd 3)
+            block_size: Uncompressed bytes per block
+            workers: Thread pool size (None=CPU count)
+        """
+        algo = algo.lower()
+        if algo not in _STREAM_ALGOS:
+            raise ValueError(f"Unknown compression algorithm: {algo}. Use 'lz4' or 'zstd'")
+        if block_size < 1:
+            raise ValueError(f"block_size must be >= 1, got {block_size}")
+        
+        self.algo = algo
+        self.level = level if level is not None else (0 if algo == 'lz4' else 3)
+        self.block_size = block_size
+        self.workers = workers or os.cpu_count() or 1
+        self._algo_id = _STREAM_ALGOS[algo]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()     # Per-thread Zstd contexts (not thread-safe)
+    
+    @property
+    def name(self) -> str:
+        return f"parallel-{self.algo}"
+    
+    def close(self) -> None:
+        """Shut down the worker threads (recreated on next use)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def __enter__(self) -> 'ParallelCompressor':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress data as independent blocks in parallel.
+        
+        Args:
+            data: Raw bytes to compress
+        
+        Returns:
+            Container bytes
+        
+        Raises:
+            RuntimeError: If compression fails
+        """
+        try:
+            view = memoryview(data).cast('B')
+            blocks = [view[i:i+self.block_size] for i in range(0, len(view), self.block_size)]
+            compressed = self._map(self._compress_block, blocks)
             
+            header = _PARALLEL_HEADER.pack(
+                self.MAGIC, self.VERSION, self._algo_id, self.block_size, len(view), len(blocks)
+            )
+            index = struct.pack(f'!{len(blocks)}I', *map(len, compressed))
+            return b''.join((header, index, *compressed))
+        
+        except Exception as e:
+            raise RuntimeError(f"Parallel {self.algo.upper()} compression failed: {e}") from e
+    
+    def decompress(self, data: bytes) -> bytes:
+        """
+        Decompress a whole container in parallel.
+        
+        Args:
+            data: Container bytes
+        
+        Returns:
+            Decompressed bytes
+        
         Raises:
             RuntimeError: If decompression fails
         """
         try:
-            return self.dctx.decompress(data)
+            layout = self._parse(data)
+            view = memoryview(data)
+            jobs = [(view[start:end], raw_len) for start, end, raw_len in layout]
+            return b''.join(self._map(lambda job: self._decompress_block(*job), jobs))
         except Exception as e:
-            raise RuntimeError(f"Zstd decompression failed: {e}") from e
+            raise RuntimeError(f"Parallel decompression failed: {e}") from e
+    
+    def block_count(self, data: bytes) -> int:
+        """Number of blocks in a container."""
+        return _PARALLEL_HEADER.unpack_from(data, 0)[5]
+    
+    def decompress_block(self, data: bytes, index: int) -> bytes:
+        """
+        Decompress a single block (random access).
+        
+        Block ``i`` holds uncompressed bytes ``[i * block_size, (i + 1) * block_size)``.
+        
+        Args:
+            data: Container bytes
+            index: Block index
+        
+        Returns:
+            Decompressed block
+        
+        Raises:
+            IndexError: If index is out of range
+            RuntimeError: If decompression fails
+        """
+        try:
+            layout = self._parse(data)
+        except Exception as e:
+            raise RuntimeError(f"Parallel decompression failed: {e}") from e
+        if not 0 <= index < len(layout):
+            raise IndexError(f"Block {index} out of range (container has {len(layout)} blocks)")
+        start, end, raw_len = layout[index]
+        try:
+            return self._decompress_block(memoryview(data)[start:end], raw_len)
+        except Exception as e:
+            raise RuntimeError(f"Parallel decompression of block {index} failed: {e}") from e
+    
+    def _map(self, func, items: list) -> list:
+        """Run func over items on the pool (inline when there is nothing to parallelize)."""
+        if len(items) < 2 or self.workers < 2:
+            return [func(item) for item in items]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='aria-compress'
+            )
+        return list(self._executor.map(func, items))
+    
+    def _parse(self, data: bytes) -> List[Tuple[int, int, int]]:
+        """Validate the header; returns (start, end, uncompressed length) per block."""
+        if len(data) < _PARALLEL_HEADER.size:
+            raise ValueError(f"Truncated header: {len(data)} bytes")
+        magic, version, algo_id, block_size, total, count = _PARALLEL_HEADER.unpack_from(data, 0)
+        if magic != self.MAGIC:
+            raise ValueError(f"Invalid magic bytes: {magic.hex()}")
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported version: {version}")
+        if algo_id != self._algo_id:
+            raise ValueError(f"Container uses algorithm {algo_id:#x}, expected {self.algo}")
+        
+        lengths = struct.unpack_from(f'!{count}I', data, _PARALLEL_HEADER.size)
+        pos = _PARALLEL_HEADER.size + 4 * count
+        layout = []
+        for i, length in enumerate(lengths):
+            raw_len = min(block_size, total - i * block_size)
+            layout.append((pos, pos + length, raw_len))
+            pos += length
+        if pos != len(data):
+            raise ValueError(
+                f"Container length mismatch: blocks end at {pos}, data is {len(data)} bytes"
+            )
+        return layout
+    
+    def _compress_block(self, block: memoryview) -> bytes:
+        """Compress one block (runs on a worker thread)."""
+        if self.algo == 'lz4':
+            if self.level >= 3:
+                compressed = lz4.block.compress(
+                    block, mode='high_compression', compression=self.level, store_size=False
+                )
+            else:
+                compressed = lz4.block.compress(block, store_size=False)
+        else:
+            cctx = getattr(self._local, 'cctx', None)
+            if cctx is None:
+                cctx = self._local.cctx = zstd.ZstdCompressor(level=max(1, min(22, self.level)))
+            compressed = cctx.compress(block)
+        
+        # Incompressible: store as is
+        return compressed if len(compressed) < len(block) else bytes(block)
+    
+    def _decompress_block(self, block: memoryview, raw_len: int) -> bytes:
+        """Decompress one block (runs on a worker thread)."""
+        if len(block) == raw_len:
+            return bytes(block)
+        if self.algo == 'lz4':
+            return lz4.block.decompress(block, uncompressed_size=raw_len)
+        dctx = getattr(self._local, 'dctx', None)
+        if dctx is None:
+            dctx = self._local.dctx = zstd.ZstdDecompressor()
+        return dctx.decompress(block, max_output_size=raw_len)
+
+
+_ADAPTIVE_ALGOS = {'none': 0x00, 'lz4': 0x01, 'zstd': 0x02}
+_ADAPTIVE_NAMES = {algo_id: name for name, algo_id in _ADAPTIVE_ALGOS.items()}
+
+
+class AdaptiveCompressor(ICompressor):
+    """
+    Per-topic compressor that learns which codec and level to use.
+    
+    Each topic is sampled periodically: the payload is compressed with every
+    candidate (codec, level), and the measured cost (ns per input byte) and
+    savings are folded into per-topic moving averages. The topic then uses
+    the candidate with the highest savings whose cost fits ``cpu_budget``
+    (the cheapest one among near-ties). If no candidate saves at least
+    ``min_savings`` (e.g. random image noise), the topic is sent
+    uncompressed. Any single message that would not shrink is sent
+    uncompressed as well.
+    
+    Frame format:
+    - Tag: 1 byte - algorithm (bits 5-7: 0 none, 1 LZ4, 2 Zstd) | level (bits 0-4)
+    - Body: raw payload, LZ4 block (with 4-byte size prefix) or Zstd frame
+    
+    Decoding needs only the tag, so the receiver never has to know the
+    sender's choices.
+    """
+    
+    CANDIDATES = (('lz4', 0), ('lz4', 9), ('zstd', 1), ('zstd', 3), ('zstd', 9))
+    SAVINGS_TOLERANCE = 0.01    # Savings this close count as a tie (cheaper wins)
+    
+    def __init__(
+        self,
+        cpu_budget: float = 50.0,
+        min_savings: float = 0.1,
+        sample_interval: int = 64,
+        candidates: Iterable[Tuple[str, int]] = CANDIDATES,
+        smoothing: float = 0.3,
+        max_topics: int = 1024
+    ):
+        """
+        Initialize adaptive compressor.
+        
+        Args:
+            cpu_budget: Maximum compression cost in ns per input byte
+                (50 ns/B = 20 MB/s)
+            min_savings: Minimum fraction of bytes saved to compress at all
+            sample_interval: Re-evaluate a topic every N messages
+            candidates: (algorithm, level) pairs to choose from
+            smoothing: Weight of the newest sample in the moving averages
+            max_topics: Topics to keep learned state for (least recently
+                used topics are forgotten and re-sampled when they return)
+        """
+        self.candidates = tuple(candidates)
+        for algo, level in self.candidates:
+            if algo not in ('lz4', 'zstd') or not 0 <= level < 32:
+                raise ValueError(f"Invalid candidate: ({algo!r}, {level})")
+        if sample_interval < 1:
+            raise ValueError(f"sample_interval must be >= 1, got {sample_interval}")
+        if max_topics < 1:
+            raise ValueError(f"max_topics must be >= 1, got {max_topics}")
+        self.cpu_budget = cpu_budget
+        self.min_savings = min_savings
+        self.sample_interval = sample_interval
+        self.smoothing = smoothing
+        self.max_topics = max_topics
+        
+        # Contexts are built (and warmed) up front so sampling times only compression
+        self._zstd_cctx: Dict[int, zstd.ZstdCompressor] = {}
+        for algo, level in self.candidates:
+            if algo == 'zstd' and level not in self._zstd_cctx:
+                cctx = self._zstd_cctx[level] = zstd.ZstdCompressor(level=max(1, min(22, level)))
+                cctx.compress(b'')
+        self._zstd_dctx = zstd.ZstdDecompressor()
+        # Per topic (LRU order): messages since last sample, current choice,
+        # candidate -> [savings, ns/B]
+        self._topics: "OrderedDict[str, list]" = OrderedDict()
+    
+    @property
+    def name(self) -> str:
+        return "adaptive"
+    
+    def choice(self, topic: str) -> Tuple[str, int]:
+        """Current (algorithm, level) for a topic ('none' before the first sample)."""
+        state = self._topics.get(topic)
+        return state[1] if state is not None else ('none', 0)
+    
+    @staticmethod
+    def frame_algorithm(data: bytes) -> Tuple[str, int]:
+        """(algorithm, level) recorded in a frame's tag."""
+        return _ADAPTIVE_NAMES[data[0] >> 5], data[0] & 0x1F
+    
+    def compress(self, data: bytes, topic: str = '') -> bytes:
+        """
+        Compress data with the codec chosen for its topic.
+        
+        Args:
+            data: Raw bytes to compress
+            topic: Stream the data belongs to (choices are learned per topic)
+        
+        Returns:
+            Tagged frame
+        
+        Raises:
+            RuntimeError: If compression fails
+        """
+        try:
+            state = self._topics.get(topic)
+            if state is None:
+                state = self._topics[topic] = [0, ('none', 0), {}]
+                if len(self._topics) > self.max_topics:
+                    self._topics.popitem(last=False)
+            else:
+                self._topics.move_to_end(topic)
+            
+            if state[0] % self.sample_interval == 0:
+                algo, level, body = self._sample(data, state)
+            else:
+                algo, level = state[1]
+                body = self._compress_with(algo, level, data) if algo != 'none' else data
+            state[0] += 1
+            
+            if algo == 'none' or len(body) >= len(data):
+                return bytes((_ADAPTIVE_ALGOS['none'] << 5,)) + data
+            return bytes(((_ADAPTIVE_ALGOS[algo] << 5) | level,)) + body
+        
+        except Exception as e:
+            raise RuntimeError(f"Adaptive compression failed: {e}") from e
+    
+    def decompress(self, data: bytes) -> bytes:
+        """
+        Decompress a tagged frame.
+        
+        Args:
+            data: Frame produced by compress()
+        
+        Returns:
+            Decompressed bytes
+        
+        Raises:
+            RuntimeError: If decompression fails
+        """
+        try:
+            algo_id = data[0] >> 5
+            body = memoryview(data)[1:]
+            if algo_id == _ADAPTIVE_ALGOS['none']:
+                return bytes(body)
+            if algo_id == _ADAPTIVE_ALGOS['lz4']:
+                return lz4.block.decompress(body)
+            if algo_id == _ADAPTIVE_ALGOS['zstd']:
+                return self._zstd_dctx.decompress(body)
+            raise ValueError(f"Unknown algorithm tag: {data[0]:#04x}")
+        except Exception as e:
+            raise RuntimeError(f"Adaptive decompression failed: {e}") from e
+    
+    def _compress_with(self, algo: str, level: int, data: bytes) -> bytes:
+        """Compress with one candidate."""
+        if algo == 'lz4':
+            if level >= 3:
+                return lz4.block.compress(data, mode='high_compression', compression=level)
+            return lz4.block.compress(data)
+        return self._zstd_cctx[level].compress(data)
+    
+    def _sample(self, data: bytes, state: list) -> Tuple[str, int, bytes]:
+        """Trial every candidate on data, update the topic averages and choice."""
+        stats = state[2]
+        size = max(len(data), 1)
+        outputs = {}
+        for candidate in self.candidates:
+            start = time.perf_counter_ns()
+            body = self._compress_with(*candidate, data)
+            cost = (time.perf_counter_ns() - start) / size
+            outputs[candidate] = body
+            
+            savings = 1.0 - len(body) / size
+            previous = stats.get(candidate)
+            if previous is None:
+                stats[candidate] = [savings, cost]
+            else:
+                previous[0] += self.smoothing * (savings - previous[0])
+                previous[1] += self.smoothing * (cost - previous[1])
+        
+        affordable = [c for c in self.candidates if stats[c][1] <= self.cpu_budget]
+        top = max((stats[c][0] for c in affordable), default=None)
+        if top is None or top < self.min_savings:
+            state[1] = ('none', 0)
+            return 'none', 0, data
+        
+        # Near-equal savings: take the cheapest
+        best = min(
+            (c for c in affordable if stats[c][0] >= top - self.SAVINGS_TOLERANCE),
+            key=lambda c: stats[c][1]
+        )
+        state[1] = best
+        return best[0], best[1], outputs[best]
 
 
 def get_compressor(algo: str, level: Optional[int] = None) -> ICompressor:
@@ -134,10 +1022,10 @@ def get_compressor(algo: str, level: Optional[int] = None) -> ICompressor:
     Args:
         algo: Compression algorithm ('lz4' or 'zstd')
         level: Compression level (None=default)
-        
+    
     Returns:
         Compressor instance
-        
+    
     Raises:
         ValueError: If algorithm is unknown
     """
@@ -149,3 +1037,86 @@ def get_compressor(algo: str, level: Optional[int] = None) -> ICompressor:
         return ZstdCompressor(level if level is not None else 3)
     else:
         raise ValueError(f"Unknown compression algorithm: {algo}. Use 'lz4' or 'zstd'")
+
+
+class BufferPool:
+    """
+    Bounded pool of reusable bytearrays for compress_into/decompress_into.
+    
+    One pool can be shared across the pipeline: at steady state every
+    message reuses a released buffer instead of allocating fresh output
+    objects. Requests larger than ``buffer_size`` get a one-off buffer that
+    is not kept, and at most ``max_buffers`` idle buffers are retained.
+    
+    Example:
+        pool = BufferPool(buffer_size=compressor.compress_bound(max_message))
+        with pool.buffer() as buf:
+            n = compressor.compress_into(message, buf)
+            sock.sendall(memoryview(buf)[:n])
+    
+    Data in a buffer is only valid until it is released. acquire() and
+    release() are guarded by a lock, so a pool can be shared between threads.
+    """
+    
+    def __init__(self, buffer_size: int = 64 * 1024, max_buffers: int = 32):
+        """
+        Initialize pool.
+        
+        Args:
+            buffer_size: Size of each pooled buffer in bytes
+            max_buffers: Maximum number of idle buffers kept
+        """
+        self.buffer_size = buffer_size
+        self.max_buffers = max_buffers
+        self._free: deque = deque()
+        self._lock = threading.Lock()
+        
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        """Number of idle buffers."""
+        return len(self._free)
+    
+    def acquire(self, size: Optional[int] = None) -> bytearray:
+        """
+        Get a buffer of at least ``size`` bytes (default buffer_size).
+        
+        Args:
+            size: Minimum size needed
+        
+        Returns:
+            A pooled buffer, or a one-off buffer if size exceeds buffer_size
+        """
+        if size is None or size <= self.buffer_size:
+            with self._lock:
+                if self._free:
+                    self.hits += 1
+                    return self._free.pop()
+                self.misses += 1
+            return bytearray(self.buffer_size)
+        with self._lock:
+            self.misses += 1
+        return bytearray(size)
+    
+    def release(self, buf: bytearray) -> None:
+        """
+        Return a buffer to the pool.
+        
+        Args:
+            buf: Buffer obtained from acquire()
+        """
+        if len(buf) == self.buffer_size:
+            with self._lock:
+                if len(self._free) < self.max_buffers:
+                    self._free.append(buf)
+    
+    @contextmanager
+    def buffer(self, size: Optional[int] = None) -> Iterator[bytearray]:
+        """Acquire a buffer for the duration of a with-block."""
+        buf = self.acquire(size)
+        try:
+            yield buf
+        finally:
+            self.release(buf)
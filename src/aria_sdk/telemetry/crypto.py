@@ -9,10 +9,20 @@ import nacl.secret
 import nacl.signing
 import nacl.encoding
 import nacl.utils
+import nacl.bindings
 
 from aria_sdk.domain.protocols import ICryptoBox
 
 
+# Ciphertext bytes added by sign-then-encrypt: nonce + Poly1305 MAC + Ed25519
+# signature (24 + 16 + 64; SecretBox and Box use the same nonce/MAC sizes)
+CRYPTO_OVERHEAD = (
+    nacl.secret.SecretBox.NONCE_SIZE
+    + nacl.secret.SecretBox.MACBYTES
+    + nacl.bindings.crypto_sign_BYTES
+)
+
+
 class CryptoBox(ICryptoBox):
     """
     NaCl-based cryptography: Ed25519 signatures + ChaCha20-Poly1305 encryption.
@@ -22,6 +32,9 @@ class CryptoBox(ICryptoBox):
     2. Encrypt (payload || signature) with ChaCha20-Poly1305 (confidentiality)
     """
     
+    # Bytes encrypt() adds to the plaintext
+    OVERHEAD = CRYPTO_OVERHEAD
+    
     def __init__(self, signing_key: Optional[bytes] = None, encryption_key: Optional[bytes] = None):
         """
         Initialize crypto box.
@@ -133,6 +146,9 @@ class AsymmetricCryptoBox(ICryptoBox):
     Better for multi-party communication where each party has public/private keys.
     """
     
+    # Bytes encrypt() adds to the plaintext
+    OVERHEAD = CRYPTO_OVERHEAD
+    
     def __init__(
         self,
         signing_key: Optional[bytes] = None,
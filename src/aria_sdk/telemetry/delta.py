@@ -4,9 +4,14 @@ ARIA SDK - Telemetry Delta Encoding Module
 Provides delta encoding for reducing bandwidth on similar consecutive payloads.
 """
 
-from typing import Optional
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Callable, Optional, Tuple, Union
+import struct
+
 import numpy as np
 
+from aria_sdk.domain.entities import Envelope
 from aria_sdk.domain.protocols import IDeltaCodec
 
 
@@ -28,7 +33,7 @@ class SimpleDeltaCodec(IDeltaCodec):
         
         Args:
             data: Current payload bytes
-            
+        
         Returns:
             Tuple of (encoded_bytes, is_delta)
             - If is_delta=True, encoded_bytes is XOR difference
@@ -54,10 +59,10 @@ class SimpleDeltaCodec(IDeltaCodec):
         Args:
             data: Encoded bytes (delta or full)
             is_delta: True if data is delta, False if full payload
-            
+        
         Returns:
             Decoded full payload
-            
+        
         Raises:
             RuntimeError: If delta decoding fails (missing previous)
         """
@@ -110,7 +115,7 @@ class AdaptiveDeltaCodec(IDeltaCodec):
         
         Args:
             data: Current payload bytes
-            
+        
         Returns:
             Tuple of (encoded_bytes, is_delta)
         """
@@ -155,3 +160,1043 @@ class AdaptiveDeltaCodec(IDeltaCodec):
     def reset(self):
         """Reset codec state."""
         self.previous = None
+
+
+# Sparse delta: full length, run count, then run starts, run lengths and
+# the new bytes of every run (little-endian so the arrays load without
+# byte swapping)
+_SPARSE_HEADER = struct.Struct('<II')
+_RUN_DTYPE = np.dtype('<u4')
+
+
+def _run_indices(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Flat byte indices covered by runs [start, start + length)."""
+    run_pos = np.cumsum(lengths) - lengths    # Position of each run in the flat output
+    return np.repeat(starts - run_pos, lengths) + np.arange(int(lengths.sum()), dtype=np.int64)
+
+
+class SparseDeltaCodec(IDeltaCodec):
+    """
+    Sparse delta encoding as runs of changed bytes.
+    
+    Instead of a full-length XOR buffer, a delta carries only the
+    (offset, length) of each run of changed bytes plus their new values,
+    so a 921,600-byte image with a small moving region costs a few KB
+    before compression. Runs separated by at most ``max_gap`` unchanged
+    bytes are merged, since each run costs 8 bytes of header.
+    
+    Encode and decode are vectorized with NumPy (no per-byte Python loops).
+    """
+    
+    def __init__(self, max_gap: int = 8, threshold: float = 0.9):
+        """
+        Initialize sparse delta codec.
+        
+        Args:
+            max_gap: Merge runs separated by at most this many unchanged bytes
+            threshold: Send a full payload if delta_size/full_size >= threshold
+        """
+        self.max_gap = max_gap
+        self.threshold = threshold
+        self.previous: Optional[bytes] = None
+    
+    def encode(self, data: bytes) -> tuple[bytes, bool]:
+        """
+        Encode data as sparse delta from previous.
+        
+        Args:
+            data: Current payload bytes
+        
+        Returns:
+            Tuple of (encoded_bytes, is_delta)
+            - If is_delta=True, encoded_bytes is the run list
+            - If is_delta=False, encoded_bytes is full payload (first frame,
+              size mismatch or delta not smaller than threshold)
+        """
+        data = bytes(data)
+        if self.previous is None or len(data) != len(self.previous):
+            self.previous = data
+            return (data, False)
+        
+        prev_array = np.frombuffer(self.previous, dtype=np.uint8)
+        curr_array = np.frombuffer(data, dtype=np.uint8)
+        changed = np.flatnonzero(prev_array != curr_array)
+        
+        if changed.size:
+            # Run boundaries: gaps wider than max_gap between changed bytes
+            breaks = np.flatnonzero(np.diff(changed) > self.max_gap + 1)
+            starts = changed[np.r_[0, breaks + 1]]
+            lengths = changed[np.r_[breaks, changed.size - 1]] + 1 - starts
+        else:
+            starts = lengths = np.empty(0, dtype=np.int64)
+        
+        self.previous = data
+        size = _SPARSE_HEADER.size + 2 * starts.size * _RUN_DTYPE.itemsize + int(lengths.sum())
+        if size >= self.threshold * len(data):
+            return (data, False)
+        
+        encoded = b''.join((
+            _SPARSE_HEADER.pack(len(data), starts.size),
+            starts.astype(_RUN_DTYPE).tobytes(),
+            lengths.astype(_RUN_DTYPE).tobytes(),
+            curr_array[_run_indices(starts, lengths)].tobytes(),
+        ))
+        return (encoded, True)
+    
+    def decode(self, data: bytes, is_delta: bool) -> bytes:
+        """
+        Decode sparse delta-encoded data.
+        
+        Args:
+            data: Encoded bytes (delta or full)
+            is_delta: True if data is delta, False if full payload
+        
+        Returns:
+            Decoded full payload
+        
+        Raises:
+            RuntimeError: If delta decoding fails (missing previous or
+                malformed delta)
+        """
+        if not is_delta:
+            self.previous = bytes(data)
+            return self.previous
+        
+        if self.previous is None:
+            raise RuntimeError("Cannot decode delta without previous frame")
+        
+        if len(data) < _SPARSE_HEADER.size:
+            raise RuntimeError(f"Truncated delta header: {len(data)} bytes")
+        
+        length, count = _SPARSE_HEADER.unpack_from(data, 0)
+        if length != len(self.previous):
+            raise RuntimeError(
+                f"Delta size mismatch: got {length}, expected {len(self.previous)}"
+            )
+        
+        runs_end = _SPARSE_HEADER.size + 2 * count * _RUN_DTYPE.itemsize
+        if runs_end > len(data):
+            raise RuntimeError(f"Truncated delta: {count} runs in {len(data)} bytes")
+        
+        runs = np.frombuffer(data, dtype=_RUN_DTYPE, count=2 * count, offset=_SPARSE_HEADER.size)
+        starts = runs[:count].astype(np.int64)
+        lengths = runs[count:].astype(np.int64)
+        if len(data) - runs_end != int(lengths.sum()):
+            raise RuntimeError(
+                f"Delta length mismatch: runs cover {int(lengths.sum())} bytes, "
+                f"got {len(data) - runs_end}"
+            )
+        if count and int((starts + lengths).max()) > length:
+            raise RuntimeError("Delta run out of range")
+        
+        curr_array = np.frombuffer(self.previous, dtype=np.uint8).copy()
+        curr_array[_run_indices(starts, lengths)] = np.frombuffer(
+            data, dtype=np.uint8, offset=runs_end
+        )
+        
+        self.previous = curr_array.tobytes()
+        return self.previous
+    
+    def reset(self):
+        """Reset codec state."""
+        self.previous = None
+
+
+# Numeric delta: packing mode, bit width (bit-packed mode), value count
+_NUMERIC_HEADER = struct.Struct('<BBI')
+
+NUMERIC_VARINT = 0      # Zigzag LEB128 varints
+NUMERIC_BITPACK = 1     # Zigzag values bit-packed at a fixed width
+NUMERIC_RAW = 2         # Raw values (non-finite or out of range); resets the stream
+
+_MAX_VARINT_BYTES = 10
+
+# Largest quantized magnitude: second differences (4x) still fit in int64
+_QUANTIZED_LIMIT = 1 << 60
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    """Map signed int64 to uint64 so small magnitudes become small numbers."""
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    """Inverse of _zigzag."""
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Bit length of each uint64 (0 for 0)."""
+    lengths = np.zeros(values.shape, dtype=np.int64)
+    remaining = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = remaining >= (np.uint64(1) << np.uint64(shift))
+        lengths[big] += shift
+        remaining[big] >>= np.uint64(shift)
+    return lengths + (remaining > 0)
+
+
+def _varint_encode(values: np.ndarray, nbytes: np.ndarray) -> bytes:
+    """LEB128-encode uint64 values, given the byte count of each."""
+    offsets = np.cumsum(nbytes) - nbytes
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    for j in range(int(nbytes.max(initial=0))):
+        mask = nbytes > j
+        group = (values[mask] >> np.uint64(7 * j)) & np.uint64(0x7F)
+        more = (nbytes[mask] > j + 1).astype(np.uint64) << np.uint64(7)
+        out[offsets[mask] + j] = group | more
+    return out.tobytes()
+
+
+def _varint_decode(data: np.ndarray, count: int) -> np.ndarray:
+    """Decode exactly count LEB128 uint64 values."""
+    ends = np.flatnonzero(data < 0x80)
+    if ends.size != count or (count and ends[-1] != data.size - 1):
+        raise RuntimeError(f"Varint count mismatch: expected {count}, got {ends.size}")
+    starts = np.r_[0, ends[:-1] + 1]
+    lengths = ends - starts + 1
+    if count and int(lengths.max()) > _MAX_VARINT_BYTES:
+        raise RuntimeError("Varint too long")
+    
+    values = np.zeros(count, dtype=np.uint64)
+    for j in range(int(lengths.max(initial=0))):
+        mask = lengths > j
+        group = data[starts[mask] + j].astype(np.uint64) & np.uint64(0x7F)
+        values[mask] |= group << np.uint64(7 * j)
+    return values
+
+
+def _bitpack(values: np.ndarray, width: int) -> bytes:
+    """Pack uint64 values at a fixed bit width (LSB first)."""
+    bits = (values[:, None] >> np.arange(width, dtype=np.uint64)) & np.uint64(1)
+    return np.packbits(bits.astype(np.uint8), bitorder='little').tobytes()
+
+
+def _bitunpack(data: np.ndarray, count: int, width: int) -> np.ndarray:
+    """Inverse of _bitpack."""
+    if data.size != (count * width + 7) // 8:
+        raise RuntimeError(
+            f"Bit-packed length mismatch: {data.size} bytes for {count} x {width} bits"
+        )
+    bits = np.unpackbits(data, count=count * width, bitorder='little').reshape(count, width)
+    weights = np.uint64(1) << np.arange(width, dtype=np.uint64)
+    return (bits.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+
+
+class NumericDeltaCodec(IDeltaCodec):
+    """
+    Typed delta codec for numeric sensor arrays.
+    
+    XOR on raw bytes is a poor predictor for floats: a tiny change in
+    value flips many mantissa bits. This codec works on the values:
+    
+    1. Floats are quantized to fixed point with step 2*tolerance (so the
+       reconstruction error is at most ``tolerance``); ints are used as-is.
+    2. ``order``-th differences along the sample axis (1 = delta,
+       2 = delta of delta for smooth ramps), continuing from the previous
+       frame's last samples when one is available.
+    3. Residuals are zigzag-mapped and written as varints or bit-packed at
+       a fixed width, whichever is smaller.
+    
+    Data is a flat array of ``dtype`` values, interleaved by ``channels``
+    (e.g. channels=6 for IMU samples of accel + gyro). Quantization state
+    is carried between frames, so errors do not accumulate.
+    
+    Unlike the byte-level codecs, both delta and key frames (is_delta=False)
+    are encoded; a key frame just predicts from zero instead of the
+    previous frame.
+    """
+    
+    def __init__(
+        self,
+        dtype: Union[str, np.dtype] = '<f4',
+        tolerance: Optional[float] = None,
+        order: int = 1,
+        channels: int = 1
+    ):
+        """
+        Initialize numeric delta codec.
+        
+        Args:
+            dtype: Sample dtype (float or integer)
+            tolerance: Maximum absolute reconstruction error (required for
+                floats, must be None for ints)
+            order: Difference order (1 or 2)
+            channels: Interleaved channels per sample
+        
+        Raises:
+            ValueError: If the configuration is invalid
+        """
+        self.dtype = np.dtype(dtype)
+        if self.dtype.kind == 'f':
+            if tolerance is None or tolerance <= 0:
+                raise ValueError("Float dtypes require a positive tolerance")
+        elif self.dtype.kind in 'iu':
+            if tolerance is not None:
+                raise ValueError("Integer dtypes are lossless, tolerance must be None")
+        else:
+            raise ValueError(f"Unsupported dtype: {self.dtype}")
+        if order not in (1, 2):
+            raise ValueError(f"Invalid order: {order} (must be 1 or 2)")
+        if channels < 1:
+            raise ValueError(f"Invalid channels: {channels}")
+        
+        self.tolerance = tolerance
+        self.step = 2 * tolerance if tolerance is not None else None
+        self.order = order
+        self.channels = channels
+        # Last `order` quantized samples of the previous frame
+        self.previous: Optional[np.ndarray] = None
+    
+    def _samples(self, data: bytes) -> np.ndarray:
+        """View data as (samples, channels)."""
+        if len(data) % (self.dtype.itemsize * self.channels):
+            raise ValueError(
+                f"Data length {len(data)} is not a multiple of "
+                f"{self.channels} x {self.dtype.itemsize}-byte samples"
+            )
+        return np.frombuffer(data, dtype=self.dtype).reshape(-1, self.channels)
+    
+    def _history(self, is_delta: bool) -> np.ndarray:
+        """Prediction history: previous frame's tail, or zeros for a key frame."""
+        if is_delta:
+            return self.previous
+        return np.zeros((self.order, self.channels), dtype=np.int64)
+    
+    def encode(self, data: bytes) -> tuple[bytes, bool]:
+        """
+        Encode an array of samples.
+        
+        Args:
+            data: Raw sample bytes (or a contiguous array of ``dtype``)
+        
+        Returns:
+            Tuple of (encoded_bytes, is_delta)
+            - If is_delta=True, the first samples are predicted from the
+              previous frame
+            - If is_delta=False, the frame decodes on its own (first frame,
+              or a raw frame for NaN/inf or values too large to quantize)
+        
+        Raises:
+            ValueError: If data does not hold whole samples
+        """
+        samples = self._samples(data)
+        
+        if self.dtype.kind == 'f':
+            scaled = samples.astype(np.float64) / self.step
+            in_range = bool(np.all(np.abs(scaled) < _QUANTIZED_LIMIT))     # False for NaN/inf
+        else:
+            in_range = samples.size == 0 or (
+                int(samples.min()) > -_QUANTIZED_LIMIT and int(samples.max()) < _QUANTIZED_LIMIT
+            )
+        if not in_range:
+            # Values that cannot be quantized into int64 differences: send raw
+            # and restart the stream
+            self.previous = None
+            raw = samples.tobytes()
+            return (_NUMERIC_HEADER.pack(NUMERIC_RAW, 0, samples.size) + raw, False)
+        
+        if self.dtype.kind == 'f':
+            quantized = np.rint(scaled).astype(np.int64)
+        else:
+            quantized = samples.astype(np.int64)
+        
+        is_delta = self.previous is not None
+        history = self._history(is_delta)
+        residuals = np.diff(np.concatenate((history, quantized)), n=self.order, axis=0)
+        
+        if len(quantized):
+            self.previous = np.concatenate((history, quantized))[-self.order:]
+        elif not is_delta:
+            self.previous = history
+        
+        zigzag = _zigzag(residuals.ravel())
+        bit_lengths = _bit_length(zigzag)
+        width = int(bit_lengths.max(initial=0))
+        varint_bytes = np.maximum((bit_lengths + 6) // 7, 1)
+        
+        if (zigzag.size * width + 7) // 8 < int(varint_bytes.sum()):
+            body = _bitpack(zigzag, width)
+            header = _NUMERIC_HEADER.pack(NUMERIC_BITPACK, width, zigzag.size)
+        else:
+            body = _varint_encode(zigzag, varint_bytes)
+            header = _NUMERIC_HEADER.pack(NUMERIC_VARINT, 0, zigzag.size)
+        return (header + body, is_delta)
+    
+    def decode(self, data: bytes, is_delta: bool) -> bytes:
+        """
+        Decode an encoded frame back to raw sample bytes.
+        
+        Float samples are reconstructed to within ``tolerance`` (plus the
+        dtype's own rounding).
+        
+        Args:
+            data: Encoded bytes
+            is_delta: True if the frame predicts from the previous frame
+        
+        Returns:
+            Raw sample bytes of ``dtype``
+        
+        Raises:
+            RuntimeError: If decoding fails (missing previous or malformed data)
+        """
+        if len(data) < _NUMERIC_HEADER.size:
+            raise RuntimeError(f"Truncated delta header: {len(data)} bytes")
+        
+        mode, width, count = _NUMERIC_HEADER.unpack_from(data, 0)
+        if count % self.channels:
+            raise RuntimeError(f"Value count {count} is not a multiple of {self.channels} channels")
+        body = np.frombuffer(data, dtype=np.uint8, offset=_NUMERIC_HEADER.size)
+        
+        if mode == NUMERIC_RAW:
+            if body.size != count * self.dtype.itemsize:
+                raise RuntimeError(f"Raw length mismatch: {body.size} bytes for {count} values")
+            self.previous = None
+            return body.tobytes()
+        
+        if is_delta and self.previous is None:
+            raise RuntimeError("Cannot decode delta without previous frame")
+        
+        if mode == NUMERIC_VARINT:
+            zigzag = _varint_decode(body, count)
+        elif mode == NUMERIC_BITPACK:
+            zigzag = _bitunpack(body, count, width)
+        else:
+            raise RuntimeError(f"Unknown packing mode: {mode}")
+        
+        residuals = _unzigzag(zigzag).reshape(-1, self.channels)
+        history = self._history(is_delta)
+        
+        # Integrate order times, seeding each level with the history's last value
+        levels = [history]
+        for _ in range(self.order - 1):
+            levels.append(np.diff(levels[-1], axis=0))
+        quantized = residuals
+        for level in reversed(levels):
+            quantized = level[-1] + np.cumsum(quantized, axis=0)
+        
+        self.previous = np.concatenate((history, quantized))[-self.order:]
+        
+        if self.dtype.kind == 'f':
+            return (quantized * self.step).astype(self.dtype).tobytes()
+        return quantized.astype(self.dtype).tobytes()
+    
+    def reset(self):
+        """Reset codec state (next frame is a key frame)."""
+        self.previous = None
+
+
+# Delta stream frame: flags, sequence number, base sequence number
+_DELTA_STREAM_HEADER = struct.Struct('!BII')
+
+DELTA_KEY = 0x01        # Frame decodes without any previous frame
+
+_SEQ_MASK = 0xFFFFFFFF
+
+
+class DeltaStreamEncoder:
+    """
+    Wraps a delta codec with key-frame scheduling and sequence numbers.
+    
+    Each frame carries its own sequence number and the sequence number of
+    the frame it is a delta against, so the receiver can tell when its
+    reference is missing:
+    - Header: flags (DELTA_KEY), sequence, base sequence (big-endian u32s)
+    - Body: the wrapped codec's output
+    
+    A key frame is forced on the first frame, every ``key_interval``-th
+    frame and after request_key_frame() (e.g. on a NACK from the receiver),
+    which bounds recovery latency after a loss. Full payloads the codec
+    emits on its own (size change, too much change) count as key frames.
+    """
+    
+    def __init__(self, codec: IDeltaCodec, key_interval: Optional[int] = None):
+        """
+        Initialize delta stream encoder.
+        
+        Args:
+            codec: Delta codec (SimpleDeltaCodec, SparseDeltaCodec, ...)
+            key_interval: Force a key frame every N frames (None=only on request)
+        """
+        if key_interval is not None and key_interval < 1:
+            raise ValueError(f"key_interval must be >= 1, got {key_interval}")
+        
+        self.codec = codec
+        self.key_interval = key_interval
+        self._sequence = 0
+        self._since_key = 0
+        self._key_pending = True
+        
+        # Statistics
+        self.key_frames = 0
+        self.delta_frames = 0
+    
+    def request_key_frame(self):
+        """Make the next frame a key frame (call on a NACK)."""
+        self._key_pending = True
+    
+    def encode(self, data: bytes) -> bytes:
+        """
+        Encode one frame.
+        
+        Args:
+            data: Current payload bytes
+        
+        Returns:
+            Frame bytes for DeltaStreamDecoder.decode
+        """
+        if self.key_interval is not None and self._since_key >= self.key_interval:
+            self._key_pending = True
+        if self._key_pending:
+            self.codec.reset()
+            self._key_pending = False
+        
+        body, is_delta = self.codec.encode(data)
+        
+        sequence = self._sequence
+        self._sequence = (sequence + 1) & _SEQ_MASK
+        if is_delta:
+            self.delta_frames += 1
+            self._since_key += 1
+            header = _DELTA_STREAM_HEADER.pack(0, sequence, (sequence - 1) & _SEQ_MASK)
+        else:
+            self.key_frames += 1
+            self._since_key = 1
+            header = _DELTA_STREAM_HEADER.pack(DELTA_KEY, sequence, sequence)
+        return header + body
+
+
+class DeltaStreamDecoder:
+    """
+    Decoder for the frames of one DeltaStreamEncoder.
+    
+    A delta whose base frame was not the last frame decoded (lost,
+    reordered or undecodable) is dropped instead of raising, and every
+    following delta is dropped until the next key frame resyncs the
+    stream. While ``synced`` is False the receiver should NACK so the
+    sender calls request_key_frame().
+    """
+    
+    def __init__(self, codec: IDeltaCodec):
+        """
+        Initialize delta stream decoder (unsynced until the first key frame).
+        
+        Args:
+            codec: Delta codec of the same type and configuration as the encoder's
+        """
+        self.codec = codec
+        self._last: Optional[int] = None
+        
+        # Statistics
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+    
+    @property
+    def synced(self) -> bool:
+        """Whether deltas against the last decoded frame can be decoded."""
+        return self._last is not None
+    
+    def decode(self, frame: bytes) -> Optional[bytes]:
+        """
+        Decode one frame.
+        
+        Args:
+            frame: Frame produced by DeltaStreamEncoder.encode
+        
+        Returns:
+            Decoded payload, or None if the frame was dropped (missing base
+            frame or undecodable delta)
+        
+        Raises:
+            RuntimeError: If the frame header is truncated
+        """
+        if len(frame) < _DELTA_STREAM_HEADER.size:
+            raise RuntimeError(f"Truncated delta stream header: {len(frame)} bytes")
+        
+        flags, sequence, base = _DELTA_STREAM_HEADER.unpack_from(frame, 0)
+        is_key = bool(flags & DELTA_KEY)
+        if not is_key and base != self._last:
+            self._last = None
+            self.frames_dropped += 1
+            return None
+        
+        try:
+            data = self.codec.decode(bytes(frame[_DELTA_STREAM_HEADER.size:]), not is_key)
+        except (RuntimeError, ValueError):
+            self._last = None
+            self.frames_dropped += 1
+            return None
+        
+        self._last = sequence
+        self.frames_decoded += 1
+        return data
+
+
+
+# Image delta: width, height, channels, tile size
+_IMAGE_HEADER = struct.Struct('<HHBB')
+
+TILE_SKIP = 0           # Tile unchanged (same position in the previous frame)
+TILE_COPY = 1           # Tile copied from the previous frame at (dx, dy)
+TILE_RESIDUAL = 2       # Residual against the previous frame at (dx, dy)
+
+_COARSE_SCALE = 4       # Downsampling factor for the global motion search
+
+
+def _downsample(gray: np.ndarray, factor: int) -> np.ndarray:
+    """Block-mean downsample (crops to a multiple of factor)."""
+    h, w = gray.shape[0] // factor, gray.shape[1] // factor
+    blocks = gray[:h * factor, :w * factor].reshape(h, factor, w, factor)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+class ImageDeltaCodec(IDeltaCodec):
+    """
+    Block-motion delta codec for camera frames (raw HxWxC uint8 bytes).
+    
+    Byte-wise XOR misses shifted content entirely, so a slowly panning
+    camera produces dense XOR deltas. This codec splits the frame into
+    ``tile`` x ``tile`` tiles and predicts each one from the previous
+    frame, either in place or displaced by (dx, dy):
+    
+    - TILE_SKIP: unchanged, nothing sent
+    - TILE_COPY: exact copy from (dx, dy), 2 bytes sent
+    - TILE_RESIDUAL: (dx, dy) plus the byte-wise residual (mod 256), which
+      is near zero for moved content and compresses well downstream
+    
+    Motion search is vectorized: a global shift is estimated on a
+    downsampled grayscale frame, refined at full resolution, then every
+    tile picks the candidate (including no motion) with the lowest sum of
+    absolute differences. The codec is lossless.
+    
+    Payload format (little-endian):
+    - Header: width, height (u16), channels, tile size (u8)
+    - Tile modes: one u8 per tile, row-major
+    - Motion vectors: (dx, dy) int8 pairs for every non-skipped tile
+    - Residuals: tile bytes for every TILE_RESIDUAL tile
+    """
+    
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        channels: int = 3,
+        tile: int = 16,
+        search: int = 16
+    ):
+        """
+        Initialize image delta codec.
+        
+        Args:
+            width: Frame width in pixels
+            height: Frame height in pixels
+            channels: Bytes per pixel (3 for rgb8, 1 for mono8)
+            tile: Tile size in pixels
+            search: Maximum motion in pixels per frame (<= 127)
+        """
+        if not (0 < width <= 0xFFFF and 0 < height <= 0xFFFF):
+            raise ValueError(f"width and height must be in (0, 65535], got {width}x{height}")
+        if not 0 < channels <= 255:
+            raise ValueError(f"channels must be in (0, 255], got {channels}")
+        if not 0 < tile <= 255:
+            raise ValueError(f"tile must be in (0, 255], got {tile}")
+        if not 0 <= search <= 127:
+            raise ValueError(f"search must be in [0, 127], got {search}")
+        
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.tile = tile
+        self.search = search
+        self.frame_size = width * height * channels
+        self.previous: Optional[bytes] = None
+        
+        # Tile grid (the frame is edge-padded to whole tiles)
+        self._tiles_y = -(-height // tile)
+        self._tiles_x = -(-width // tile)
+        self._padded_shape = (self._tiles_y * tile, self._tiles_x * tile, channels)
+    
+    def _frame(self, data: bytes) -> np.ndarray:
+        """View raw bytes as an HxWxC frame."""
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, self.channels)
+    
+    def _reference(self, frame: np.ndarray) -> np.ndarray:
+        """Previous frame padded by the search range (plus the tile remainder)."""
+        s = self.search
+        pad_y = self._padded_shape[0] - self.height
+        pad_x = self._padded_shape[1] - self.width
+        return np.pad(frame, ((s, s + pad_y), (s, s + pad_x), (0, 0)), mode='edge')
+    
+    def _tiles(self, image: np.ndarray) -> np.ndarray:
+        """Split a padded HxWxC image into (tiles, tile, tile, C)."""
+        t = self.tile
+        return (
+            image.reshape(self._tiles_y, t, self._tiles_x, t, self.channels)
+            .transpose(0, 2, 1, 3, 4)
+            .reshape(-1, t, t, self.channels)
+        )
+    
+    def _untile(self, tiles: np.ndarray) -> np.ndarray:
+        """Inverse of _tiles, cropped to the frame size."""
+        t = self.tile
+        image = (
+            tiles.reshape(self._tiles_y, self._tiles_x, t, t, self.channels)
+            .transpose(0, 2, 1, 3, 4)
+            .reshape(self._padded_shape)
+        )
+        return image[:self.height, :self.width]
+    
+    def _gather(self, reference: np.ndarray, dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+        """Reference tiles displaced by per-tile (dx, dy)."""
+        t, s = self.tile, self.search
+        offsets = np.arange(t)
+        tile_y, tile_x = np.divmod(np.arange(self._tiles_y * self._tiles_x), self._tiles_x)
+        rows = (tile_y * t + dy + s)[:, None] + offsets
+        cols = (tile_x * t + dx + s)[:, None] + offsets
+        return reference[rows[:, :, None], cols[:, None, :]]
+    
+    def _candidates(self, prev: np.ndarray, curr: np.ndarray) -> list:
+        """Motion candidates: no motion plus a refined global shift."""
+        if self.search == 0:
+            return [(0, 0)]
+        
+        # Coarse global search on downsampled grayscale frames
+        scale = _COARSE_SCALE
+        prev_small = _downsample(prev.mean(axis=2, dtype=np.float32), scale)
+        curr_small = _downsample(curr.mean(axis=2, dtype=np.float32), scale)
+        r = max(self.search // scale, 1)
+        padded = np.pad(prev_small, r, mode='edge')
+        h, w = curr_small.shape
+        best, best_cost = (0, 0), np.inf
+        for dy in range(-r, r + 1):
+            for dx in range(-r, r + 1):
+                cost = np.abs(curr_small - padded[r + dy:r + dy + h, r + dx:r + dx + w]).mean()
+                if cost < best_cost:
+                    best, best_cost = (dx, dy), cost
+        
+        # Refine around the coarse estimate at full resolution
+        gx, gy = best[0] * scale, best[1] * scale
+        span = range(-(scale // 2), scale // 2 + 1)
+        candidates = {(0, 0)}
+        for dy in span:
+            for dx in span:
+                if abs(gx + dx) <= self.search and abs(gy + dy) <= self.search:
+                    candidates.add((gx + dx, gy + dy))
+        return [(0, 0)] + sorted(candidates - {(0, 0)})
+    
+    def encode(self, data: bytes) -> tuple[bytes, bool]:
+        """
+        Encode a frame as tile motion + residuals against the previous frame.
+        
+        Args:
+            data: Raw frame bytes (height x width x channels)
+        
+        Returns:
+            Tuple of (encoded_bytes, is_delta)
+            - If is_delta=True, encoded_bytes is the tile payload
+            - If is_delta=False, encoded_bytes is the full frame (first frame,
+              size mismatch, or a tile payload no smaller than the frame)
+        """
+        data = bytes(data)
+        if (
+            self.previous is None
+            or len(data) != self.frame_size
+            or len(self.previous) != self.frame_size
+        ):
+            self.previous = data
+            return (data, False)
+        
+        prev, curr = self._frame(self.previous), self._frame(data)
+        reference = self._reference(prev)
+        curr_padded = np.pad(
+            curr,
+            (
+                (0, self._padded_shape[0] - self.height),
+                (0, self._padded_shape[1] - self.width),
+                (0, 0)
+            ),
+            mode='edge'
+        )
+        
+        # Per-tile SAD for every candidate shift; first minimum wins, so
+        # no motion is preferred on ties
+        t, s = self.tile, self.search
+        ph, pw = self._padded_shape[:2]
+        curr_gray = curr_padded.sum(axis=2, dtype=np.int16)
+        reference_gray = reference.sum(axis=2, dtype=np.int16)
+        candidates = self._candidates(prev, curr)
+        sads = np.empty((len(candidates), self._tiles_y * self._tiles_x), dtype=np.int64)
+        for i, (dx, dy) in enumerate(candidates):
+            diff = np.abs(curr_gray - reference_gray[s + dy:s + dy + ph, s + dx:s + dx + pw])
+            sads[i] = diff.reshape(self._tiles_y, t, self._tiles_x, t).sum(
+                axis=(1, 3), dtype=np.int32
+            ).ravel()
+        
+        motion = np.array(candidates, dtype=np.int64)[np.argmin(sads, axis=0)]
+        dx, dy = motion[:, 0], motion[:, 1]
+        # uint8, wraps mod 256
+        residuals = self._tiles(curr_padded) - self._gather(reference, dx, dy)
+        
+        changed = residuals.reshape(len(residuals), -1).any(axis=1)
+        moved = (dx != 0) | (dy != 0)
+        modes = np.where(
+            changed, TILE_RESIDUAL, np.where(moved, TILE_COPY, TILE_SKIP)
+        ).astype(np.uint8)
+        sent = modes != TILE_SKIP
+        
+        self.previous = data
+        tile_bytes = self.tile * self.tile * self.channels
+        n_sent, n_changed = int(sent.sum()), int(changed.sum())
+        size = _IMAGE_HEADER.size + len(modes) + 2 * n_sent + n_changed * tile_bytes
+        if size >= self.frame_size:
+            # Prediction does not pay off (e.g. sensor noise): send the full frame
+            return (data, False)
+        
+        encoded = b''.join((
+            _IMAGE_HEADER.pack(self.width, self.height, self.channels, self.tile),
+            modes.tobytes(),
+            np.stack((dx[sent], dy[sent]), axis=1).astype(np.int8).tobytes(),
+            residuals[changed].tobytes(),
+        ))
+        return (encoded, True)
+    
+    def decode(self, data: bytes, is_delta: bool) -> bytes:
+        """
+        Decode a tile payload against the previous frame.
+        
+        Args:
+            data: Encoded bytes (delta or full)
+            is_delta: True if data is delta, False if full frame
+        
+        Returns:
+            Decoded raw frame bytes
+        
+        Raises:
+            RuntimeError: If delta decoding fails (missing previous or
+                malformed payload)
+        """
+        if not is_delta:
+            self.previous = bytes(data)
+            return self.previous
+        
+        if self.previous is None or len(self.previous) != self.frame_size:
+            raise RuntimeError("Cannot decode delta without previous frame")
+        
+        if len(data) < _IMAGE_HEADER.size:
+            raise RuntimeError(f"Truncated delta header: {len(data)} bytes")
+        
+        header = _IMAGE_HEADER.unpack_from(data, 0)
+        if header != (self.width, self.height, self.channels, self.tile):
+            raise RuntimeError(
+                f"Frame geometry mismatch: got {header}, expected "
+                f"{(self.width, self.height, self.channels, self.tile)}"
+            )
+        
+        n_tiles = self._tiles_y * self._tiles_x
+        pos = _IMAGE_HEADER.size
+        modes = np.frombuffer(data, dtype=np.uint8, count=n_tiles, offset=pos)
+        pos += n_tiles
+        sent = modes != TILE_SKIP
+        changed = modes == TILE_RESIDUAL
+        n_sent, n_changed = int(sent.sum()), int(changed.sum())
+        tile_bytes = self.tile * self.tile * self.channels
+        if len(data) != pos + 2 * n_sent + n_changed * tile_bytes:
+            raise RuntimeError(f"Delta length mismatch: {len(data)} bytes for {n_sent} tiles")
+        if (modes > TILE_RESIDUAL).any():
+            raise RuntimeError("Unknown tile mode")
+        
+        vectors = np.frombuffer(data, dtype=np.int8, count=2 * n_sent, offset=pos).reshape(-1, 2)
+        pos += 2 * n_sent
+        if n_sent and int(np.abs(vectors).max()) > self.search:
+            raise RuntimeError("Motion vector out of range")
+        
+        dx = np.zeros(n_tiles, dtype=np.int64)
+        dy = np.zeros(n_tiles, dtype=np.int64)
+        dx[sent], dy[sent] = vectors[:, 0], vectors[:, 1]
+        
+        tiles = self._gather(self._reference(self._frame(self.previous)), dx, dy)
+        tiles[changed] += np.frombuffer(data, dtype=np.uint8, offset=pos).reshape(
+            n_changed, self.tile, self.tile, self.channels
+        )
+        
+        self.previous = np.ascontiguousarray(self._untile(tiles)).tobytes()
+        return self.previous
+    
+    def reset(self):
+        """Reset codec state."""
+        self.previous = None
+
+
+def _state_size(codec: IDeltaCodec) -> int:
+    """Bytes of reference state held by a delta codec."""
+    previous = getattr(codec, 'previous', None)
+    if previous is None:
+        return 0
+    if isinstance(previous, np.ndarray):
+        return previous.nbytes
+    return len(previous)
+
+
+@dataclass
+class _BankStream:
+    """Reference state of one (source_node, topic) stream."""
+    
+    codec: IDeltaCodec
+    encoder: Optional[DeltaStreamEncoder] = None
+    decoder: Optional[DeltaStreamDecoder] = None
+    size: int = 0
+
+
+class DeltaCodecBank:
+    """
+    Per-stream delta codecs keyed by (source_node, topic).
+    
+    A single delta codec holds one previous payload, so interleaving topics
+    through it makes every frame a mismatch. The bank keeps one codec per
+    stream and delta-encodes envelopes transparently: encode() replaces the
+    payload and sets ``metadata.is_delta`` (carried on the wire by
+    ProtobufCodec and ProtoSchemaCodec), decode() reverses it.
+    
+    Each stream runs through a DeltaStreamEncoder/DeltaStreamDecoder, so
+    payloads carry their sequence and base sequence numbers. A delta whose
+    base was not the last payload decoded on its stream (lost frame,
+    reordering, evicted stream) raises instead of decoding to wrong bytes,
+    and the stream stays unsynced until its next full payload.
+    
+    Streams are evicted least-recently-used once there are more than
+    ``max_streams`` of them or their reference payloads exceed
+    ``max_bytes``. An evicted stream restarts with a full payload, so the
+    receiving bank must be configured with limits at least as large as the
+    sender's.
+    
+    Example:
+        bank = DeltaCodecBank(SparseDeltaCodec, key_interval=30)
+        frame = codec.encode(bank.encode(envelope))
+        ...
+        envelope = rx_bank.decode(codec.decode(frame))
+    """
+    
+    def __init__(
+        self,
+        codec_factory: Callable[[], IDeltaCodec] = SparseDeltaCodec,
+        max_streams: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+        key_interval: Optional[int] = None
+    ):
+        """
+        Initialize delta codec bank.
+        
+        Args:
+            codec_factory: Creates the codec for a new stream
+            max_streams: Maximum number of streams kept
+            max_bytes: Maximum reference state across all streams
+            key_interval: Force a full payload every N frames per stream
+                (None=only on size change, eviction or request_key_frame)
+        """
+        if max_streams < 1:
+            raise ValueError(f"max_streams must be >= 1, got {max_streams}")
+        if key_interval is not None and key_interval < 1:
+            raise ValueError(f"key_interval must be >= 1, got {key_interval}")
+        
+        self.codec_factory = codec_factory
+        self.max_streams = max_streams
+        self.max_bytes = max_bytes
+        self.key_interval = key_interval
+        self._streams: "OrderedDict[Tuple[str, str], _BankStream]" = OrderedDict()
+        
+        # Statistics
+        self.state_bytes = 0
+        self.evictions = 0
+    
+    def __len__(self) -> int:
+        """Number of streams with state."""
+        return len(self._streams)
+    
+    def _stream(self, key: Tuple[str, str]) -> _BankStream:
+        """Get (or create) a stream and mark it most recently used."""
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = _BankStream(self.codec_factory())
+        else:
+            self._streams.move_to_end(key)
+        return stream
+    
+    def synced(self, source_node: str, topic: str) -> bool:
+        """Whether the receiving stream can decode its next delta (NACK if not)."""
+        stream = self._streams.get((source_node, topic))
+        return stream is not None and stream.decoder is not None and stream.decoder.synced
+    
+    def _account(self, stream: _BankStream):
+        """Update memory accounting for stream, then evict LRU streams over the limits."""
+        size = _state_size(stream.codec)
+        self.state_bytes += size - stream.size
+        stream.size = size
+        
+        # Never evict the stream just used (it is last)
+        while len(self._streams) > 1 and (
+            len(self._streams) > self.max_streams or self.state_bytes > self.max_bytes
+        ):
+            _, evicted = self._streams.popitem(last=False)
+            self.state_bytes -= evicted.size
+            self.evictions += 1
+    
+    def request_key_frame(self, source_node: str, topic: str):
+        """Make the stream's next payload a full one (call on a NACK)."""
+        stream = self._streams.get((source_node, topic))
+        if stream is not None and stream.encoder is not None:
+            stream.encoder.request_key_frame()
+    
+    def encode(self, envelope: Envelope) -> Envelope:
+        """
+        Delta-encode an envelope's payload against its stream's previous one.
+        
+        Args:
+            envelope: Envelope with a full payload
+        
+        Returns:
+            Copy of the envelope with the encoded payload (a
+            DeltaStreamEncoder frame) and ``metadata.is_delta`` set
+        """
+        stream = self._stream((envelope.metadata.source_node, envelope.topic))
+        if stream.encoder is None:
+            stream.encoder = DeltaStreamEncoder(stream.codec, self.key_interval)
+        
+        key_frames = stream.encoder.key_frames
+        payload = stream.encoder.encode(bytes(envelope.payload))
+        is_delta = stream.encoder.key_frames == key_frames
+        self._account(stream)
+        
+        return replace(
+            envelope, payload=payload, metadata=replace(envelope.metadata, is_delta=is_delta)
+        )
+    
+    def decode(self, envelope: Envelope) -> Envelope:
+        """
+        Reconstruct an envelope's full payload.
+        
+        Args:
+            envelope: Envelope produced by a sender bank's encode()
+        
+        Returns:
+            Copy of the envelope with the full payload and
+            ``metadata.is_delta`` cleared
+        
+        Raises:
+            RuntimeError: If a delta arrives without its reference (lost or
+                reordered frame, evicted stream); later deltas on the stream
+                raise too until its next full payload
+        """
+        key = (envelope.metadata.source_node, envelope.topic)
+        stream = self._stream(key)
+        if stream.decoder is None:
+            stream.decoder = DeltaStreamDecoder(stream.codec)
+        try:
+            payload = stream.decoder.decode(bytes(envelope.payload))
+        finally:
+            self._account(stream)
+        if payload is None:
+            raise RuntimeError(f"Delta reference missing for stream {key}: waiting for a key frame")
+        
+        return replace(
+            envelope, payload=payload, metadata=replace(envelope.metadata, is_delta=False)
+        )
@@ -4,95 +4,264 @@ ARIA SDK - Telemetry FEC (Forward Error Correction) Module
 Provides Reed-Solomon error correction for lossy channels.
 """
 
-from typing import List, Optional
-import reedsolo
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID, uuid4
+import itertools
+import os
+import struct
 
+import numpy as np
+
+from aria_sdk.domain.entities import Envelope, EnvelopeMetadata, FecInfo
 from aria_sdk.domain.protocols import IFEC
+from aria_sdk.telemetry.codec import ProtobufCodec
+
+
+# GF(256) arithmetic with the primitive polynomial x^8 + x^4 + x^3 + x^2 + 1
+_GF_POLY = 0x11D
+
+
+def _build_gf_tables():
+    """Build the exp/log tables and the full 256x256 multiplication table."""
+    exp = np.zeros(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int32)
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= _GF_POLY
+    exp[255:510] = exp[:255]
+    
+    mul = exp[log[:, None] + log[None, :]]
+    mul[0, :] = 0
+    mul[:, 0] = 0
+    return exp, log, mul
+
+
+_GF_EXP, _GF_LOG, _GF_MUL = _build_gf_tables()
+
+
+def _gf_inverse(values: np.ndarray) -> np.ndarray:
+    """Multiplicative inverses of non-zero field elements."""
+    return _GF_EXP[255 - _GF_LOG[values]]
+
+
+def _gf_invert_matrix(matrix: np.ndarray) -> np.ndarray:
+    """
+    Invert a square matrix over GF(256) by Gauss-Jordan elimination.
+    
+    Raises:
+        RuntimeError: If the matrix is singular
+    """
+    n = len(matrix)
+    work = np.concatenate((matrix.astype(np.uint8), np.eye(n, dtype=np.uint8)), axis=1)
+    for col in range(n):
+        nonzero = np.flatnonzero(work[col:, col])
+        if not nonzero.size:
+            raise RuntimeError("Singular decode matrix")
+        pivot = col + nonzero[0]
+        work[[col, pivot]] = work[[pivot, col]]
+        work[col] = _GF_MUL[_gf_inverse(work[col, col]), work[col]]
+        
+        # Eliminate the column from every other row at once
+        factors = work[:, col].copy()
+        factors[col] = 0
+        work ^= _GF_MUL[factors[:, None], work[col][None, :]]
+    return work[:, n:]
+
+
+def _gf_matmul(matrix: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Multiply an r x k coefficient matrix by k packets (..., k, L) over GF(256).
+    
+    Each product is a 256-entry table-row lookup over whole packets (and
+    over every block of a batch at once), so the Python-level loop is r*k
+    iterations regardless of packet length or batch size.
+    """
+    out = np.zeros(rows.shape[:-2] + (matrix.shape[0], rows.shape[-1]), dtype=np.uint8)
+    for i, coefficients in enumerate(matrix):
+        for j, c in enumerate(coefficients):
+            if c == 1:
+                out[..., i, :] ^= rows[..., j, :]
+            elif c:
+                out[..., i, :] ^= _GF_MUL[c].take(rows[..., j, :])
+    return out
+
+
+def _stack(
+    blocks: Sequence[Sequence[Optional[bytes]]],
+    indices: Sequence[int],
+    length: int
+) -> np.ndarray:
+    """Zero-padded (blocks, len(indices), length) array of the given packets."""
+    out = np.zeros((len(blocks), len(indices), length), dtype=np.uint8)
+    for b, packets in enumerate(blocks):
+        for row, i in enumerate(indices):
+            packet = packets[i]
+            out[b, row, :len(packet)] = np.frombuffer(packet, dtype=np.uint8)
+    return out
+
+
+def _cauchy_matrix(k: int, m: int) -> np.ndarray:
+    """m x k Cauchy matrix 1 / (x_i + y_j), x = k..k+m-1, y = 0..k-1."""
+    x = np.arange(k, k + m)[:, None]
+    y = np.arange(k)[None, :]
+    return _gf_inverse(x ^ y)
+
+
+# Number of (k, m, erasure pattern) decode matrices kept
+DECODE_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
+def _decode_matrix(
+    k: int,
+    m: int,
+    lost: Tuple[int, ...]
+) -> Tuple[List[int], List[int], np.ndarray]:
+    """
+    Decode plan for one erasure pattern: (survivors, missing data, matrix).
+    
+    The matrix holds the rows of the inverted survivor submatrix for the
+    missing data packets. It depends only on (k, m, lost), so it is cached:
+    a bursty link repeats a handful of patterns, which then skip the
+    inversion and go straight to the multiply.
+    """
+    generator = np.concatenate((np.eye(k, dtype=np.uint8), _cauchy_matrix(k, m)))
+    survivors = [i for i in range(k + m) if i not in lost][:k]
+    missing_data = [i for i in lost if i < k]
+    matrix = _gf_invert_matrix(generator[survivors])[missing_data]
+    matrix.setflags(write=False)
+    return survivors, missing_data, matrix
 
 
 class ReedSolomonFEC(IFEC):
     """
     Reed-Solomon forward error correction.
     
-    Can recover from up to (m) erasures or (m/2) errors.
+    Systematic erasure code over GF(256): the k data packets are sent
+    as-is, followed by m parity packets, each a Cauchy-matrix combination
+    of the data packets. Any k of the k+m packets recover the data. Whole
+    packets are encoded and decoded as matrix products using precomputed
+    multiplication tables (no per-byte Python calls), and decode matrices
+    are cached per erasure pattern.
+    
+    Can recover from up to (m) erasures (lost packets).
     Example: RS(4,2) can recover 2 lost packets from 6 total (4 data + 2 parity).
+    
+    encode_blocks()/decode_blocks() process many independent blocks (e.g. a
+    recorded session dump) as batched kernels split across a thread pool;
+    the NumPy table lookups and XORs release the GIL, so throughput scales
+    with ``workers`` (keep it small on the robot).
     """
     
-    def __init__(self, k: int = 4, m: int = 2):
+    # Blocks per batched kernel call (keeps the working set cache-resident;
+    # 16 blocks of 10x1400 B measured fastest, ~2x a per-block loop)
+    BATCH_BLOCKS = 16
+    
+    def __init__(
+        self,
+        k: int = 4,
+        m: int = 2,
+        workers: Optional[int] = None,
+        executor: Optional[Executor] = None
+    ):
         """
         Initialize Reed-Solomon FEC.
         
         Args:
             k: Number of data symbols (packets)
             m: Number of parity symbols (packets)
-            
-        Total packets sent: k + m
+            workers: Thread pool size for encode_blocks/decode_blocks
+                (None=CPU count)
+            executor: Pool shared with other codecs and owned by the caller
+                (None=a private pool of ``workers`` threads, created on
+                first use)
+        
+        Total packets sent: k + m (at most 256)
         Can recover from up to m losses
         """
         if k < 1 or m < 1:
             raise ValueError(f"Invalid RS parameters: k={k}, m={m} (must be >= 1)")
+        if k + m > 256:
+            raise ValueError(f"Invalid RS parameters: k+m={k + m} (must be <= 256)")
         
         self.k = k
         self.m = m
         self.total = k + m
         
-        # Create Reed-Solomon codec
-        # nsym = number of error correction symbols (bytes of parity)
-        # We'll work at packet level, so we'll use byte-level RS
-        self.rs = reedsolo.RSCodec(m)
+        # Generator matrix: identity on top (systematic) of the Cauchy parity rows
+        self.parity_matrix = _cauchy_matrix(k, m)
+        self.matrix = np.concatenate((np.eye(k, dtype=np.uint8), self.parity_matrix))
+        
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[Executor] = executor
+        self._owns_executor = executor is None
+    
+    def close(self) -> None:
+        """
+        Shut down the private worker threads (recreated on next use).
+        
+        A shared executor passed to __init__ is left running for its owner.
+        """
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
     
     def encode(self, packets: List[bytes]) -> List[bytes]:
         """
         Encode data packets with FEC parity.
         
         Args:
-            packets: List of k data packets
-            
+            packets: List of k data packets (shorter packets are zero-padded
+                to the longest for the parity computation)
+        
         Returns:
             List of k+m packets (original data + parity)
-            
+        
         Raises:
             ValueError: If number of packets doesn't match k
         """
         if len(packets) != self.k:
             raise ValueError(f"Expected {self.k} packets, got {len(packets)}")
+        return self._encode_batch([packets])[0]
+    
+    def encode_blocks(self, blocks: Sequence[List[bytes]]) -> List[List[bytes]]:
+        """
+        Encode many independent blocks on the worker pool.
+        
+        Args:
+            blocks: Blocks of k data packets each
+        
+        Returns:
+            k+m packets per block, exactly as encode() would return them
+        
+        Raises:
+            ValueError: If a block does not have k packets
+        """
+        for i, packets in enumerate(blocks):
+            if len(packets) != self.k:
+                raise ValueError(f"Block {i}: expected {self.k} packets, got {len(packets)}")
+        return self._map(self._encode_batch, blocks)
+    
+    def _encode_batch(self, blocks: Sequence[List[bytes]]) -> List[List[bytes]]:
+        """Encode blocks with one batched matrix product."""
+        lengths = [max(len(p) for p in packets) for packets in blocks]
+        data = _stack(blocks, range(self.k), max(lengths))
+        parity = _gf_matmul(self.parity_matrix, data)
         
-        # Ensure all packets same size (pad if needed)
-        max_len = max(len(p) for p in packets)
-        padded_packets = [p + b'\x00' * (max_len - len(p)) for p in packets]
-        
-        # Encode each byte position across packets
-        encoded_packets = list(padded_packets)  # Start with data packets
-        
-        # Generate parity packets
-        for byte_idx in range(max_len):
-            # Extract byte column across all data packets
-            data_bytes = bytes([padded_packets[i][byte_idx] for i in range(self.k)])
-            
-            # Encode with RS
-            encoded = self.rs.encode(data_bytes)
-            
-            # Parity bytes are at the end
-            parity_bytes = encoded[self.k:]
-            
-            # Distribute parity bytes to parity packets
-            for parity_idx, parity_byte in enumerate(parity_bytes):
-                if parity_idx >= len(encoded_packets) - self.k:
-                    # Create new parity packet
-                    encoded_packets.append(bytearray())
-                encoded_packets[self.k + parity_idx].append(parity_byte) if isinstance(encoded_packets[self.k + parity_idx], bytearray) else None
-        
-        # Create m parity packets by transposing parity data
-        parity_packets = []
-        for parity_idx in range(self.m):
-            parity_packet = bytearray()
-            for byte_idx in range(max_len):
-                data_bytes = bytes([padded_packets[i][byte_idx] for i in range(self.k)])
-                encoded = self.rs.encode(data_bytes)
-                parity_packet.append(encoded[self.k + parity_idx])
-            parity_packets.append(bytes(parity_packet))
-        
-        return list(packets) + parity_packets
+        # Zero padding past a block's own length yields zero parity, so
+        # trimming gives the same result as encoding the block alone
+        return [
+            list(packets) + [row[:length].tobytes() for row in rows]
+            for packets, rows, length in zip(blocks, parity, lengths)
+        ]
     
     def decode(self, packets: List[Optional[bytes]], erasure_positions: List[int]) -> List[bytes]:
         """
@@ -100,56 +269,86 @@ class ReedSolomonFEC(IFEC):
         
         Args:
             packets: List of k+m packets (None for lost packets)
-            erasure_positions: Indices of lost packets
-            
+            erasure_positions: Indices of lost packets (None entries are
+                treated as lost too)
+        
         Returns:
-            Recovered k data packets
-            
+            Recovered k data packets. Data packets that arrived are returned
+            unchanged; recovered ones have the length of the longest packet
+            (the original length is not carried by the code)
+        
         Raises:
             RuntimeError: If too many packets lost to recover
         """
         if len(packets) != self.total:
             raise ValueError(f"Expected {self.total} packets, got {len(packets)}")
         
-        if len(erasure_positions) > self.m:
-            raise RuntimeError(
-                f"Cannot recover: {len(erasure_positions)} packets lost, "
-                f"FEC can only recover {self.m} losses"
-            )
+        lost = set(erasure_positions) | {i for i, p in enumerate(packets) if p is None}
+        return self._decode_batch([(packets, tuple(sorted(lost)))])[0]
+    
+    def decode_blocks(self, blocks: Sequence[List[Optional[bytes]]]) -> List[List[bytes]]:
+        """
+        Decode many independent blocks on the worker pool.
+        
+        Args:
+            blocks: Blocks of k+m packets each (None for lost packets)
+        
+        Returns:
+            Recovered k data packets per block, as decode() would return them
+        
+        Raises:
+            RuntimeError: If any block lost too many packets to recover
+        """
+        jobs = []
+        for n, packets in enumerate(blocks):
+            if len(packets) != self.total:
+                raise ValueError(f"Block {n}: expected {self.total} packets, got {len(packets)}")
+            jobs.append((packets, tuple(i for i, p in enumerate(packets) if p is None)))
+        return self._map(self._decode_batch, jobs)
+    
+    def _decode_batch(
+        self,
+        jobs: Sequence[Tuple[List[Optional[bytes]], Tuple[int, ...]]]
+    ) -> List[List[bytes]]:
+        """Decode (packets, sorted lost indices) jobs, one matrix product per erasure pattern."""
+        results: List[List[bytes]] = []
+        patterns: Dict[Tuple[int, ...], List[int]] = {}
+        for n, (packets, lost) in enumerate(jobs):
+            if len(lost) > self.m:
+                raise RuntimeError(
+                    f"Cannot recover: {len(lost)} packets lost, "
+                    f"FEC can only recover {self.m} losses"
+                )
+            results.append(list(packets[:self.k]))
+            if any(i < self.k for i in lost):
+                patterns.setdefault(lost, []).append(n)
         
-        if not erasure_positions:
-            # No losses - return data packets
-            return [p for p in packets[:self.k] if p is not None]
-        
-        # Determine packet size
-        available_packets = [p for p in packets if p is not None]
-        if not available_packets:
-            raise RuntimeError("No packets available for recovery")
-        
-        packet_len = len(available_packets[0])
-        
-        # Decode byte-by-byte
-        recovered_packets = [bytearray() for _ in range(self.k)]
-        
-        for byte_idx in range(packet_len):
-            # Extract byte column
-            encoded_bytes = []
-            for i in range(self.total):
-                if packets[i] is not None and byte_idx < len(packets[i]):
-                    encoded_bytes.append(packets[i][byte_idx])
-                else:
-                    encoded_bytes.append(0)  # Placeholder for lost byte
-            
-            # Decode with erasure positions
-            try:
-                decoded = self.rs.decode(bytes(encoded_bytes), erase_pos=erasure_positions)
-                # Extract data bytes (first k)
-                for i in range(self.k):
-                    recovered_packets[i].append(decoded[0][i])
-            except reedsolo.ReedSolomonError as e:
-                raise RuntimeError(f"FEC decode failed at byte {byte_idx}: {e}") from e
-        
-        return [bytes(p) for p in recovered_packets]
+        # Any k surviving packets determine the data
+        for lost, members in patterns.items():
+            survivors, missing_data, matrix = _decode_matrix(self.k, self.m, lost)
+            group = [jobs[n][0] for n in members]
+            lengths = [max(len(packets[i]) for i in survivors) for packets in group]
+            recovered = _gf_matmul(matrix, _stack(group, survivors, max(lengths)))
+            for n, rows, length in zip(members, recovered, lengths):
+                for row, i in zip(rows, missing_data):
+                    results[n][i] = row[:length].tobytes()
+        return results
+    
+    def _map(self, batch_func, items: Sequence) -> list:
+        """Run batch_func over batches of items on the pool; results in item order."""
+        batches = [items[i:i + self.BATCH_BLOCKS] for i in range(0, len(items), self.BATCH_BLOCKS)]
+        if len(batches) < 2 or self.workers < 2:
+            return [result for batch in batches for result in batch_func(batch)]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='aria-fec'
+            )
+        return [result for results in self._executor.map(batch_func, batches) for result in results]
+    
+    @staticmethod
+    def decode_cache_info():
+        """Hit/miss statistics of the shared decode-matrix cache (functools.lru_cache info)."""
+        return _decode_matrix.cache_info()
     
     def get_overhead(self) -> float:
         """
@@ -161,56 +360,577 @@ class ReedSolomonFEC(IFEC):
         return self.m / self.k
 
 
+# Receive sequence numbers are uint32 on the wire
+_SEQ_MASK = 0xFFFFFFFF
+
+
+def _block_failure(p: float, r: float, n_max: int) -> np.ndarray:
+    """
+    Block failure probabilities under a two-state Gilbert loss model.
+    
+    The channel is Good (no loss) or Bad (every packet lost), moving
+    Good->Bad with probability p and Bad->Good with probability r per
+    packet, starting from the stationary distribution.
+    
+    Returns:
+        (n_max+1, n_max+1) array: [n, m] = P(more than m of n packets lost)
+    """
+    bad_share = p / (p + r) if p + r else 0.0
+    
+    # good[j]/bad[j]: P(j losses so far and the last packet was Good/Bad)
+    good = np.zeros(n_max + 2)
+    bad = np.zeros(n_max + 2)
+    good[0], bad[1] = 1.0 - bad_share, bad_share
+    
+    failure = np.zeros((n_max + 1, n_max + 1))
+    for n in range(1, n_max + 1):
+        failure[n] = np.clip(1.0 - np.cumsum(good + bad)[:n_max + 1], 0.0, 1.0)
+        good, bad = (
+            good * (1 - p) + bad * r,
+            np.concatenate(([0.0], good[:-1] * p + bad[:-1] * (1 - r)))
+        )
+    return failure
+
+
 class AdaptiveFEC:
     """
-    Adaptive FEC that adjusts redundancy based on channel conditions.
+    Adaptive FEC that picks k and m from a burst-loss model of the channel.
+    
+    Received sequence numbers (observe()) are kept as a loss trace over a
+    sliding window and fitted to a two-state Gilbert-Elliott model: a Good
+    state without loss and a Bad state that drops every packet, with
+    p = P(Good->Bad) and r = P(Bad->Good) per packet. For every candidate
+    (k, m) the model gives the probability that a block loses more than m
+    of its k+m packets; the code with the lowest overhead m/k that keeps
+    this under target_residual is used (if none does, the most robust
+    one). Independent losses are the special case r = 1 - p, while bursts
+    (small r) push towards more parity, not just a higher rate.
+    
+    ReedSolomonFEC instances are cached per (k, m), so switching codes
+    back and forth never rebuilds them. They all share one pool of
+    ``workers`` threads owned by the AdaptiveFEC; call close() (or use it
+    as a context manager) to shut the threads down.
     """
     
-    def __init__(self, min_m: int = 1, max_m: int = 4, k: int = 4):
+    def __init__(
+        self,
+        min_m: int = 1,
+        max_m: int = 4,
+        k: int = 4,
+        min_k: int = 1,
+        target_residual: float = 1e-3,
+        window: int = 1024,
+        update_interval: int = 64,
+        workers: Optional[int] = None
+    ):
         """
         Initialize adaptive FEC.
         
         Args:
             min_m: Minimum parity packets
             max_m: Maximum parity packets
-            k: Number of data packets (fixed)
+            k: Maximum data packets per block
+            min_k: Minimum data packets per block
+            target_residual: Acceptable probability of an unrecoverable block
+            window: Packets of loss history used for the estimate
+            update_interval: Re-fit and re-select after this many packets
+            workers: Size of the thread pool shared by the cached codecs
+                (None=CPU count)
         """
+        if not 1 <= min_m <= max_m:
+            raise ValueError(
+                f"Invalid FEC parity range: m={min_m}..{max_m} (need 1 <= min_m <= max_m)"
+            )
+        if not 1 <= min_k <= k or k + max_m > 256:
+            raise ValueError(f"Invalid FEC ranges: k={min_k}..{k}, m={min_m}..{max_m}")
+        
         self.min_m = min_m
         self.max_m = max_m
-        self.k = k
+        self.min_k = min_k
+        self.max_k = k
+        self.target_residual = target_residual
+        self.update_interval = update_interval
+        self.workers = workers or os.cpu_count() or 1
+        
+        # Threads only start on first use, so an idle pool costs nothing
+        self._executor = self._new_executor()
+        self._codecs: Dict[Tuple[int, int], ReedSolomonFEC] = {}
+        self.current_k = k
         self.current_m = min_m
-        self.fec = ReedSolomonFEC(k, self.current_m)
+        self.fec = self._codec(self.current_k, self.current_m)
+        
+        # Loss tracking (True = lost) and the fitted model
+        self._trace: deque = deque(maxlen=window)
+        self._highest: Optional[int] = None
+        self._pending = 0
+        self.loss_probability: float = 0.0      # p: Good -> Bad
+        self.recovery_probability: float = 1.0  # r: Bad -> Good
+    
+    @property
+    def k(self) -> int:
+        """Data packets per block of the current code."""
+        return self.current_k
+    
+    @property
+    def recent_loss_rate(self) -> float:
+        """Long-run packet loss rate of the fitted model."""
+        p, r = self.loss_probability, self.recovery_probability
+        return p / (p + r) if p + r else 0.0
+    
+    @property
+    def mean_burst_length(self) -> float:
+        """Mean number of consecutive losses of the fitted model."""
+        return 1.0 / self.recovery_probability if self.recovery_probability else float('inf')
+    
+    def observe(self, sequence_number: int) -> None:
+        """
+        Record a received packet's sequence number.
+        
+        Gaps since the highest sequence number seen count as losses;
+        duplicates and late (reordered) packets are ignored. Re-fits the
+        model every update_interval packets.
         
-        # Loss tracking
-        self.recent_loss_rate: float = 0.0
+        Args:
+            sequence_number: uint32 sequence number of the received packet
+        """
+        sequence_number &= _SEQ_MASK
+        gap = 0
+        if self._highest is not None:
+            gap = (sequence_number - self._highest - 1) & _SEQ_MASK
+            if gap > _SEQ_MASK // 2:
+                return
+            gap = min(gap, self._trace.maxlen)
+        
+        self._highest = sequence_number
+        self._trace.extend(itertools.repeat(True, gap))
+        self._trace.append(False)
+        
+        self._pending += gap + 1
+        if self._pending >= self.update_interval:
+            self.adapt()
+    
+    def adapt(self) -> Tuple[int, int]:
+        """
+        Re-fit the loss model to the window and select (k, m).
+        
+        Returns:
+            Selected (k, m)
+        """
+        self._pending = 0
+        trace = np.fromiter(self._trace, dtype=bool, count=len(self._trace))
+        if len(trace) >= 2:
+            prev, cur = trace[:-1], trace[1:]
+            good, bad = int((~prev).sum()), int(prev.sum())
+            self.loss_probability = int((~prev & cur).sum()) / good if good else 1.0
+            self.recovery_probability = int((prev & ~cur).sum()) / bad if bad else 1.0
+        return self._select()
     
     def update_loss_rate(self, loss_rate: float):
         """
-        Update loss rate estimate and adjust FEC.
+        Set an independent (non-bursty) loss rate and adjust FEC.
         
         Args:
             loss_rate: Observed packet loss rate (0.0-1.0)
         """
-        self.recent_loss_rate = loss_rate
+        self.loss_probability = loss_rate
+        self.recovery_probability = 1.0 - loss_rate
+        self._select()
+    
+    def residual_loss(self, k: int, m: int) -> float:
+        """Probability under the fitted model that an RS(k, m) block is unrecoverable."""
+        failure = _block_failure(self.loss_probability, self.recovery_probability, k + m)
+        return float(failure[k + m, m])
+    
+    def _select(self) -> Tuple[int, int]:
+        """Pick the cheapest (k, m) meeting target_residual and switch to it."""
+        failure = _block_failure(
+            self.loss_probability, self.recovery_probability, self.max_k + self.max_m
+        )
         
-        # Adjust m based on loss rate
-        # Target: m > loss_rate * (k + m) to handle losses
-        # Solve: m > loss_rate * k / (1 - loss_rate)
-        if loss_rate > 0.01:
-            target_m = int((loss_rate * self.k) / (1 - loss_rate)) + 1
-            target_m = max(self.min_m, min(self.max_m, target_m))
-        else:
-            target_m = self.min_m
+        def cost(code: Tuple[int, int]) -> tuple:
+            k, m = code
+            residual = failure[k + m, m]
+            if residual <= self.target_residual:
+                return (0, m / k, residual)
+            return (1, residual, m / k)
         
-        if target_m != self.current_m:
-            self.current_m = target_m
-            self.fec = ReedSolomonFEC(self.k, self.current_m)
-            print(f"[AdaptiveFEC] Adjusted m={self.current_m} for loss_rate={loss_rate:.2%}")
+        k, m = min(
+            itertools.product(range(self.min_k, self.max_k + 1), range(self.min_m, self.max_m + 1)),
+            key=cost
+        )
+        if (k, m) != (self.current_k, self.current_m):
+            self.current_k, self.current_m = k, m
+            self.fec = self._codec(k, m)
+            print(
+                f"[AdaptiveFEC] Adjusted k={k} m={m} for loss_rate={self.recent_loss_rate:.2%} "
+                f"(burst {self.mean_burst_length:.1f})"
+            )
+        return k, m
+    
+    def close(self) -> None:
+        """Shut down the shared worker threads (recreated on next use)."""
+        self._executor.shutdown(wait=True)
+        self._executor = self._new_executor()
+        # Cached codecs still reference the old pool
+        self._codecs.clear()
+        self.fec = self._codec(self.current_k, self.current_m)
+    
+    def __enter__(self) -> 'AdaptiveFEC':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def _new_executor(self) -> ThreadPoolExecutor:
+        """Thread pool shared by every cached codec."""
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='aria-fec')
+    
+    def _codec(self, k: int, m: int) -> ReedSolomonFEC:
+        """Cached RS(k, m) codec (on the shared pool)."""
+        codec = self._codecs.get((k, m))
+        if codec is None:
+            codec = self._codecs[(k, m)] = ReedSolomonFEC(
+                k, m, workers=self.workers, executor=self._executor
+            )
+        return codec
     
     def encode(self, packets: List[bytes]) -> List[bytes]:
         """Encode with current FEC parameters."""
         return self.fec.encode(packets)
     
-    def decode(self, packets: List[Optional[bytes]], erasure_positions: List[int]) -> List[bytes]:
-        """Decode with current FEC parameters."""
-        return self.fec.decode(packets, erasure_positions)
+    def decode(
+        self,
+        packets: List[Optional[bytes]],
+        erasure_positions: List[int],
+        k: Optional[int] = None
+    ) -> List[bytes]:
+        """
+        Decode a block.
+        
+        Args:
+            packets: The block's k+m packets (None for lost packets)
+            erasure_positions: Indices of lost packets
+            k: Data packets of the block's code (FecInfo.k; None = current code)
+        
+        Returns:
+            Recovered k data packets
+        """
+        if k is None:
+            return self.fec.decode(packets, erasure_positions)
+        return self._codec(k, len(packets) - k).decode(packets, erasure_positions)
+    
+    def encode_blocks(self, blocks: Sequence[List[bytes]]) -> List[List[bytes]]:
+        """Encode independent blocks on the worker pool with current FEC parameters."""
+        return self.fec.encode_blocks(blocks)
+    
+    def decode_blocks(self, blocks: Sequence[List[Optional[bytes]]]) -> List[List[bytes]]:
+        """Decode independent blocks on the worker pool with current FEC parameters."""
+        return self.fec.decode_blocks(blocks)
+
+
+# Each FEC row is the data envelope's encoded frame with a length prefix,
+# so recovered rows can be cut back to the exact frame
+_ROW_LENGTH = struct.Struct('!I')
+
+_BLOCK_ID_MASK = 0xFFFFFFFF
+
+
+def _frame_row(codec: ProtobufCodec, envelope: Envelope) -> bytes:
+    """FEC row for a data envelope."""
+    frame = codec.encode(envelope)
+    return _ROW_LENGTH.pack(len(frame)) + frame
+
+
+class FecBlockEncoder:
+    """
+    FEC stage for the fragment stream of a Packetizer.
+    
+    Fragments are grouped into blocks of k; each data envelope is sent
+    immediately with FecInfo(k, m, block_id, index) attached, and once a
+    block is full its m parity envelopes follow. Parity is computed over
+    the encoded frames of the data envelopes, so a receiver recovers whole
+    envelopes (metadata included), not just payloads.
+    
+    With ``interleave`` = D > 1, consecutive fragments are spread round-robin
+    over D blocks, so a burst of up to D*m consecutive losses costs each
+    block at most m packets. Parity is then sent once all D blocks are full.
+    
+    flush() closes partially filled blocks (e.g. at the end of a message
+    to bound latency); their parity announces the actual data count k.
+    
+    Example:
+        fec_stage = FecBlockEncoder(k=4, m=2, interleave=2)
+        for envelope in fec_stage.encode(packetizer.packetize(envelope)) + fec_stage.flush():
+            transport.send(codec.encode(envelope))
+    """
+    
+    def __init__(
+        self,
+        k: int = 4,
+        m: int = 2,
+        interleave: int = 1,
+        codec: Optional[ProtobufCodec] = None
+    ):
+        """
+        Initialize FEC block encoder.
+        
+        Args:
+            k: Data envelopes per block
+            m: Parity envelopes per block
+            interleave: Number of blocks filled round-robin (1 = no interleaving)
+            codec: Stateless codec used to serialize FEC rows (no string
+                interning; must match the FecBlockDecoder's)
+        """
+        if interleave < 1:
+            raise ValueError(f"interleave must be >= 1, got {interleave}")
+        
+        self.k = k
+        self.m = m
+        self.interleave = interleave
+        self.codec = codec or ProtobufCodec()
+        self._fecs: Dict[int, ReedSolomonFEC] = {k: ReedSolomonFEC(k, m)}
+        
+        self._base_block_id = 0
+        self._blocks: List[List[Envelope]] = [[] for _ in range(interleave)]
+        self._position = 0
+    
+    def add(self, fragment: Envelope) -> List[Envelope]:
+        """
+        Add one fragment to the current block group.
+        
+        Args:
+            fragment: Envelope from Packetizer.packetize (or any envelope)
+        
+        Returns:
+            Envelopes to send: the fragment with FecInfo attached, followed by
+            the parity envelopes if this completed the block group
+        """
+        slot = self._position % self.interleave
+        block = self._blocks[slot]
+        fec_info = FecInfo(
+            k=self.k, m=self.m,
+            block_id=(self._base_block_id + slot) & _BLOCK_ID_MASK,
+            index=len(block)
+        )
+        data = replace(fragment, metadata=replace(fragment.metadata, fec_info=fec_info))
+        block.append(data)
+        self._position += 1
+        
+        if self._position == self.k * self.interleave:
+            return [data] + self.flush()
+        return [data]
+    
+    def encode(self, fragments: Iterable[Envelope]) -> List[Envelope]:
+        """
+        Add a stream of fragments (without flushing).
+        
+        Args:
+            fragments: Envelopes from Packetizer.packetize
+        
+        Returns:
+            Envelopes to send, in order
+        """
+        out: List[Envelope] = []
+        for fragment in fragments:
+            out.extend(self.add(fragment))
+        return out
+    
+    def flush(self) -> List[Envelope]:
+        """
+        Emit parity for the current block group, even if not full.
+        
+        Returns:
+            Parity envelopes, interleaved across blocks
+        """
+        parity_by_block = [
+            self._parity(slot, block) for slot, block in enumerate(self._blocks) if block
+        ]
+        
+        self._base_block_id = (self._base_block_id + self.interleave) & _BLOCK_ID_MASK
+        self._blocks = [[] for _ in range(self.interleave)]
+        self._position = 0
+        
+        return [parity[j] for j in range(self.m) for parity in parity_by_block]
+    
+    def parity_overhead(self, fragment: Envelope, codec: Optional[ProtobufCodec] = None) -> int:
+        """
+        Bytes a parity frame adds on top of the payload of the data it protects.
+        
+        A parity payload is a length-prefixed data frame (see _frame_row),
+        itself framed as an envelope, so a parity frame is always larger than
+        the data frames of its block.
+        
+        Args:
+            fragment: Data envelope as sent (fragment and FEC info attached)
+            codec: Wire codec of the parity envelopes (default: self.codec)
+        
+        Returns:
+            Parity frame size minus the data payload size, in bytes
+        """
+        parity = replace(fragment, metadata=EnvelopeMetadata(
+            source_node=fragment.metadata.source_node,
+            sequence_number=fragment.metadata.sequence_number,
+            fec_info=fragment.metadata.fec_info or FecInfo(k=self.k, m=self.m, block_id=0)
+        ))
+        return (
+            (codec or self.codec).frame_overhead(parity)
+            + _ROW_LENGTH.size
+            + self.codec.frame_overhead(fragment)
+        )
+    
+    def _parity(self, slot: int, block: List[Envelope]) -> List[Envelope]:
+        """Parity envelopes for one block."""
+        k = len(block)
+        fec = self._fecs.get(k)
+        if fec is None:
+            fec = self._fecs[k] = ReedSolomonFEC(k, self.m)
+        rows = [_frame_row(self.codec, envelope) for envelope in block]
+        parity = fec.encode(rows)[k:]
+        
+        first = block[0]
+        block_id = (self._base_block_id + slot) & _BLOCK_ID_MASK
+        return [
+            Envelope(
+                id=uuid4(),
+                timestamp=first.timestamp,
+                schema_id=0,
+                priority=first.priority,
+                topic=first.topic,
+                payload=payload,
+                metadata=EnvelopeMetadata(
+                    source_node=first.metadata.source_node,
+                    sequence_number=first.metadata.sequence_number,
+                    fec_info=FecInfo(k=k, m=self.m, block_id=block_id, index=k + j)
+                )
+            )
+            for j, payload in enumerate(parity)
+        ]
+
+
+@dataclass
+class _FecBlock:
+    """Receive state of one FEC block."""
+    
+    k: Optional[int] = None                             # Known once a parity envelope arrives
+    m: Optional[int] = None
+    rows: Dict[int, bytes] = field(default_factory=dict)
+    delivered: Set[int] = field(default_factory=set)
+    indices: Set[int] = field(default_factory=set)     # Received or recovered
+    ids: Set[UUID] = field(default_factory=set)
+    done: bool = False
+
+
+class FecBlockDecoder:
+    """
+    Receiver side of FecBlockEncoder.
+    
+    Data envelopes are passed on as soon as they arrive. Once any k
+    envelopes of a block (data or parity) have arrived, the missing data
+    envelopes are recovered and passed on too, so the Defragmenter sees a
+    complete fragment stream. Envelopes without FecInfo pass through.
+    
+    Blocks are tracked per (source_node, topic, block_id), so several
+    senders and streams can share one decoder. A new envelope (unseen ID)
+    for an index the block already holds means the sender restarted its
+    block IDs: the stale block, finished or not, is discarded and the new
+    one starts from scratch. At most ``max_blocks`` blocks are tracked;
+    the least recently used is dropped first.
+    
+    Recovered envelopes are decoded from the row codec's frames, so they
+    carry exactly the fields that codec serializes: with ProtobufCodec,
+    ``crypto_info`` and ``qos_class`` are not restored (as for any envelope
+    that crossed the wire in a ProtobufCodec frame).
+    """
+    
+    def __init__(self, codec: Optional[ProtobufCodec] = None, max_blocks: int = 64):
+        """
+        Initialize FEC block decoder.
+        
+        Args:
+            codec: Stateless codec matching the FecBlockEncoder's
+            max_blocks: Maximum number of blocks in progress
+        """
+        self.codec = codec or ProtobufCodec()
+        self.max_blocks = max_blocks
+        self._blocks: "OrderedDict[Tuple[str, str, int], _FecBlock]" = OrderedDict()
+        self._fecs: Dict[Tuple[int, int], ReedSolomonFEC] = {}
+        
+        # Statistics
+        self.recovered = 0
+        self.unrecoverable = 0
+    
+    def receive(self, envelope: Envelope) -> List[Envelope]:
+        """
+        Process one received envelope.
+        
+        Args:
+            envelope: Data or parity envelope (or one without FecInfo)
+        
+        Returns:
+            Data envelopes to pass on (the envelope itself and/or recovered
+            ones; empty for parity envelopes and duplicates)
+        """
+        fec = envelope.metadata.fec_info
+        if fec is None:
+            return [envelope]
+        
+        key = (envelope.metadata.source_node, envelope.topic, fec.block_id)
+        block = self._block(key)
+        if fec.index in block.indices and envelope.id not in block.ids:
+            # Same block ID and index, different envelope: the old block is stale
+            block = self._blocks[key] = _FecBlock()
+        block.indices.add(fec.index)
+        block.ids.add(envelope.id)
+        
+        out: List[Envelope] = []
+        if fec.index < fec.k:
+            if fec.index not in block.delivered:
+                block.delivered.add(fec.index)
+                out.append(envelope)
+            if not block.done:
+                block.rows[fec.index] = _frame_row(self.codec, envelope)
+        else:
+            block.k, block.m = fec.k, fec.m
+            if not block.done:
+                block.rows[fec.index] = bytes(envelope.payload)
+        
+        if not block.done and block.k is not None and len(block.rows) >= block.k:
+            out.extend(self._recover(block))
+        return out
+    
+    def _block(self, key: Tuple[str, str, int]) -> _FecBlock:
+        """Get (or start tracking) a block and mark it most recently used."""
+        block = self._blocks.get(key)
+        if block is not None:
+            self._blocks.move_to_end(key)
+        else:
+            block = self._blocks[key] = _FecBlock()
+            while len(self._blocks) > self.max_blocks:
+                _, dropped = self._blocks.popitem(last=False)
+                if not dropped.done and dropped.k is not None:
+                    self.unrecoverable += dropped.k - len(dropped.delivered)
+        return block
+    
+    def _recover(self, block: _FecBlock) -> List[Envelope]:
+        """Recover a block's missing data envelopes (block has >= k rows)."""
+        k, m = block.k, block.m
+        missing = [i for i in range(k) if i not in block.rows]
+        recovered: List[Envelope] = []
+        if missing:
+            packets = [block.rows.get(i) for i in range(k + m)]
+            fec = self._fecs.get((k, m))
+            if fec is None:
+                fec = self._fecs[(k, m)] = ReedSolomonFEC(k, m)
+            rows = fec.decode(packets, [i for i, p in enumerate(packets) if p is None])
+            for i in missing:
+                length, = _ROW_LENGTH.unpack_from(rows[i], 0)
+                envelope = self.codec.decode(rows[i][_ROW_LENGTH.size:_ROW_LENGTH.size + length])
+                recovered.append(envelope)
+                block.delivered.add(i)
+                block.indices.add(i)
+                block.ids.add(envelope.id)
+            self.recovered += len(missing)
+        
+        block.done = True
+        block.rows.clear()
+        return recovered
@@ -25,6 +25,7 @@ from typing import List, Optional, Iterator
 from uuid import uuid4
 
 from aria_sdk.domain.entities import Envelope, Priority, EnvelopeMetadata
+from aria_sdk.telemetry.batch import ColumnarBatch, ColumnarBatchCodec, COLUMNAR_SCHEMA_FLAG
 
 
 class MedaSensorType(IntEnum):
@@ -280,6 +281,7 @@ class MedaToEnvelopeConverter:
         """
         self.source_node = source_node
         self._sequence_counter = 0
+        self._batch_codec = ColumnarBatchCodec()
     
     def to_envelope(
         self,
@@ -338,6 +340,60 @@ class MedaToEnvelopeConverter:
         """
         return [self.to_envelope(r, priority) for r in readings]
     
+    def to_batch_envelope(
+        self,
+        readings: List[MedaReading],
+        priority: Priority = Priority.P1
+    ) -> Envelope:
+        """Pack readings of one sensor type into a single columnar Envelope.
+        
+        The payload is a ColumnarBatch (delta-coded timestamps, float32
+        values, quality bitmap) and the schema ID is the sensor type with
+        COLUMNAR_SCHEMA_FLAG set. The envelope timestamp is the first reading's.
+        
+        Args:
+            readings: MEDA readings, all of the same sensor type
+            priority: Message priority
+        
+        Returns:
+            ARIA Envelope containing the whole batch
+        """
+        if not readings:
+            raise ValueError("Cannot build a batch envelope from zero readings")
+        sensor_type = readings[0].sensor_type
+        if any(r.sensor_type != sensor_type for r in readings):
+            raise ValueError("Batch readings must all have the same sensor type")
+        
+        batch = ColumnarBatch.from_rows(
+            [r.utc for r in readings],
+            [r.value for r in readings],
+            [r.quality_flag for r in readings]
+        )
+        
+        return Envelope(
+            id=uuid4(),
+            timestamp=readings[0].utc,
+            schema_id=COLUMNAR_SCHEMA_FLAG | sensor_type.value,
+            priority=priority,
+            topic=f"mars/perseverance/meda/{sensor_type.name.lower()}",
+            payload=self._batch_codec.encode(batch),
+            metadata=EnvelopeMetadata(
+                source_node=self.source_node,
+                sequence_number=self._next_sequence()
+            )
+        )
+    
+    def decode_batch_envelope(self, envelope: Envelope) -> ColumnarBatch:
+        """Extract the reading columns from a batch Envelope.
+        
+        Args:
+            envelope: Envelope built by to_batch_envelope
+        
+        Returns:
+            ColumnarBatch with timestamps, values and quality flags
+        """
+        return self._batch_codec.decode(envelope.payload)
+    
     def decode_envelope(self, envelope: Envelope) -> float:
         """Extract sensor value from an Envelope payload.
         
@@ -4,33 +4,137 @@ ARIA SDK - Telemetry Packetization Module
 Provides MTU-aware fragmentation and reassembly of large envelopes.
 """
 
+import os
+import socket
 import time
-from typing import Dict, List, Optional
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple, Union
 from uuid import UUID, uuid4
-from datetime import datetime, timezone
-from collections import defaultdict
+from collections import OrderedDict
 
-from aria_sdk.domain.entities import Envelope, EnvelopeMetadata, FragmentInfo
+from aria_sdk.domain.entities import Envelope, FragmentInfo, FecInfo
+from aria_sdk.domain.protocols import ICryptoBox
+from aria_sdk.telemetry.codec import ProtobufCodec, _FEC, _FRAGMENT, _U32
+from aria_sdk.telemetry.fec import FecBlockEncoder
+
+
+# Frame offsets patched per fragment by Packetizer.packetize_frames
+_BODY_LENGTH_POS = 3                            # after magic and version
+_ID_POS = ProtobufCodec.HEADER_SIZE             # envelope ID follows the header
+_FRAGMENT_SECTION_SIZE = _FRAGMENT.size + 16    # id/total/offset/length, message ID
+
+# Stand-ins for the fixed-size sections when measuring frame overhead
+_PROBE_FRAGMENT = FragmentInfo(
+    fragment_id=0, total_fragments=1, offset=0, length=0, message_id=UUID(int=0)
+)
+_PROBE_FEC = FecInfo(k=1, m=1, block_id=0)
+
+# One wire frame as scatter-gather buffers: (head, payload, tail)
+FrameBuffers = Tuple[Union[bytes, bytearray], memoryview, Union[bytes, bytearray]]
 
 
 class Packetizer:
     """
     Packetizes large envelopes into MTU-sized fragments.
+    
+    Fragment sizes come from exact per-datagram accounting rather than a
+    fixed reserve: the codec's frame overhead for this envelope (header,
+    metadata, fragment section), the crypto box's ciphertext overhead and,
+    with an FEC stage, the FEC section plus the parity framing - parity
+    frames wrap whole data frames, so they are the largest datagrams of a
+    block and set the limit. Every datagram of a message then fits the MTU
+    with the data fragments as full as that allows.
     """
     
-    def __init__(self, mtu: int = 1400):
+    def __init__(
+        self,
+        mtu: int = 1400,
+        codec: Optional[ProtobufCodec] = None,
+        crypto: Optional[ICryptoBox] = None,
+        fec: Optional[FecBlockEncoder] = None
+    ):
         """
         Initialize packetizer.
         
         Args:
             mtu: Maximum transmission unit (bytes). Default: 1400 (safe for most networks)
+            codec: Wire codec the fragments are encoded with (default: ProtobufCodec())
+            crypto: Crypto box applied to each encoded frame (reserves its
+                OVERHEAD; a box without one is rejected)
+            fec: FEC stage the fragments go through before encoding
+        """
+        self.codec = codec or ProtobufCodec()
+        self.crypto = crypto
+        self.crypto_overhead = 0
+        if crypto is not None:
+            overhead = getattr(crypto, 'OVERHEAD', None)
+            if not isinstance(overhead, int) or overhead < 0:
+                raise ValueError(
+                    f"{type(crypto).__name__} must declare OVERHEAD (bytes encrypt() adds) "
+                    f"to size fragments, got {overhead!r}"
+                )
+            self.crypto_overhead = overhead
+        self.fec = fec
+        self.set_mtu(mtu)
+    
+    def set_mtu(self, mtu: int) -> None:
+        """
+        Change the MTU, e.g. after a transport's path-MTU probe.
+        
+        Applies to envelopes packetized from now on; each message is
+        fragmented with a single size, so in-flight messages still
+        reassemble.
+        
+        Args:
+            mtu: Maximum transmission unit (bytes)
         """
         if mtu < 64:
             raise ValueError(f"MTU too small: {mtu} (minimum 64 bytes)")
-        
         self.mtu = mtu
-        # Reserve space for metadata (~100 bytes for fragment info)
-        self.max_payload_per_fragment = mtu - 100
+    
+    def overhead(self, envelope: Envelope, fragmented: bool = True) -> int:
+        """
+        Bytes each datagram of an envelope carries besides its payload.
+        
+        Args:
+            envelope: Envelope to be sent
+            fragmented: Account for the fragment section
+        
+        Returns:
+            Worst-case datagram size minus payload size, in bytes
+        """
+        metadata = envelope.metadata
+        if fragmented:
+            metadata = replace(metadata, fragment_info=_PROBE_FRAGMENT)
+        if self.fec is not None and metadata.fec_info is None:
+            metadata = replace(metadata, fec_info=_PROBE_FEC)
+        probe = replace(envelope, payload=b'', metadata=metadata)
+        
+        overhead = self.codec.frame_overhead(probe)
+        if self.fec is not None:
+            overhead = max(overhead, self.fec.parity_overhead(probe, self.codec))
+        return overhead + self.crypto_overhead
+    
+    def max_payload(self, envelope: Envelope, fragmented: bool = True) -> int:
+        """
+        Largest payload per datagram that keeps the envelope's datagrams within the MTU.
+        
+        Args:
+            envelope: Envelope to be sent
+            fragmented: Account for the fragment section
+        
+        Returns:
+            Payload bytes per datagram
+        
+        Raises:
+            ValueError: If the overhead alone exceeds the MTU
+        """
+        overhead = self.overhead(envelope, fragmented)
+        if overhead >= self.mtu:
+            raise ValueError(
+                f"MTU {self.mtu} leaves no room for payload ({overhead} bytes of overhead)"
+            )
+        return self.mtu - overhead
     
     def packetize(self, envelope: Envelope) -> List[Envelope]:
         """
@@ -38,26 +142,31 @@ class Packetizer:
         
         Args:
             envelope: Envelope to fragment
-            
+        
         Returns:
             List of envelope fragments (1 if no fragmentation needed)
+        
+        Raises:
+            ValueError: If the overhead alone exceeds the MTU
         """
         payload_size = len(envelope.payload)
         
-        if payload_size <= self.max_payload_per_fragment:
+        if payload_size <= self.max_payload(envelope, fragmented=False):
             # No fragmentation needed
             return [envelope]
         
+        step = self.max_payload(envelope)
+        
         # Generate message ID for this fragmentation
         message_id = uuid4()
         
         # Calculate number of fragments
-        num_fragments = (payload_size + self.max_payload_per_fragment - 1) // self.max_payload_per_fragment
+        num_fragments = (payload_size + step - 1) // step
         
         fragments = []
         for frag_idx in range(num_fragments):
-            offset = frag_idx * self.max_payload_per_fragment
-            end = min(offset + self.max_payload_per_fragment, payload_size)
+            offset = frag_idx * step
+            end = min(offset + step, payload_size)
             fragment_payload = envelope.payload[offset:end]
             
             # Create fragment metadata
@@ -70,19 +179,13 @@ class Packetizer:
             )
             
             # Copy existing metadata and add fragment info
-            if envelope.metadata:
-                metadata = EnvelopeMetadata(
-                    fragment_info=frag_info,
-                    fec_info=envelope.metadata.fec_info,
-                    crypto_info=envelope.metadata.crypto_info
-                )
-            else:
-                metadata = EnvelopeMetadata(fragment_info=frag_info)
+            metadata = replace(envelope.metadata, fragment_info=frag_info)
             
             # Create fragment envelope
             fragment = Envelope(
                 id=uuid4(),  # Each fragment gets unique ID
                 timestamp=envelope.timestamp,
+                schema_id=envelope.schema_id,
                 priority=envelope.priority,
                 topic=envelope.topic,
                 payload=fragment_payload,
@@ -92,6 +195,137 @@ class Packetizer:
             fragments.append(fragment)
         
         return fragments
+    
+    def packetize_frames(self, envelope: Envelope) -> List[FrameBuffers]:
+        """
+        Fragment an envelope straight into wire frames (zero-copy fast path).
+        
+        The frame head and tail are encoded once per message; each fragment
+        patches its own fields into a copy of that template and references
+        its payload slice as a memoryview, so no payload bytes are copied
+        and no per-fragment Envelope is built. ``head + payload + tail`` is
+        the frame ``self.codec.encode()`` would produce for the matching
+        packetize() fragment (fragment envelope IDs are random either way).
+        
+        The frames are plaintext without FecInfo, so this path is only
+        available when no crypto box or FEC stage is configured; otherwise
+        use packetize() and run the fragments through those stages.
+        
+        Args:
+            envelope: Envelope to fragment
+        
+        Returns:
+            List of (head, payload, tail) buffers, one frame per fragment
+            (bytearray head/tail per fragment, the codec's bytes when the
+            envelope is not fragmented)
+        
+        Raises:
+            ValueError: If crypto or FEC is configured, encoding fails or
+                the overhead alone exceeds the MTU
+        """
+        if self.crypto is not None or self.fec is not None:
+            raise ValueError(
+                "packetize_frames cannot apply crypto or FEC; use packetize() with those stages"
+            )
+        codec = self.codec
+        payload = memoryview(envelope.payload)
+        payload_size = len(payload)
+        
+        if payload_size <= self.max_payload(envelope, fragmented=False):
+            head, tail = codec.encode_parts(envelope)
+            return [(head, payload, tail)]
+        
+        step = self.max_payload(envelope)
+        num_fragments = (payload_size + step - 1) // step
+        
+        # Template from the first fragment; only IDs and sizes differ per fragment
+        template = Envelope(
+            id=envelope.id,
+            timestamp=envelope.timestamp,
+            schema_id=envelope.schema_id,
+            priority=envelope.priority,
+            topic=envelope.topic,
+            payload=payload[:step],
+            metadata=replace(envelope.metadata, fragment_info=FragmentInfo(
+                fragment_id=0,
+                total_fragments=num_fragments,
+                offset=0,
+                length=step,
+                message_id=uuid4()
+            ))
+        )
+        head, tail = codec.encode_parts(template)
+        payload_pos = len(head)
+        fec_size = _FEC.size if envelope.metadata.fec_info else 0
+        frag_pos = len(tail) - _FRAGMENT_SECTION_SIZE - fec_size
+        ids = os.urandom(16 * num_fragments)
+        
+        frames = []
+        for frag_idx in range(num_fragments):
+            offset = frag_idx * step
+            length = min(step, payload_size - offset)
+            
+            frag_head = bytearray(head)
+            frag_head[_ID_POS:_ID_POS + 16] = ids[16 * frag_idx:16 * frag_idx + 16]
+            frag_head[_ID_POS + 6] = frag_head[_ID_POS + 6] & 0x0F | 0x40    # UUID version 4
+            frag_head[_ID_POS + 8] = frag_head[_ID_POS + 8] & 0x3F | 0x80    # RFC 4122 variant
+            if length != step:
+                body_length = payload_pos + length + len(tail) - ProtobufCodec.HEADER_SIZE
+                _U32.pack_into(frag_head, _BODY_LENGTH_POS, body_length)
+                _U32.pack_into(frag_head, payload_pos - 4, length)
+            
+            frag_tail = bytearray(tail)
+            _FRAGMENT.pack_into(frag_tail, frag_pos, frag_idx, num_fragments, offset, length)
+            
+            frames.append((frag_head, payload[offset:offset + length], frag_tail))
+        
+        return frames
+    
+    def send_fragments(
+        self,
+        sock: socket.socket,
+        envelope: Envelope,
+        address: Optional[tuple] = None
+    ) -> int:
+        """
+        Fragment an envelope and send one datagram per fragment.
+        
+        Uses socket.sendmsg scatter-gather, so each datagram is assembled
+        by the kernel from the (head, payload, tail) buffers of
+        packetize_frames() and the payload is never copied in user space.
+        
+        Args:
+            sock: Datagram socket (connected, or pass address)
+            envelope: Envelope to send
+            address: Destination for unconnected sockets
+        
+        Returns:
+            Total bytes sent
+        
+        Raises:
+            ValueError: If crypto or FEC is configured (see packetize_frames)
+        """
+        sent = 0
+        for buffers in self.packetize_frames(envelope):
+            if address is None:
+                sent += sock.sendmsg(buffers)
+            else:
+                sent += sock.sendmsg(buffers, (), 0, address)
+        return sent
+
+
+@dataclass
+class _PartialMessage:
+    """Reassembly state of one fragmented message."""
+    
+    first: Envelope                 # Template for the reassembled envelope
+    deadline: float                 # time.monotonic() after which it is dropped
+    total: int                      # Fragments in the message
+    step: int                       # Payload bytes of every fragment but the last
+    buffer: bytearray               # Payload, written at each fragment's offset
+    received: bytearray             # One flag per fragment ID
+    missing: int                    # Fragments not yet received
+    size: Optional[int] = None      # Exact payload size, known once the last fragment arrives
 
 
 class Defragmenter:
@@ -99,24 +333,46 @@ class Defragmenter:
     Reassembles fragmented envelopes.
     
     Handles out-of-order fragments and detects incomplete messages.
+    
+    Each fragment is written straight into a payload buffer preallocated
+    from the first fragment's size, and completeness is a per-fragment flag
+    array plus a counter, so the per-fragment cost is O(1) whatever the
+    message size or the number of messages in flight. Messages are kept in
+    first-fragment order, which is also deadline order, so timeouts and the
+    oldest message are found at the front.
+    
+    Fragment headers are untrusted: a message that would exceed
+    ``max_fragments`` or ``max_message_size`` is never allocated, and a
+    fragment whose total, size or offset disagrees with the message's
+    first fragment is dropped (both counted in ``rejected``).
     """
     
-    def __init__(self, timeout: float = 5.0, max_messages: int = 100):
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        max_messages: int = 100,
+        max_fragments: int = 65536,
+        max_message_size: int = 64 * 1024 * 1024
+    ):
         """
         Initialize defragmenter.
         
         Args:
             timeout: Timeout for incomplete messages (seconds)
             max_messages: Maximum concurrent in-progress messages
+            max_fragments: Maximum fragments per message
+            max_message_size: Maximum reassembled payload size (bytes)
         """
         self.timeout = timeout
         self.max_messages = max_messages
+        self.max_fragments = max_fragments
+        self.max_message_size = max_message_size
         
-        # message_id -> {fragment_id: (envelope, arrival_time)}
-        self.fragments: Dict[UUID, Dict[int, tuple[Envelope, float]]] = defaultdict(dict)
+        # message_id -> reassembly state, oldest first
+        self.messages: "OrderedDict[UUID, _PartialMessage]" = OrderedDict()
         
-        # message_id -> (total_fragments, topic, priority, timestamp)
-        self.message_info: Dict[UUID, tuple[int, str, int, datetime]] = {}
+        # Statistics
+        self.rejected = 0
     
     def defragment(self, envelope: Envelope) -> Optional[Envelope]:
         """
@@ -124,10 +380,10 @@ class Defragmenter:
         
         Args:
             envelope: Fragment envelope
-            
+        
         Returns:
             Reassembled envelope if complete, None if waiting for more fragments
-            
+        
         Raises:
             ValueError: If fragment metadata is missing or invalid
         """
@@ -139,30 +395,73 @@ class Defragmenter:
         message_id = frag_info.message_id
         frag_id = frag_info.fragment_id
         total_frags = frag_info.total_fragments
+        if not 0 <= frag_id < total_frags:
+            raise ValueError(f"Invalid fragment {frag_id} of {total_frags}")
+        
+        now = time.monotonic()
         
         # Garbage collect old incomplete messages
-        self._gc_timeout()
+        self._gc_timeout(now)
         
-        # Check capacity
-        if len(self.fragments) >= self.max_messages and message_id not in self.fragments:
-            print(f"[Defragmenter] Warning: Too many incomplete messages, dropping oldest")
-            self._drop_oldest()
+        is_last = frag_id == total_frags - 1
+        length = frag_info.length
+        message = self.messages.get(message_id)
+        if message is None:
+            # Every fragment but the last is full-size, so one fragment fixes
+            # the step and bounds the payload
+            if not is_last:
+                step = length
+            elif frag_id:
+                step = frag_info.offset // frag_id
+            else:
+                step = length
+            capacity = frag_info.offset + length if is_last else total_frags * step
+            if total_frags > self.max_fragments or capacity > self.max_message_size or step < 1:
+                self.rejected += 1
+                return None
+            
+            # Check capacity
+            if len(self.messages) >= self.max_messages:
+                print(f"[Defragmenter] Warning: Too many incomplete messages, dropping oldest")
+                self._drop_oldest()
+            
+            message = _PartialMessage(
+                first=envelope,
+                deadline=now + self.timeout,
+                total=total_frags,
+                step=step,
+                buffer=bytearray(capacity),
+                received=bytearray(total_frags),
+                missing=total_frags
+            )
+            self.messages[message_id] = message
+        
+        if (
+            total_frags != message.total
+            or frag_info.offset != frag_id * message.step
+            or len(envelope.payload) != length
+            or not (0 < length <= message.step if is_last else length == message.step)
+        ):
+            # Disagrees with the message's other fragments
+            self.rejected += 1
+            return None
+        
+        if message.received[frag_id]:
+            # Duplicate
+            return None
+        message.received[frag_id] = 1
+        message.missing -= 1
         
         # Store fragment
-        arrival_time = time.monotonic()
-        self.fragments[message_id][frag_id] = (envelope, arrival_time)
-        
-        # Store message info
-        if message_id not in self.message_info:
-            self.message_info[message_id] = (
-                total_frags,
-                envelope.topic,
-                envelope.priority.value,
-                envelope.timestamp
-            )
+        end = frag_info.offset + length
+        message.buffer[frag_info.offset:end] = envelope.payload
+        if is_last:
+            message.size = end
+        if frag_id == 0:
+            message.first = envelope
         
         # Check if complete
-        if len(self.fragments[message_id]) == total_frags:
+        if not message.missing:
             return self._reassemble(message_id)
         
         return None
@@ -173,72 +472,46 @@ class Defragmenter:
         
         Args:
             message_id: Message to reassemble
-            
+        
         Returns:
             Reassembled envelope
         """
-        frags_dict = self.fragments.pop(message_id)
-        total_frags, topic, priority_val, timestamp = self.message_info.pop(message_id)
-        
-        # Sort fragments by ID
-        sorted_frags = sorted(frags_dict.items(), key=lambda x: x[0])
-        
-        # Concatenate payloads
-        full_payload = b''.join([env.payload for _, (env, _) in sorted_frags])
-        
-        # Create reassembled envelope
-        from aria_sdk.domain.entities import Priority
+        message = self.messages.pop(message_id)
+        first = message.first
+        del message.buffer[message.size:]
         
         reassembled = Envelope(
             id=uuid4(),
-            timestamp=timestamp,
-            priority=Priority(priority_val),
-            topic=topic,
-            payload=full_payload,
-            metadata=None  # Remove fragment info
+            timestamp=first.timestamp,
+            schema_id=first.schema_id,
+            priority=first.priority,
+            topic=first.topic,
+            payload=bytes(message.buffer),
+            # Remove fragment info
+            metadata=replace(first.metadata, fragment_info=None, fec_info=None)
         )
         
         return reassembled
     
-    def _gc_timeout(self):
+    def _gc_timeout(self, now: float):
         """Garbage collect timed-out incomplete messages."""
-        now = time.monotonic()
-        to_remove = []
-        
-        for message_id, frags_dict in self.fragments.items():
-            # Check oldest fragment
-            oldest_time = min(arrival_time for _, arrival_time in frags_dict.values())
-            if now - oldest_time > self.timeout:
-                to_remove.append(message_id)
-        
-        for message_id in to_remove:
-            total_frags = self.message_info[message_id][0]
-            received_frags = len(self.fragments[message_id])
+        while self.messages:
+            message_id, message = next(iter(self.messages.items()))
+            if message.deadline >= now:
+                break
+            
+            total_frags = message.total
+            received_frags = total_frags - message.missing
             print(
                 f"[Defragmenter] Timeout: message {message_id} "
                 f"incomplete ({received_frags}/{total_frags} fragments)"
             )
-            self.fragments.pop(message_id)
-            self.message_info.pop(message_id)
+            del self.messages[message_id]
     
     def _drop_oldest(self):
         """Drop oldest incomplete message."""
-        if not self.fragments:
-            return
-        
-        # Find oldest message
-        oldest_id = None
-        oldest_time = float('inf')
-        
-        for message_id, frags_dict in self.fragments.items():
-            min_time = min(arrival_time for _, arrival_time in frags_dict.values())
-            if min_time < oldest_time:
-                oldest_time = min_time
-                oldest_id = message_id
-        
-        if oldest_id:
-            self.fragments.pop(oldest_id)
-            self.message_info.pop(oldest_id)
+        if self.messages:
+            self.messages.popitem(last=False)
     
     def get_stats(self) -> Dict[str, int]:
         """
@@ -247,8 +520,8 @@ class Defragmenter:
         Returns:
             Dict with 'incomplete_messages' and 'total_fragments'
         """
-        total_fragments = sum(len(frags) for frags in self.fragments.values())
+        total_fragments = sum(message.total - message.missing for message in self.messages.values())
         return {
-            'incomplete_messages': len(self.fragments),
+            'incomplete_messages': len(self.messages),
             'total_fragments': total_fragments
         }
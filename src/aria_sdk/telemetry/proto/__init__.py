@@ -0,0 +1,7 @@
+"""ARIA SDK - Telemetry Protobuf Schema (generated from telemetry.proto)"""
+
+from . import telemetry_pb2
+
+__all__ = [
+    'telemetry_pb2',
+]
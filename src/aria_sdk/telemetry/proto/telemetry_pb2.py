@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: aria_sdk/telemetry/proto/telemetry.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n(aria_sdk/telemetry/proto/telemetry.proto\x12\x0e\x61ria.telemetry\"p\n\x0c\x46ragmentInfo\x12\x13\n\x0b\x66ragment_id\x18\x01 \x01(\r\x12\x17\n\x0ftotal_fragments\x18\x02 \x01(\r\x12\x0e\n\x06offset\x18\x03 \x01(\r\x12\x0e\n\x06length\x18\x04 \x01(\r\x12\x12\n\nmessage_id\x18\x05 \x01(\x0c\"@\n\x07\x46\x65\x63Info\x12\t\n\x01k\x18\x01 \x01(\r\x12\t\n\x01m\x18\x02 \x01(\r\x12\x10\n\x08\x62lock_id\x18\x03 \x01(\r\x12\r\n\x05index\x18\x04 \x01(\r\">\n\nCryptoInfo\x12\x11\n\tsignature\x18\x01 \x01(\x0c\x12\x0e\n\x06key_id\x18\x02 \x01(\t\x12\r\n\x05nonce\x18\x03 \x01(\x0c\"\xf6\x01\n\x10\x45nvelopeMetadata\x12\x13\n\x0bsource_node\x18\x01 \x01(\t\x12\x17\n\x0fsequence_number\x18\x02 \x01(\r\x12\x33\n\rfragment_info\x18\x03 \x01(\x0b\x32\x1c.aria.telemetry.FragmentInfo\x12)\n\x08\x66\x65\x63_info\x18\x04 \x01(\x0b\x32\x17.aria.telemetry.FecInfo\x12/\n\x0b\x63rypto_info\x18\x05 \x01(\x0b\x32\x1a.aria.telemetry.CryptoInfo\x12\x11\n\tqos_class\x18\x06 \x01(\t\x12\x10\n\x08is_delta\x18\x07 \x01(\x08\"\xd6\x01\n\x08\x45nvelope\x12\n\n\x02id\x18\x01 \x01(\x0c\x12\x14\n\x0ctimestamp_ns\x18\x02 \x01(\x10\x12\x15\n\rtimestamp_utc\x18\x03 \x01(\x08\x12\x11\n\tschema_id\x18\x04 \x01(\r\x12*\n\x08priority\x18\x05 \x01(\x0e\x32\x18.aria.telemetry.Priority\x12\r\n\x05topic\x18\x06 \x01(\t\x12\x0f\n\x07payload\x18\x07 \x01(\x0c\x12\x32\n\x08metadata\x18\x08 \x01(\x0b\x32 .aria.telemetry.EnvelopeMetadata**\n\x08Priority\x12\x06\n\x02P0\x10\x00\x12\x06\n\x02P1\x10\x01\x12\x06\n\x02P2\x10\x02\x12\x06\n\x02P3\x10\x03\x62\x06proto3')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'aria_sdk.telemetry.proto.telemetry_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _PRIORITY._serialized_start=770
+  _PRIORITY._serialized_end=812
+  _FRAGMENTINFO._serialized_start=60
+  _FRAGMENTINFO._serialized_end=172
+  _FECINFO._serialized_start=174
+  _FECINFO._serialized_end=238
+  _CRYPTOINFO._serialized_start=240
+  _CRYPTOINFO._serialized_end=302
+  _ENVELOPEMETADATA._serialized_start=305
+  _ENVELOPEMETADATA._serialized_end=551
+  _ENVELOPE._serialized_start=554
+  _ENVELOPE._serialized_end=768
+# @@protoc_insertion_point(module_scope)
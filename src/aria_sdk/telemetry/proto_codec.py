@@ -0,0 +1,211 @@
+"""
+ARIA SDK - Telemetry Protobuf Schema Codec Module
+
+Serializes envelopes with the classes generated from proto/telemetry.proto,
+as an alternative to the hand-rolled ProtobufCodec wire format.
+"""
+
+import struct
+from typing import Optional
+from uuid import UUID
+
+from aria_sdk.domain.entities import (
+    Envelope, Priority, EnvelopeMetadata, FragmentInfo, FecInfo, CryptoInfo
+)
+from aria_sdk.domain.protocols import ICodec
+from aria_sdk.telemetry.codec import ProtobufCodec, FLAG_UTC, _to_epoch_ns, _from_epoch_ns
+from aria_sdk.telemetry.proto import telemetry_pb2
+
+
+_FRAME_HEADER = struct.Struct('!2sBI')     # magic, version, message length
+
+
+class ProtoSchemaCodec(ICodec):
+    """
+    Generated-protobuf codec for telemetry envelopes.
+    
+    Wire format:
+    - Magic bytes: 0xAA 0xBB (2 bytes), same framing as ProtobufCodec
+    - Version: 1 byte (0x10 - never a ProtobufCodec version, so each codec
+      rejects the other's frames instead of misparsing them)
+    - Message length: 4 bytes (big-endian uint32)
+    - aria.telemetry.Envelope message (proto3, see proto/telemetry.proto)
+    
+    Unlike ProtobufCodec, FEC and crypto metadata and the QoS class are
+    carried on the wire as well.
+    """
+    
+    MAGIC = ProtobufCodec.MAGIC
+    VERSION = 0x10
+    HEADER_SIZE = _FRAME_HEADER.size
+    
+    def encode(self, envelope: Envelope) -> bytes:
+        """
+        Encode an envelope to bytes.
+        
+        Args:
+            envelope: The envelope to encode
+        
+        Returns:
+            Serialized bytes
+        
+        Raises:
+            ValueError: If encoding fails
+        """
+        try:
+            body = self.to_message(envelope).SerializeToString()
+            return _FRAME_HEADER.pack(self.MAGIC, self.VERSION, len(body)) + body
+        except Exception as e:
+            raise ValueError(f"Encoding failed: {e}") from e
+    
+    def decode(self, data: bytes) -> Envelope:
+        """
+        Decode bytes to an envelope.
+        
+        Args:
+            data: Serialized envelope bytes
+        
+        Returns:
+            Decoded envelope
+        
+        Raises:
+            ValueError: If decoding fails
+        """
+        try:
+            if len(data) < _FRAME_HEADER.size:
+                raise ValueError(f"Truncated header: {len(data)} bytes")
+            
+            magic, version, length = _FRAME_HEADER.unpack_from(data, 0)
+            if magic != self.MAGIC:
+                raise ValueError(f"Invalid magic bytes: {magic.hex()}")
+            if version != self.VERSION:
+                raise ValueError(f"Unsupported version: {version}")
+            
+            end = _FRAME_HEADER.size + length
+            if end > len(data):
+                raise ValueError(
+                    f"Truncated frame: need {length} bytes, have {len(data) - _FRAME_HEADER.size}"
+                )
+            
+            message = telemetry_pb2.Envelope()
+            message.ParseFromString(bytes(data[_FRAME_HEADER.size:end]))
+            return self.from_message(message)
+        
+        except Exception as e:
+            raise ValueError(f"Decoding failed: {e}") from e
+    
+    @staticmethod
+    def to_message(envelope: Envelope) -> telemetry_pb2.Envelope:
+        """
+        Convert a domain Envelope to its generated protobuf message.
+        
+        Args:
+            envelope: Domain envelope
+        
+        Returns:
+            aria.telemetry.Envelope message
+        """
+        timestamp_ns, flags = _to_epoch_ns(envelope.timestamp)
+        message = telemetry_pb2.Envelope(
+            id=envelope.id.bytes,
+            timestamp_ns=timestamp_ns,
+            timestamp_utc=bool(flags & FLAG_UTC),
+            schema_id=envelope.schema_id,
+            priority=int(envelope.priority),
+            topic=envelope.topic,
+            payload=bytes(envelope.payload),
+        )
+        
+        metadata = envelope.metadata
+        if metadata is None:
+            return message
+        
+        message.metadata.source_node = metadata.source_node
+        message.metadata.sequence_number = metadata.sequence_number
+        message.metadata.qos_class = metadata.qos_class
+        message.metadata.is_delta = metadata.is_delta
+        
+        frag = metadata.fragment_info
+        if frag is not None:
+            message.metadata.fragment_info.fragment_id = frag.fragment_id
+            message.metadata.fragment_info.total_fragments = frag.total_fragments
+            message.metadata.fragment_info.offset = frag.offset
+            message.metadata.fragment_info.length = frag.length
+            message.metadata.fragment_info.message_id = frag.message_id.bytes
+        
+        fec = metadata.fec_info
+        if fec is not None:
+            message.metadata.fec_info.k = fec.k
+            message.metadata.fec_info.m = fec.m
+            message.metadata.fec_info.block_id = fec.block_id
+            message.metadata.fec_info.index = fec.index
+        
+        crypto = metadata.crypto_info
+        if crypto is not None:
+            message.metadata.crypto_info.signature = crypto.signature
+            message.metadata.crypto_info.key_id = crypto.key_id
+            message.metadata.crypto_info.nonce = crypto.nonce
+        
+        return message
+    
+    @staticmethod
+    def from_message(message: telemetry_pb2.Envelope) -> Envelope:
+        """
+        Convert a generated protobuf message back to a domain Envelope.
+        
+        Args:
+            message: aria.telemetry.Envelope message
+        
+        Returns:
+            Domain envelope
+        """
+        meta = message.metadata
+        
+        fragment_info: Optional[FragmentInfo] = None
+        if meta.HasField('fragment_info'):
+            fragment_info = FragmentInfo(
+                fragment_id=meta.fragment_info.fragment_id,
+                total_fragments=meta.fragment_info.total_fragments,
+                offset=meta.fragment_info.offset,
+                length=meta.fragment_info.length,
+                message_id=UUID(bytes=meta.fragment_info.message_id)
+            )
+        
+        fec_info: Optional[FecInfo] = None
+        if meta.HasField('fec_info'):
+            fec_info = FecInfo(
+                k=meta.fec_info.k,
+                m=meta.fec_info.m,
+                block_id=meta.fec_info.block_id,
+                index=meta.fec_info.index
+            )
+        
+        crypto_info: Optional[CryptoInfo] = None
+        if meta.HasField('crypto_info'):
+            crypto_info = CryptoInfo(
+                signature=meta.crypto_info.signature,
+                key_id=meta.crypto_info.key_id,
+                nonce=meta.crypto_info.nonce
+            )
+        
+        metadata = EnvelopeMetadata(
+            source_node=meta.source_node,
+            sequence_number=meta.sequence_number,
+            fragment_info=fragment_info,
+            fec_info=fec_info,
+            crypto_info=crypto_info,
+            qos_class=meta.qos_class or "default",
+            is_delta=meta.is_delta
+        )
+        
+        return Envelope(
+            id=UUID(bytes=message.id),
+            timestamp=_from_epoch_ns(
+                message.timestamp_ns, FLAG_UTC if message.timestamp_utc else 0
+            ),
+            schema_id=message.schema_id,
+            priority=Priority(message.priority),
+            topic=message.topic,
+            payload=message.payload,
+            metadata=metadata
+        )
@@ -29,7 +29,7 @@ from rich.layout import Layout
 from rich.text import Text
 
 from aria_sdk.telemetry.codec import ProtobufCodec
-from aria_sdk.telemetry.compression import Lz4Compressor, ZstdCompressor
+from aria_sdk.telemetry.compression import Lz4Compressor, ZstdCompressor, AdaptiveCompressor
 from aria_sdk.domain.entities import Priority
 
 
@@ -44,16 +44,21 @@ class TelemetryReceiver:
         self,
         host: str = "127.0.0.1",
         port: int = 5555,
-        save_dir: Optional[Path] = None
+        save_dir: Optional[Path] = None,
+        dict_dir: Optional[Path] = None
     ):
         self.host = host
         self.port = port
         self.save_dir = Path(save_dir) if save_dir else None
         
-        # Initialize decoder/decompressor
+        # Initialize decoder/decompressor (Zstd frames name their dictionary,
+        # which is looked up in dict_dir - see ZstdCompressor)
         self.codec = ProtobufCodec()
         self.lz4 = Lz4Compressor()
-        self.zstd = ZstdCompressor()
+        self.zstd = ZstdCompressor(dictionary_dir=dict_dir)
+        self.adaptive = AdaptiveCompressor()
+        if dict_dir:
+            self.zstd.load_dictionaries(dict_dir)
         
         # Statistics
         self.stats = {
@@ -121,11 +126,13 @@ class TelemetryReceiver:
                 encoded_data = self.lz4.decompress(compressed_data)
             elif compression == 'zstd':
                 encoded_data = self.zstd.decompress(compressed_data)
+            elif compression == 'adaptive':
+                encoded_data = self.adaptive.decompress(compressed_data)
             else:
                 encoded_data = compressed_data
             
-            # Decode
-            envelope = self.codec.decode(encoded_data)
+            # Decode lazily - routing and stats only touch topic/priority
+            envelope = self.codec.decode_view(encoded_data)
             
             # Update stats
             self.stats['envelopes_received'] += 1
@@ -145,9 +152,9 @@ class TelemetryReceiver:
             priority = envelope.priority.name
             self.stats['by_priority'][priority] = self.stats['by_priority'].get(priority, 0) + 1
             
-            # Add to recent
+            # Add to recent (keep the view; timestamp is only parsed if displayed)
             envelope_info = {
-                'timestamp': envelope.timestamp,
+                'envelope': envelope,
                 'topic': topic,
                 'priority': priority,
                 'payload_size': envelope.payload_size,
@@ -161,10 +168,10 @@ class TelemetryReceiver:
             
             # Save if requested
             if self.save_dir:
-                filename = f"{envelope.envelope_id}.bin"
+                filename = f"{envelope.id}.bin"
                 with open(self.save_dir / filename, 'wb') as f:
                     f.write(encoded_data)
-            
+        
         except Exception as e:
             self.stats['errors'] += 1
             self.console.print(f"[red]Error processing envelope: {e}[/red]")
@@ -190,7 +197,7 @@ class TelemetryReceiver:
                 
                 # Process envelope
                 self._process_envelope(compressed_data, metadata)
-                
+            
             except Exception as e:
                 self.console.print(f"[red]Error handling client: {e}[/red]")
                 break
@@ -262,7 +269,7 @@ class TelemetryReceiver:
         recent_table.add_column("Ratio", style="red", width=8)
         
         for env in reversed(self.recent_envelopes[-10:]):
-            time_str = datetime.fromtimestamp(env['timestamp']).strftime('%H:%M:%S.%f')[:-3]
+            time_str = env['envelope'].timestamp.strftime('%H:%M:%S.%f')[:-3]
             recent_table.add_row(
                 time_str,
                 env['topic'],
@@ -332,13 +339,15 @@ def main():
     parser.add_argument('--host', default='127.0.0.1', help='Host to bind to')
     parser.add_argument('--port', type=int, default=5555, help='Port to listen on')
     parser.add_argument('--save-dir', help='Directory to save decoded envelopes')
+    parser.add_argument('--dict-dir', help='Directory of trained Zstd dictionaries (*.zdict)')
     
     args = parser.parse_args()
     
     receiver = TelemetryReceiver(
         host=args.host,
         port=args.port,
-        save_dir=args.save_dir
+        save_dir=args.save_dir,
+        dict_dir=args.dict_dir
     )
     
     try:
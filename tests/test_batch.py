@@ -0,0 +1,140 @@
+"""
+Tests for telemetry columnar batch module.
+"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from aria_sdk.telemetry.batch import ColumnarBatch, ColumnarBatchCodec, is_columnar
+from aria_sdk.telemetry.codec import ProtobufCodec
+from aria_sdk.telemetry.meda_adapter import MedaReading, MedaSensorType, MedaToEnvelopeConverter
+
+
+def _readings(count, start=datetime(2021, 6, 9, tzinfo=timezone.utc), step=timedelta(seconds=1)):
+    return [
+        MedaReading(
+            sol=100,
+            lmst="00:00:00",
+            utc=start + i * step,
+            sensor_type=MedaSensorType.PRESSURE,
+            value=730.0 + 0.01 * i,
+            unit="Pa",
+            quality_flag=int(i % 7 != 0),
+        )
+        for i in range(count)
+    ]
+
+
+class TestColumnarBatchCodec:
+    """Test suite for ColumnarBatchCodec."""
+    
+    @pytest.fixture
+    def codec(self):
+        """Create a codec instance."""
+        return ColumnarBatchCodec()
+    
+    @pytest.mark.parametrize("count", [0, 1, 9, 1000])
+    def test_roundtrip(self, codec, count):
+        """Test that all three columns survive encoding."""
+        readings = _readings(count)
+        batch = ColumnarBatch.from_rows(
+            [r.utc for r in readings],
+            [r.value for r in readings],
+            [r.quality_flag for r in readings]
+        )
+        
+        decoded = codec.decode(codec.encode(batch))
+        
+        assert len(decoded) == count
+        assert decoded.utc
+        np.testing.assert_array_equal(decoded.timestamps_us, batch.timestamps_us)
+        np.testing.assert_array_equal(decoded.values, batch.values)
+        np.testing.assert_array_equal(decoded.quality, batch.quality)
+        assert decoded.datetimes() == [r.utc for r in readings]
+    
+    @pytest.mark.parametrize("step, width", [
+        (timedelta(microseconds=100), 1),
+        (timedelta(milliseconds=10), 2),
+        (timedelta(seconds=1), 4),
+        (timedelta(hours=1), 8),
+    ])
+    def test_delta_width_fits_sampling_rate(self, codec, step, width):
+        """Test that timestamp deltas use the narrowest integer width."""
+        timestamps = [r.utc for r in _readings(100, step=step)]
+        batch = ColumnarBatch.from_rows(timestamps, [0.0] * 100, [1] * 100)
+        
+        payload = codec.encode(batch)
+        
+        assert len(payload) == 17 + 99 * width + 100 * 4 + 13
+        assert codec.decode(payload).datetimes() == timestamps
+    
+    def test_naive_timestamps(self, codec):
+        """Test that naive timestamps come back naive."""
+        timestamps = [datetime(2021, 6, 9, 12, 0, 0, 5), datetime(2021, 6, 9, 11, 59, 59)]
+        batch = ColumnarBatch.from_rows(timestamps, [1.0, 2.0], [1, 0])
+        
+        decoded = codec.decode(codec.encode(batch))
+        
+        assert not decoded.utc
+        assert decoded.datetimes() == timestamps
+    
+    def test_decode_rejects_bad_payload(self, codec):
+        """Test that malformed payloads are rejected."""
+        batch = ColumnarBatch.from_rows([r.utc for r in _readings(3)], [1, 2, 3], [1, 1, 1])
+        payload = codec.encode(batch)
+        
+        with pytest.raises(ValueError, match="Invalid magic bytes"):
+            codec.decode(b"XX" + payload[2:])
+        with pytest.raises(ValueError, match="length mismatch"):
+            codec.decode(payload[:-1])
+    
+    def test_mismatched_columns_rejected(self):
+        """Test that columns must have the same length."""
+        with pytest.raises(ValueError, match="Column lengths differ"):
+            ColumnarBatch(
+                np.zeros(2, dtype=np.int64), np.zeros(3, dtype=np.float32), np.ones(2, dtype=bool)
+            )
+
+
+class TestMedaBatchEnvelope:
+    """Test suite for columnar MEDA envelopes."""
+    
+    def test_batch_envelope_roundtrip(self):
+        """Test that a sol of readings travels in one envelope."""
+        converter = MedaToEnvelopeConverter()
+        readings = _readings(500)
+        
+        envelope = converter.to_batch_envelope(readings)
+        decoded = ProtobufCodec().decode(ProtobufCodec().encode(envelope))
+        batch = converter.decode_batch_envelope(decoded)
+        
+        assert is_columnar(decoded.schema_id)
+        assert decoded.schema_id & 0xFFFF == MedaSensorType.PRESSURE
+        assert decoded.topic == "mars/perseverance/meda/pressure"
+        np.testing.assert_array_equal(batch.values, np.float32([r.value for r in readings]))
+        assert batch.quality.tolist() == [bool(r.quality_flag) for r in readings]
+    
+    def test_batch_envelope_is_order_of_magnitude_smaller(self):
+        """Test the per-reading overhead against one envelope per reading."""
+        converter = MedaToEnvelopeConverter()
+        readings = _readings(1000)
+        codec = ProtobufCodec()
+        
+        rows = codec.encode_batch(converter.batch_convert(readings))
+        columns = codec.encode(converter.to_batch_envelope(readings))
+        
+        assert len(columns) * 10 < len(rows)
+    
+    def test_batch_envelope_requires_one_sensor_type(self):
+        """Test that mixed sensor types are rejected."""
+        readings = _readings(2)
+        readings[1].sensor_type = MedaSensorType.HUMIDITY
+        
+        with pytest.raises(ValueError, match="same sensor type"):
+            MedaToEnvelopeConverter().to_batch_envelope(readings)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,11 +3,12 @@ Tests for telemetry codec module.
 """
 
 import pytest
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from uuid import uuid4
+import struct
 
-from aria_sdk.domain.entities import Envelope, Priority, EnvelopeMetadata
-from aria_sdk.telemetry.codec import ProtobufCodec
+from aria_sdk.domain.entities import Envelope, Priority, EnvelopeMetadata, FragmentInfo, FecInfo
+from aria_sdk.telemetry.codec import ProtobufCodec, FrameDecoder, StringTableMiss
 
 
 class TestProtobufCodec:
@@ -136,6 +137,396 @@ class TestProtobufCodec:
         
         with pytest.raises(ValueError):
             codec.decode(truncated_data)
+    
+    def test_encode_batch_matches_single_encode(self, codec):
+        """Test that a batch is the concatenation of individually encoded frames."""
+        envelopes = [
+            Envelope.create(
+                topic="mars/perseverance/meda/pressure",
+                payload=bytes([i % 256]) * 4,
+                source_node="perseverance_rover",
+                sequence_number=i
+            )
+            for i in range(50)
+        ]
+        
+        batch = codec.encode_batch(envelopes)
+        
+        assert batch == b"".join(codec.encode(env) for env in envelopes)
+    
+    def test_decode_batch_roundtrip(self, codec, sample_envelope):
+        """Test that decode_batch splits and decodes every frame in order."""
+        envelopes = [sample_envelope] + [
+            Envelope.create(topic=f"test/{i}", payload=b"x" * i, sequence_number=i)
+            for i in range(10)
+        ]
+        
+        decoded = codec.decode_batch(codec.encode_batch(envelopes))
+        
+        assert len(decoded) == len(envelopes)
+        for original, result in zip(envelopes, decoded):
+            assert result.id == original.id
+            assert result.topic == original.topic
+            assert result.payload == original.payload
+            assert result.metadata.sequence_number == original.metadata.sequence_number
+    
+    def test_decode_batch_empty(self, codec):
+        """Test that an empty buffer decodes to an empty batch."""
+        assert codec.encode_batch([]) == b""
+        assert codec.decode_batch(b"") == []
+    
+    def test_decode_batch_truncated(self, codec, sample_envelope):
+        """Test that a batch ending mid-frame is rejected."""
+        batch = codec.encode_batch([sample_envelope, sample_envelope])
+        
+        with pytest.raises(ValueError, match="frame 1"):
+            codec.decode_batch(batch[:-3])
+    
+    def test_encodes_version_2_by_default(self, codec, sample_envelope):
+        """Test that new frames use the binary-timestamp wire format."""
+        encoded = codec.encode(sample_envelope)
+        
+        assert encoded[2] == 2
+        assert len(encoded) < len(ProtobufCodec(version=1).encode(sample_envelope))
+    
+    def test_decode_version_1_frames(self, codec, sample_envelope):
+        """Test that the decoder still accepts version 1 frames."""
+        legacy = ProtobufCodec(version=1).encode(sample_envelope)
+        
+        decoded = codec.decode(legacy)
+        
+        assert legacy[2] == 1
+        assert decoded.id == sample_envelope.id
+        assert decoded.timestamp == sample_envelope.timestamp
+        assert decoded.payload == sample_envelope.payload
+    
+    def test_naive_timestamp_roundtrip(self, codec):
+        """Test that naive timestamps come back naive and unchanged."""
+        envelope = Envelope.create(topic="test/naive", payload=b"data")
+        envelope.timestamp = datetime(2021, 6, 9, 12, 30, 45, 123456)
+        
+        decoded = codec.decode(codec.encode(envelope))
+        
+        assert decoded.timestamp == envelope.timestamp
+        assert decoded.timestamp.tzinfo is None
+    
+    def test_aware_timestamp_decodes_as_utc(self, codec):
+        """Test that aware timestamps are normalised to UTC."""
+        envelope = Envelope.create(topic="test/aware", payload=b"data")
+        envelope.timestamp = datetime(1965, 7, 15, 1, 0, 0, 1, tzinfo=timezone(timedelta(hours=-7)))
+        
+        decoded = codec.decode(codec.encode(envelope))
+        
+        assert decoded.timestamp == envelope.timestamp
+        assert decoded.timestamp.tzinfo == timezone.utc
+    
+    @pytest.mark.parametrize("timestamp", [datetime.min, datetime.max, datetime(2500, 1, 1)])
+    def test_out_of_range_timestamp(self, codec, timestamp):
+        """Test that timestamps outside the int64 ns range fail clearly (v1 still encodes them)."""
+        envelope = Envelope.create(topic="test/range", payload=b"data")
+        envelope.timestamp = timestamp
+        
+        with pytest.raises(ValueError, match="outside the version 2 range"):
+            codec.encode(envelope)
+        
+        v1 = ProtobufCodec(version=1)
+        assert v1.decode(v1.encode(envelope)).timestamp == timestamp
+    
+    @pytest.mark.parametrize("wall_time", [
+        datetime(2021, 6, 9, 12, 30, 45, 999999),    # fast path
+        datetime(2150, 6, 9, 12, 30, 45, 999999),    # past 2106: slow path
+        datetime(1950, 6, 9, 12, 30, 45, 999999),    # negative: slow path
+    ])
+    def test_sub_microsecond_nanoseconds_floor(self, codec, wall_time):
+        """Test that sub-microsecond nanoseconds are floored on every decode path."""
+        envelope = Envelope.create(topic="test/ns", payload=b"data")
+        envelope.timestamp = wall_time
+        frame = bytearray(codec.encode(envelope))
+        
+        # Timestamp follows the 7-byte frame header and the 16-byte UUID
+        timestamp_ns, flags = struct.unpack_from('!qB', frame, 23)
+        struct.pack_into('!qB', frame, 23, timestamp_ns + 999, flags)
+        
+        assert codec.decode(bytes(frame)).timestamp == wall_time
+        assert codec.decode_view(bytes(frame)).timestamp == wall_time
+    
+    def test_unsupported_encode_version(self):
+        """Test that unknown wire-format versions are rejected up front."""
+        with pytest.raises(ValueError, match="Unsupported version"):
+            ProtobufCodec(version=3)
+    
+    @pytest.mark.parametrize("version", [1, 2])
+    def test_decode_view_fields(self, version, sample_envelope):
+        """Test that a view exposes the same fields as a full decode."""
+        codec = ProtobufCodec(version=version)
+        encoded = codec.encode(sample_envelope)
+        
+        view = codec.decode_view(encoded)
+        
+        assert view.topic == sample_envelope.topic
+        assert view.priority == sample_envelope.priority
+        assert view.id == sample_envelope.id
+        assert view.timestamp == sample_envelope.timestamp
+        assert view.schema_id == sample_envelope.schema_id
+        assert view.payload_size == len(sample_envelope.payload)
+        assert view.metadata.source_node == "test_node"
+        assert view.metadata.sequence_number == 1
+        assert view.frame_size == len(encoded)
+        assert view.to_envelope() == codec.decode(encoded)
+    
+    def test_decode_view_payload_is_zero_copy(self, codec, sample_envelope):
+        """Test that the view payload references the received buffer."""
+        buf = bytearray(codec.encode(sample_envelope))
+        view = codec.decode_view(buf)
+        
+        payload = view.payload
+        assert isinstance(payload, memoryview)
+        assert payload == sample_envelope.payload
+        
+        payload[0] = ord("T")
+        assert bytes(buf).find(b"Test payload data") >= 0
+    
+    def test_decode_view_at_offset(self, codec, sample_envelope):
+        """Test viewing the second frame of a batch in place."""
+        first = codec.encode(sample_envelope)
+        batch = codec.encode_batch([sample_envelope, sample_envelope])
+        
+        view = codec.decode_view(batch, offset=len(first))
+        
+        assert view.topic == sample_envelope.topic
+        assert view.payload == sample_envelope.payload
+    
+    def test_decode_view_rejects_bad_header(self, codec):
+        """Test that invalid frames are rejected when the view is created."""
+        with pytest.raises(ValueError, match="Invalid magic bytes"):
+            codec.decode_view(b"\xFF\xFF\x02\x00\x00\x00\x00")
+        with pytest.raises(ValueError, match="Truncated frame"):
+            codec.decode_view(b"\xAA\xBB\x02\x00\x00\x00\x10")
+    
+    def _stream(self, count, topic="mars/perseverance/meda/pressure"):
+        """Envelopes sharing one topic and source node."""
+        return [
+            Envelope.create(
+                topic=topic, payload=bytes([i % 256]) * 4,
+                source_node="perseverance_rover", sequence_number=i
+            )
+            for i in range(count)
+        ]
+    
+    def test_interned_strings_roundtrip(self, sample_envelope):
+        """Test that interned frames decode to the original envelopes."""
+        sender = ProtobufCodec(intern_strings=True)
+        receiver = ProtobufCodec()
+        envelopes = [sample_envelope] + self._stream(20)
+        
+        decoded = receiver.decode_batch(sender.encode_batch(envelopes))
+        
+        assert decoded == envelopes
+    
+    def test_interned_strings_shrink_frames(self):
+        """Test that repeated strings are sent as 2-byte references."""
+        envelopes = self._stream(100)
+        
+        plain = ProtobufCodec().encode_batch(envelopes)
+        interned = ProtobufCodec(intern_strings=True).encode_batch(envelopes)
+        
+        topic_len = len("mars/perseverance/meda/pressure")
+        source_len = len("perseverance_rover")
+        # Every frame after the first saves both strings minus the ID slots
+        assert len(plain) - len(interned) == 99 * (topic_len + source_len) - 4
+    
+    def test_interned_decode_view(self):
+        """Test that views resolve interned strings in frame order."""
+        sender = ProtobufCodec(intern_strings=True)
+        receiver = ProtobufCodec()
+        envelopes = self._stream(3)
+        
+        for envelope in envelopes:
+            view = receiver.decode_view(sender.encode(envelope))
+            assert view.topic == envelope.topic
+            assert view.metadata.source_node == "perseverance_rover"
+            assert view.payload == envelope.payload
+    
+    def test_interned_miss_recovers_on_refresh(self):
+        """Test that a receiver that missed a definition resyncs on refresh."""
+        sender = ProtobufCodec(intern_strings=True, refresh_interval=4)
+        receiver = ProtobufCodec()
+        frames = [sender.encode(envelope) for envelope in self._stream(6)]
+        
+        # frames[0] (the definition) is lost
+        for frame in frames[1:4]:
+            with pytest.raises(StringTableMiss):
+                receiver.decode(frame)
+        
+        assert receiver.decode(frames[4]).topic == "mars/perseverance/meda/pressure"
+        assert receiver.decode(frames[5]).metadata.source_node == "perseverance_rover"
+    
+    def test_interned_miss_recovers_on_reset(self):
+        """Test that resetting the sender table starts a new epoch."""
+        sender = ProtobufCodec(intern_strings=True, refresh_interval=None)
+        receiver = ProtobufCodec()
+        envelopes = self._stream(3)
+        sender.encode(envelopes[0])
+        
+        with pytest.raises(StringTableMiss) as excinfo:
+            receiver.decode(sender.encode(envelopes[1]))
+        assert excinfo.value.string_id == 0
+        
+        sender.reset_string_table()
+        assert receiver.decode(sender.encode(envelopes[2])) == envelopes[2]
+    
+    def test_interned_epoch_change_drops_stale_table(self):
+        """Test that a new epoch never resolves IDs from the old table."""
+        sender = ProtobufCodec(intern_strings=True)
+        receiver = ProtobufCodec()
+        receiver.decode(sender.encode(self._stream(1, topic="old/topic")[0]))
+        
+        sender.reset_string_table()
+        new = self._stream(2, topic="new/topic")
+        sender.encode(new[0])     # definition of ID 0 in the new epoch is lost
+        
+        with pytest.raises(StringTableMiss):
+            receiver.decode(sender.encode(new[1]))
+    
+    def test_interning_requires_version_2(self):
+        """Test that version 1 has no room for the string table flag."""
+        with pytest.raises(ValueError, match="requires version 2"):
+            ProtobufCodec(version=1, intern_strings=True)
+    
+    def test_delta_flag_roundtrip(self, codec, sample_envelope):
+        """Test that is_delta survives both decode paths and stays off by default."""
+        assert not codec.decode(codec.encode(sample_envelope)).metadata.is_delta
+        
+        sample_envelope.metadata.is_delta = True
+        encoded = codec.encode(sample_envelope)
+        
+        assert codec.decode(encoded) == sample_envelope
+        assert codec.decode_view(encoded).metadata.is_delta
+    
+    @pytest.mark.parametrize("fragment,fec", [(True, False), (False, True), (True, True)])
+    def test_fragment_and_fec_sections(self, codec, sample_envelope, fragment, fec):
+        """Test that fragment and FEC metadata survive both decode paths."""
+        if fragment:
+            sample_envelope.metadata.fragment_info = FragmentInfo(
+                fragment_id=1, total_fragments=3, offset=1300, length=17, message_id=uuid4()
+            )
+        if fec:
+            sample_envelope.metadata.fec_info = FecInfo(k=4, m=2, block_id=9, index=5)
+        encoded = codec.encode(sample_envelope)
+        
+        assert codec.decode(encoded) == sample_envelope
+        assert codec.decode_view(encoded).metadata == sample_envelope.metadata
+    
+    def test_delta_flag_requires_version_2(self, sample_envelope):
+        """Test that version 1 refuses delta payloads it cannot flag."""
+        sample_envelope.metadata.is_delta = True
+        
+        with pytest.raises(ValueError, match="require version 2"):
+            ProtobufCodec(version=1).encode(sample_envelope)
+    
+    @pytest.mark.parametrize("version", [1, 2])
+    def test_encode_parts_surround_payload(self, version, sample_envelope):
+        """Test that head + payload + tail is the encoded frame."""
+        codec = ProtobufCodec(version=version)
+        
+        head, tail = codec.encode_parts(sample_envelope)
+        
+        assert head + sample_envelope.payload + tail == codec.encode(sample_envelope)
+
+
+class TestFrameDecoder:
+    """Test suite for FrameDecoder."""
+    
+    @pytest.fixture
+    def envelopes(self):
+        """Create a short stream of envelopes."""
+        return [
+            Envelope.create(
+                topic=f"test/stream/{i % 3}", payload=bytes([i]) * (i * 7), sequence_number=i
+            )
+            for i in range(20)
+        ]
+    
+    def test_whole_stream(self, envelopes):
+        """Test decoding a buffer holding many frames."""
+        decoder = FrameDecoder()
+        
+        decoded = list(decoder.feed(ProtobufCodec().encode_batch(envelopes)))
+        
+        assert decoded == envelopes
+        assert decoder.frames_decoded == len(envelopes)
+        assert decoder.pending == 0
+    
+    @pytest.mark.parametrize("chunk_size", [1, 2, 7, 64])
+    def test_frames_split_across_chunks(self, envelopes, chunk_size):
+        """Test that partial frames are buffered until complete."""
+        stream = ProtobufCodec().encode_batch(envelopes)
+        decoder = FrameDecoder()
+        
+        decoded = []
+        for i in range(0, len(stream), chunk_size):
+            decoded.extend(decoder.feed(stream[i:i+chunk_size]))
+        
+        assert decoded == envelopes
+        assert decoder.bytes_skipped == 0
+    
+    def test_resync_after_garbage(self, envelopes):
+        """Test that bytes between frames are skipped."""
+        codec = ProtobufCodec()
+        stream = (
+            b"\x00\xAA\x01junk" + codec.encode(envelopes[0])
+            + b"\xAA\xBBnoise" + codec.encode(envelopes[1])
+        )
+        decoder = FrameDecoder()
+        
+        decoded = list(decoder.feed(stream))
+        
+        assert decoded == envelopes[:2]
+        assert decoder.bytes_skipped == 7 + 7
+    
+    def test_resync_after_corrupted_frame(self, envelopes):
+        """Test that a damaged frame costs only itself."""
+        codec = ProtobufCodec()
+        frames = [codec.encode(env) for env in envelopes[:3]]
+        damaged = bytearray(frames[1])
+        damaged[37] ^= 0xFF         # topic length prefix
+        decoder = FrameDecoder()
+        
+        decoded = list(decoder.feed(frames[0] + bytes(damaged) + frames[2]))
+        
+        assert decoded == [envelopes[0], envelopes[2]]
+        assert decoder.errors >= 1
+    
+    def test_truncated_tail_stays_pending(self, envelopes):
+        """Test that an incomplete last frame is held back, not dropped."""
+        stream = ProtobufCodec().encode_batch(envelopes[:2])
+        decoder = FrameDecoder()
+        
+        assert list(decoder.feed(stream[:-5])) == envelopes[:1]
+        assert decoder.pending > 0
+        assert list(decoder.feed(stream[-5:])) == envelopes[1:2]
+    
+    def test_frame_ending_in_magic_byte(self, envelopes):
+        """Test that a decoded frame's trailing 0xAA is not kept as a pending magic byte."""
+        envelopes[0].metadata.fec_info = FecInfo(k=4, m=2, block_id=9, index=0xAA)
+        frame = ProtobufCodec().encode(envelopes[0])
+        decoder = FrameDecoder()
+        
+        assert frame[-1] == 0xAA
+        assert [e.id for e in decoder.feed(frame)] == [envelopes[0].id]
+        assert decoder.pending == 0
+        assert decoder.bytes_skipped == 0
+    
+    def test_shares_codec_string_table(self, envelopes):
+        """Test that interned strings resolve across fed chunks."""
+        sender = ProtobufCodec(intern_strings=True)
+        decoder = FrameDecoder(ProtobufCodec())
+        
+        decoded = []
+        for env in envelopes:
+            decoded.extend(decoder.feed(sender.encode(env)))
+        
+        assert decoded == envelopes
 
 
 if __name__ == "__main__":
@@ -0,0 +1,396 @@
+"""
+Tests for telemetry compression module.
+"""
+
+import json
+import os
+import tracemalloc
+
+import pytest
+
+from aria_sdk.telemetry.compression import (
+    Lz4Compressor, ZstdCompressor, StreamCompressor, StreamDecompressor, StreamDesync,
+    ParallelCompressor, AdaptiveCompressor, BufferPool
+)
+
+
+def _detections(count, seed=0):
+    """Small JSON messages shaped like the detection telemetry."""
+    classes = ["rock", "crater", "dust_devil", "rover_track"]
+    return [
+        json.dumps({
+            'class_id': i % 4,
+            'class_name': classes[i % 4],
+            'confidence': round(((i * 7919 + seed) % 5000) / 10000 + 0.5, 4),
+            'bbox': [float((i * p + seed) % 640) for p in (31, 37, 41, 43)],
+        }).encode('utf-8')
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(scope="module")
+def dictionary():
+    """Train a dictionary on a sample corpus."""
+    return ZstdCompressor.train_dictionary(_detections(1000), dict_size=4096)
+
+
+class TestZstdDictionary:
+    """Test suite for dictionary-trained Zstd compression."""
+    
+    def test_dictionary_improves_small_messages(self, dictionary):
+        """Test that a trained dictionary compresses small messages much better."""
+        messages = _detections(200, seed=1)
+        raw = sum(len(m) for m in messages)
+        
+        plain = sum(len(ZstdCompressor().compress(m)) for m in messages)
+        trained = sum(len(ZstdCompressor(dictionary=dictionary).compress(m)) for m in messages)
+        
+        assert plain > raw * 0.9
+        assert trained < raw / 1.5
+    
+    def test_roundtrip_with_registered_dictionary(self, dictionary):
+        """Test that the receiver picks the dictionary named in the frame."""
+        sender = ZstdCompressor(dictionary=dictionary)
+        receiver = ZstdCompressor()
+        receiver.add_dictionary(dictionary)
+        
+        for message in _detections(20, seed=2):
+            assert receiver.decompress(sender.compress(message)) == message
+    
+    def test_plain_frames_still_decompress(self, dictionary):
+        """Test that frames without a dictionary ID ignore registered dictionaries."""
+        receiver = ZstdCompressor(dictionary=dictionary)
+        
+        assert receiver.decompress(ZstdCompressor().compress(b"plain" * 10)) == b"plain" * 10
+    
+    def test_unknown_dictionary_rejected(self, dictionary):
+        """Test that a frame needing a missing dictionary fails clearly."""
+        compressed = ZstdCompressor(dictionary=dictionary).compress(b"detection")
+        
+        with pytest.raises(RuntimeError, match="Unknown dictionary ID"):
+            ZstdCompressor().decompress(compressed)
+    
+    def test_dictionary_loaded_from_disk(self, dictionary, tmp_path):
+        """Test saving and loading dictionaries by ID."""
+        path = ZstdCompressor.save_dictionary(dictionary, tmp_path)
+        compressed = ZstdCompressor(dictionary=dictionary).compress(b'{"class_id": 1}')
+        
+        assert path.name == f"{dictionary.dict_id()}.zdict"
+        
+        eager = ZstdCompressor()
+        assert eager.load_dictionaries(tmp_path) == 1
+        assert eager.decompress(compressed) == b'{"class_id": 1}'
+        
+        lazy = ZstdCompressor(dictionary_dir=tmp_path)
+        assert lazy.decompress(compressed) == b'{"class_id": 1}'
+    
+    def test_explicit_dictionary_id(self):
+        """Test that a caller-chosen ID is written to each frame."""
+        dictionary = ZstdCompressor.train_dictionary(
+            _detections(1000), dict_size=4096, dict_id=4242
+        )
+        
+        assert dictionary.dict_id() == 4242
+
+
+@pytest.mark.parametrize("algo", ["lz4", "zstd"])
+class TestStreamCompression:
+    """Test suite for StreamCompressor / StreamDecompressor."""
+    
+    def test_roundtrip(self, algo):
+        """Test that every chunk decodes back to its message."""
+        tx, rx = StreamCompressor(algo), StreamDecompressor()
+        messages = _detections(100) + [b"", b"x" * 100_000]
+        
+        for message in messages:
+            assert rx.decompress(tx.compress(message)) == message
+    
+    def test_window_beats_independent_compression(self, algo):
+        """Test that similar consecutive messages compress against each other."""
+        messages = _detections(200)
+        independent = Lz4Compressor() if algo == "lz4" else ZstdCompressor()
+        tx = StreamCompressor(algo)
+        
+        streamed = sum(len(tx.compress(m)) for m in messages)
+        separate = sum(len(independent.compress(m)) for m in messages)
+        
+        assert streamed * 2 < separate
+    
+    def test_loss_desyncs_until_key_chunk(self, algo):
+        """Test that a gap is detected and a reset recovers the stream."""
+        tx, rx = StreamCompressor(algo), StreamDecompressor()
+        messages = _detections(6)
+        chunks = [tx.compress(m) for m in messages[:4]]
+        
+        rx.decompress(chunks[0])
+        with pytest.raises(StreamDesync) as excinfo:
+            rx.decompress(chunks[2])        # chunks[1] lost
+        assert (excinfo.value.expected, excinfo.value.received) == (1, 2)
+        with pytest.raises(StreamDesync):
+            rx.decompress(chunks[3])        # still waiting for a key chunk
+        assert not rx.synced
+        
+        tx.reset()
+        assert rx.decompress(tx.compress(messages[4])) == messages[4]
+        assert rx.decompress(tx.compress(messages[5])) == messages[5]
+    
+    def test_key_interval(self, algo):
+        """Test that a late joiner syncs at the next scheduled key chunk."""
+        tx = StreamCompressor(algo, key_interval=4)
+        chunks = [tx.compress(m) for m in _detections(10)]
+        
+        keys = [i for i, chunk in enumerate(chunks) if chunk[0] & 0x80]
+        assert keys == [0, 4, 8]
+        
+        rx = StreamDecompressor()
+        with pytest.raises(StreamDesync):
+            rx.decompress(chunks[3])
+        assert rx.decompress(chunks[4]) == _detections(10)[4]
+    
+    def test_rejects_other_algorithm(self, algo):
+        """Test that a non-key chunk from a different stream type is rejected."""
+        other = "zstd" if algo == "lz4" else "lz4"
+        rx = StreamDecompressor()
+        rx.decompress(StreamCompressor(algo).compress(b"first"))
+        foreign = StreamCompressor(other)
+        foreign.compress(b"key")
+        
+        with pytest.raises(StreamDesync):
+            rx.decompress(foreign.compress(b"second"))
+
+
+@pytest.mark.parametrize("algo", ["lz4", "zstd"])
+class TestParallelCompressor:
+    """Test suite for ParallelCompressor."""
+    
+    @pytest.fixture
+    def data(self):
+        """Compressible data spanning several blocks plus a partial one."""
+        return b"".join(_detections(400)) * 3
+    
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_roundtrip(self, algo, data, workers):
+        """Test that the container decodes to the input, with or without the pool."""
+        compressor = ParallelCompressor(algo, block_size=8192, workers=workers)
+        
+        compressed = compressor.compress(data)
+        
+        assert compressor.block_count(compressed) == -(-len(data) // 8192)
+        assert len(compressed) < len(data) / 2
+        assert compressor.decompress(compressed) == data
+        compressor.close()
+    
+    def test_random_access(self, algo, data):
+        """Test that a single block decodes without the rest."""
+        compressor = ParallelCompressor(algo, block_size=8192)
+        compressed = compressor.compress(data)
+        last = compressor.block_count(compressed) - 1
+        
+        assert compressor.decompress_block(compressed, 2) == data[2 * 8192:3 * 8192]
+        assert compressor.decompress_block(compressed, last) == data[last * 8192:]
+        with pytest.raises(IndexError):
+            compressor.decompress_block(compressed, last + 1)
+    
+    def test_incompressible_blocks_stored(self, algo):
+        """Test that random data is stored, not expanded."""
+        compressor = ParallelCompressor(algo, block_size=4096)
+        noise = os.urandom(20_000)
+        
+        compressed = compressor.compress(noise)
+        
+        assert len(compressed) == 20 + 4 * 5 + len(noise)
+        assert compressor.decompress(compressed) == noise
+    
+    def test_empty_input(self, algo):
+        """Test that empty input round-trips."""
+        compressor = ParallelCompressor(algo)
+        
+        assert compressor.decompress(compressor.compress(b"")) == b""
+    
+    def test_malformed_container_raises_runtime_error(self, algo):
+        """Test that random access reports a bad container as RuntimeError."""
+        compressor = ParallelCompressor(algo)
+        
+        with pytest.raises(RuntimeError, match="Truncated header"):
+            compressor.decompress_block(b"PC", 0)
+    
+    def test_context_manager_closes_pool(self, algo, data):
+        """Test that leaving the with-block shuts the worker threads down."""
+        with ParallelCompressor(algo, block_size=8192, workers=4) as compressor:
+            assert compressor.decompress(compressor.compress(data)) == data
+            assert compressor._executor is not None
+        
+        assert compressor._executor is None
+    
+    def test_rejects_other_algorithm(self, algo):
+        """Test that containers are checked for their algorithm."""
+        other = "zstd" if algo == "lz4" else "lz4"
+        compressed = ParallelCompressor(other).compress(b"data" * 100)
+        
+        with pytest.raises(RuntimeError, match="expected"):
+            ParallelCompressor(algo).decompress(compressed)
+
+
+class TestAdaptiveCompressor:
+    """Test suite for AdaptiveCompressor."""
+    
+    def test_roundtrip_mixed_topics(self):
+        """Test that frames decode regardless of the codec chosen."""
+        compressor = AdaptiveCompressor(sample_interval=8)
+        receiver = AdaptiveCompressor()
+        
+        for i, message in enumerate(_detections(50)):
+            for topic, data in (("det", message * 5), ("noise", os.urandom(500)), ("empty", b"")):
+                assert receiver.decompress(compressor.compress(data, topic)) == data
+    
+    def test_incompressible_topic_skips_compression(self):
+        """Test that random payloads are sent as is behind a 1-byte tag."""
+        compressor = AdaptiveCompressor()
+        noise = os.urandom(4096)
+        
+        frame = compressor.compress(noise, "camera/noise")
+        
+        assert compressor.choice("camera/noise") == ("none", 0)
+        assert AdaptiveCompressor.frame_algorithm(frame) == ("none", 0)
+        assert frame[1:] == noise
+    
+    def test_compressible_topic_compressed(self):
+        """Test that a redundant payload picks a codec and shrinks."""
+        compressor = AdaptiveCompressor()
+        data = b"".join(_detections(50))
+        
+        frame = compressor.compress(data, "perception/detection")
+        algo, level = compressor.choice("perception/detection")
+        
+        assert algo in ("lz4", "zstd")
+        assert AdaptiveCompressor.frame_algorithm(frame) == (algo, level)
+        assert len(frame) < len(data) / 2
+    
+    def test_cpu_budget_limits_candidates(self):
+        """Test that candidates over the CPU budget are never chosen."""
+        compressor = AdaptiveCompressor(cpu_budget=0.0)
+        
+        compressor.compress(b"".join(_detections(50)), "t")
+        
+        assert compressor.choice("t") == ("none", 0)
+    
+    def test_choice_sticks_between_samples(self):
+        """Test that unsampled messages reuse the topic's choice."""
+        compressor = AdaptiveCompressor(candidates=[("lz4", 0)], sample_interval=100)
+        compressor.compress(b"".join(_detections(20)), "t")
+        
+        frame = compressor.compress(b"abc" * 100, "t")
+        
+        assert AdaptiveCompressor.frame_algorithm(frame) == ("lz4", 0)
+    
+    def test_topic_state_is_lru_capped(self):
+        """Test that the least recently used topic is forgotten past max_topics."""
+        compressor = AdaptiveCompressor(candidates=[("lz4", 0)], max_topics=2)
+        data = b"".join(_detections(20))
+        
+        for topic in ("a", "b", "a", "c"):
+            compressor.compress(data, topic)
+        
+        assert compressor.choice("a") == ("lz4", 0)
+        assert compressor.choice("b") == ("none", 0)
+        assert compressor.choice("c") == ("lz4", 0)
+    
+    def test_rejects_invalid_candidate(self):
+        """Test that unknown codecs are rejected up front."""
+        with pytest.raises(ValueError, match="Invalid candidate"):
+            AdaptiveCompressor(candidates=[("brotli", 5)])
+
+
+class TestCompressInto:
+    """Tests for compress_into/decompress_into and BufferPool."""
+    
+    @pytest.mark.parametrize("compressor", [Lz4Compressor(), ZstdCompressor()], ids=["lz4", "zstd"])
+    @pytest.mark.parametrize("size", [0, 100, 200 * 1024])
+    def test_roundtrip_through_buffers(self, compressor, size):
+        """Test small and large payloads through caller-supplied buffers."""
+        data = os.urandom(size // 2) + bytes(size - size // 2)
+        packed = bytearray(compressor.compress_bound(size))
+        n = compressor.compress_into(data, packed)
+        
+        assert compressor.decompress(bytes(packed[:n])) == data
+        
+        unpacked = bytearray(size + 16)
+        m = compressor.decompress_into(bytes(packed[:n]), memoryview(unpacked))
+        
+        assert m == size
+        assert unpacked[:m] == data
+    
+    @pytest.mark.parametrize("compressor", [Lz4Compressor(), ZstdCompressor()], ids=["lz4", "zstd"])
+    def test_bound_covers_incompressible_data(self, compressor):
+        """Test that compress_bound is never exceeded."""
+        for size in (1, 1000, 3 * 1024 * 1024):
+            assert len(compressor.compress(os.urandom(size))) <= compressor.compress_bound(size)
+    
+    @pytest.mark.parametrize("size", [1000, 200 * 1024])
+    def test_output_too_small(self, size):
+        """Test that a short buffer raises instead of truncating."""
+        compressor = ZstdCompressor()
+        frame = compressor.compress(bytes(size))
+        
+        with pytest.raises(RuntimeError, match="too small"):
+            compressor.decompress_into(frame, bytearray(size - 1))
+    
+    def test_dictionary_frames(self, dictionary):
+        """Test that decompress_into honours the frame's dictionary ID."""
+        compressor = ZstdCompressor(dictionary=dictionary)
+        message = _detections(1, seed=5)[0]
+        out = bytearray(compressor.compress_bound(len(message)))
+        n = compressor.compress_into(message, out)
+        
+        raw = bytearray(len(message))
+        decompressor = ZstdCompressor(dictionary=dictionary)
+        assert decompressor.decompress_into(bytes(out[:n]), raw) == len(message)
+        assert bytes(raw) == message
+    
+    def test_zstd_into_does_not_allocate_output(self):
+        """Test that small zstd messages go straight into the caller's buffers."""
+        compressor = ZstdCompressor()
+        data = os.urandom(16 * 1024)
+        packed = bytearray(compressor.compress_bound(len(data)))
+        unpacked = bytearray(len(data))
+        frame = bytes(packed[:compressor.compress_into(data, packed)])
+        compressor.decompress_into(frame, unpacked)
+        
+        tracemalloc.start()
+        try:
+            compressor.compress_into(data, packed)
+            compressor.decompress_into(frame, unpacked)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        
+        assert peak < len(data) // 4
+        assert unpacked == data
+    
+    def test_pool_reuses_buffers(self):
+        """Test that released buffers are handed out again."""
+        pool = BufferPool(buffer_size=1024, max_buffers=2)
+        
+        with pool.buffer() as first:
+            pass
+        with pool.buffer() as second:
+            pass
+        
+        assert second is first
+        assert (pool.hits, pool.misses) == (1, 1)
+    
+    def test_pool_is_bounded(self):
+        """Test that oversize and surplus buffers are not retained."""
+        pool = BufferPool(buffer_size=1024, max_buffers=2)
+        buffers = [pool.acquire() for _ in range(4)]
+        big = pool.acquire(4096)
+        
+        for buf in buffers + [big]:
+            pool.release(buf)
+        
+        assert len(big) == 4096
+        assert len(pool) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,434 @@
+"""
+Tests for telemetry delta codecs.
+"""
+
+import numpy as np
+import pytest
+
+from aria_sdk.domain.entities import Envelope, Priority
+from aria_sdk.telemetry.codec import ProtobufCodec
+from aria_sdk.telemetry.delta import (
+    SparseDeltaCodec, NumericDeltaCodec, SimpleDeltaCodec, AdaptiveDeltaCodec, ImageDeltaCodec,
+    DeltaStreamEncoder, DeltaStreamDecoder, DeltaCodecBank, TILE_COPY
+)
+
+
+def _frame(x, y, size=32):
+    """640x480 RGB frame with a bright square at (x, y) on a fixed noisy background."""
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    frame[y:y + size, x:x + size] = 255
+    return frame.tobytes()
+
+
+class TestSparseDeltaCodec:
+    """Tests for SparseDeltaCodec."""
+    
+    def test_moving_region_is_small(self):
+        """Test that a small moving region costs a few KB, not the full frame."""
+        encoder, decoder = SparseDeltaCodec(), SparseDeltaCodec()
+        
+        for i in range(5):
+            frame = _frame(200 + 5 * i, 100 + 5 * i)
+            encoded, is_delta = encoder.encode(frame)
+            
+            assert is_delta == (i > 0)
+            assert decoder.decode(encoded, is_delta) == frame
+        
+        assert len(encoded) < 4096
+    
+    def test_identical_frame(self):
+        """Test that an unchanged frame encodes to just the header."""
+        codec = SparseDeltaCodec()
+        codec.encode(b"abcdef" * 100)
+        
+        encoded, is_delta = codec.encode(b"abcdef" * 100)
+        
+        assert is_delta
+        assert len(encoded) == 8
+    
+    def test_nearby_runs_are_merged(self):
+        """Test that runs separated by at most max_gap bytes become one run."""
+        codec = SparseDeltaCodec(max_gap=4)
+        base = bytes(1000)
+        codec.encode(base)
+        
+        changed = bytearray(base)
+        changed[100] = changed[105] = changed[200] = 1
+        encoded, _ = codec.encode(bytes(changed))
+        
+        # header + 2 runs (starts, lengths) + 6 + 1 changed bytes
+        assert len(encoded) == 8 + 2 * 8 + 7
+        
+        decoder = SparseDeltaCodec()
+        decoder.decode(base, False)
+        assert decoder.decode(encoded, True) == bytes(changed)
+    
+    def test_falls_back_to_full_payload(self):
+        """Test that size changes and dense changes send the full payload."""
+        codec = SparseDeltaCodec()
+        codec.encode(bytes(100))
+        
+        assert codec.encode(bytes(50)) == (bytes(50), False)
+        assert codec.encode(bytes(range(50))) == (bytes(range(50)), False)
+    
+    def test_decode_errors(self):
+        """Test that missing state and malformed deltas raise RuntimeError."""
+        codec = SparseDeltaCodec()
+        
+        with pytest.raises(RuntimeError, match="without previous"):
+            codec.decode(b"\x00" * 8, True)
+        
+        codec.decode(bytes(100), False)
+        with pytest.raises(RuntimeError, match="size mismatch"):
+            codec.decode(b"\x10\x00\x00\x00\x00\x00\x00\x00", True)
+        with pytest.raises(RuntimeError, match="out of range"):
+            codec.decode(
+                b"\x64\x00\x00\x00\x01\x00\x00\x00" b"\x63\x00\x00\x00" b"\x02\x00\x00\x00" b"xy",
+                True
+            )
+
+
+class TestNumericDeltaCodec:
+    """Tests for NumericDeltaCodec."""
+    
+    @staticmethod
+    def _roundtrip(encoder, decoder, frames):
+        """Yield (frame, decoded, encoded bytes) for each frame."""
+        for frame in frames:
+            data, is_delta = encoder.encode(frame.tobytes())
+            decoded = np.frombuffer(decoder.decode(data, is_delta), dtype=frame.dtype)
+            yield frame, decoded.reshape(frame.shape), data
+    
+    def test_float_series_within_tolerance(self):
+        """Test that quantized floats stay within tolerance across frames."""
+        rng = np.random.default_rng(1)
+        series = (750 + 5 * np.sin(np.arange(600) / 60) + rng.normal(0, 0.02, 600)).astype('<f4')
+        frames = np.split(series, 10)
+        
+        results = list(self._roundtrip(
+            NumericDeltaCodec('<f4', tolerance=0.01),
+            NumericDeltaCodec('<f4', tolerance=0.01),
+            frames
+        ))
+        
+        for frame, decoded, _ in results:
+            np.testing.assert_allclose(decoded, frame, atol=0.0101, rtol=0)
+        # ~1 byte per sample, vs 4 raw
+        assert len(results[-1][2]) < 1.5 * len(frames[-1])
+    
+    @pytest.mark.parametrize("order", [1, 2])
+    def test_int_channels_lossless(self, order):
+        """Test lossless multi-channel integer samples with both difference orders."""
+        rng = np.random.default_rng(2)
+        imu = np.cumsum(rng.integers(-20, 21, (300, 6)), axis=0).astype('<i2')
+        codec = dict(dtype='<i2', order=order, channels=6)
+        
+        for frame, decoded, _ in self._roundtrip(
+            NumericDeltaCodec(**codec), NumericDeltaCodec(**codec), np.split(imu, 3)
+        ):
+            np.testing.assert_array_equal(decoded, frame)
+    
+    def test_beats_xor_on_float_sensor(self):
+        """Test that slowly varying floats encode far smaller than the XOR delta."""
+        series = np.linspace(-60, -40, 200, dtype='<f4')
+        numeric, xor = NumericDeltaCodec('<f4', tolerance=0.01), SimpleDeltaCodec()
+        
+        for frame in np.split(series, 2):
+            encoded, _ = numeric.encode(frame.tobytes())
+            xored, _ = xor.encode(frame.tobytes())
+        
+        assert len(encoded) < len(xored) / 3
+    
+    def test_non_finite_restarts_stream(self):
+        """Test that NaN frames are sent raw and the next frame is a key frame."""
+        encoder = NumericDeltaCodec('<f4', tolerance=0.1)
+        decoder = NumericDeltaCodec('<f4', tolerance=0.1)
+        encoder.encode(np.ones(4, '<f4').tobytes())
+        
+        data, is_delta = encoder.encode(np.array([1, np.nan], '<f4').tobytes())
+        assert not is_delta
+        assert np.isnan(np.frombuffer(decoder.decode(data, is_delta), '<f4')[1])
+        
+        data, is_delta = encoder.encode(np.array([2, 3], '<f4').tobytes())
+        assert not is_delta
+        np.testing.assert_allclose(
+            np.frombuffer(decoder.decode(data, is_delta), '<f4'), [2, 3], atol=0.1
+        )
+    
+    @pytest.mark.parametrize("dtype, tolerance, values", [
+        ('<f8', 1e-9, [1.0, 1e12, -1e12]),
+        ('<i8', None, [0, 2**62, -2**62]),
+        ('<u8', None, [0, 2**64 - 1, 1]),
+    ])
+    def test_out_of_range_values_sent_raw(self, dtype, tolerance, values):
+        """Test that values whose quantized form overflows int64 are sent raw, exactly."""
+        encoder = NumericDeltaCodec(dtype, tolerance, order=2)
+        decoder = NumericDeltaCodec(dtype, tolerance, order=2)
+        encoder.encode(np.zeros(3, dtype).tobytes())
+        raw = np.array(values, dtype).tobytes()
+        
+        data, is_delta = encoder.encode(raw)
+        
+        assert not is_delta
+        assert decoder.decode(data, is_delta) == raw
+    
+    def test_invalid_configuration(self):
+        """Test that lossy ints, lossless floats and bad orders are rejected."""
+        with pytest.raises(ValueError, match="tolerance"):
+            NumericDeltaCodec('<f4')
+        with pytest.raises(ValueError, match="lossless"):
+            NumericDeltaCodec('<i4', tolerance=1)
+        with pytest.raises(ValueError, match="order"):
+            NumericDeltaCodec('<i4', order=3)
+    
+    def test_delta_without_previous(self):
+        """Test that a delta frame without state raises RuntimeError."""
+        encoder = NumericDeltaCodec('<i4')
+        encoder.encode(np.arange(4, dtype='<i4').tobytes())
+        data, is_delta = encoder.encode(np.arange(4, dtype='<i4').tobytes())
+        
+        with pytest.raises(RuntimeError, match="without previous"):
+            NumericDeltaCodec('<i4').decode(data, is_delta)
+
+
+class TestImageDeltaCodec:
+    """Tests for ImageDeltaCodec."""
+    
+    @staticmethod
+    def _scene(height, width, channels=3):
+        """Large blocky texture to pan across."""
+        rng = np.random.default_rng(3)
+        blocks = rng.integers(0, 255, (height // 4 + 20, width // 4 + 20, channels), dtype=np.uint8)
+        return np.kron(blocks, np.ones((4, 4, 1), dtype=np.uint8))
+    
+    def test_panning_camera(self):
+        """Test that a panning view becomes tile copies, far below the XOR delta."""
+        scene = self._scene(480, 640)
+        encoder, decoder = ImageDeltaCodec(640, 480), ImageDeltaCodec(640, 480)
+        xor = AdaptiveDeltaCodec()
+        
+        for i in range(3):
+            frame = np.ascontiguousarray(scene[10 + i:490 + i, 20 + 3 * i:660 + 3 * i]).tobytes()
+            encoded, is_delta = encoder.encode(frame)
+            xored, _ = xor.encode(frame)
+            
+            assert decoder.decode(encoded, is_delta) == frame
+        
+        modes = np.frombuffer(encoded, dtype=np.uint8, count=40 * 30, offset=6)
+        assert (modes == TILE_COPY).mean() > 0.9
+        assert len(encoded) < len(xored) / 20     # Only the newly exposed edge is sent
+    
+    def test_local_motion_and_odd_size(self):
+        """Test lossless roundtrip of a mono frame that is not a whole number of tiles."""
+        encoder = ImageDeltaCodec(100, 70, channels=1)
+        decoder = ImageDeltaCodec(100, 70, channels=1)
+        rng = np.random.default_rng(4)
+        frame = rng.integers(0, 255, (70, 100, 1), dtype=np.uint8)
+        
+        for i in range(3):
+            frame = frame.copy()
+            frame[20:30, 10 + 5 * i:20 + 5 * i] = 255
+            data = frame.tobytes()
+            encoded, is_delta = encoder.encode(data)
+            
+            assert decoder.decode(encoded, is_delta) == data
+    
+    def test_unchanged_frame(self):
+        """Test that an identical frame costs one mode byte per tile."""
+        codec = ImageDeltaCodec(64, 32, channels=3)
+        frame = bytes(range(256)) * (64 * 32 * 3 // 256)
+        codec.encode(frame)
+        
+        encoded, is_delta = codec.encode(frame)
+        
+        assert is_delta
+        assert len(encoded) == 6 + 8
+    
+    def test_noisy_frame_falls_back_to_key_frame(self):
+        """Test that a frame the tiles cannot predict is sent in full, not expanded."""
+        encoder, decoder = ImageDeltaCodec(64, 48), ImageDeltaCodec(64, 48)
+        rng = np.random.default_rng(5)
+        frames = [rng.integers(0, 255, (48, 64, 3), dtype=np.uint8).tobytes() for _ in range(2)]
+        decoder.decode(*encoder.encode(frames[0]))
+        
+        encoded, is_delta = encoder.encode(frames[1])
+        
+        assert not is_delta
+        assert encoded == frames[1]
+        assert decoder.decode(encoded, is_delta) == frames[1]
+    
+    @pytest.mark.parametrize("kwargs", [
+        dict(width=70000, height=10),
+        dict(width=10, height=0),
+        dict(width=10, height=10, channels=256),
+    ])
+    def test_rejects_geometry_outside_header(self, kwargs):
+        """Test that geometry the u16/u8 header fields cannot hold fails up front."""
+        with pytest.raises(ValueError):
+            ImageDeltaCodec(**kwargs)
+    
+    def test_geometry_mismatch(self):
+        """Test that a delta for a different frame geometry is rejected."""
+        encoder = ImageDeltaCodec(32, 32, channels=1)
+        encoder.encode(bytes(32 * 32))
+        encoded, _ = encoder.encode(bytes(32 * 32))
+        
+        decoder = ImageDeltaCodec(32, 32, channels=1, tile=8)
+        decoder.decode(bytes(32 * 32), False)
+        with pytest.raises(RuntimeError, match="geometry mismatch"):
+            decoder.decode(encoded, True)
+
+
+class TestDeltaStream:
+    """Tests for key-frame scheduling and loss recovery."""
+    
+    @staticmethod
+    def _frames(count):
+        """Equal-size frames differing in their first 10 bytes."""
+        return [bytes([i]) * 10 + bytes(90) for i in range(count)]
+    
+    def test_lossless_stream(self):
+        """Test that every frame decodes and only the first is a key frame."""
+        encoder = DeltaStreamEncoder(SimpleDeltaCodec())
+        decoder = DeltaStreamDecoder(SimpleDeltaCodec())
+        
+        for frame in self._frames(10):
+            assert decoder.decode(encoder.encode(frame)) == frame
+        
+        assert (encoder.key_frames, encoder.delta_frames) == (1, 9)
+    
+    def test_key_interval(self):
+        """Test that a key frame is forced every key_interval frames."""
+        encoder = DeltaStreamEncoder(SparseDeltaCodec(), key_interval=4)
+        
+        keys = [encoder.encode(frame)[0] & 0x01 for frame in self._frames(9)]
+        
+        assert keys == [1, 0, 0, 0, 1, 0, 0, 0, 1]
+    
+    def test_loss_drops_until_key_frame(self):
+        """Test that deltas after a lost frame are dropped, then the stream resyncs."""
+        encoder = DeltaStreamEncoder(SimpleDeltaCodec(), key_interval=5)
+        decoder = DeltaStreamDecoder(SimpleDeltaCodec())
+        frames = self._frames(10)
+        encoded = [encoder.encode(frame) for frame in frames]
+        
+        decoded = [decoder.decode(chunk) for i, chunk in enumerate(encoded) if i != 2]
+        
+        assert decoded == frames[:2] + [None, None] + frames[5:]
+        assert decoder.frames_dropped == 2
+        assert decoder.synced
+    
+    def test_nack_forces_key_frame(self):
+        """Test that request_key_frame resyncs an unsynced decoder immediately."""
+        encoder = DeltaStreamEncoder(NumericDeltaCodec('<i4'))
+        decoder = DeltaStreamDecoder(NumericDeltaCodec('<i4'))
+        frames = [np.arange(i, i + 8, dtype='<i4').tobytes() for i in range(4)]
+        
+        decoder.decode(encoder.encode(frames[0]))
+        encoder.encode(frames[1])                    # lost
+        assert decoder.decode(encoder.encode(frames[2])) is None
+        assert not decoder.synced
+        
+        encoder.request_key_frame()
+        assert decoder.decode(encoder.encode(frames[3])) == frames[3]
+    
+    def test_truncated_header(self):
+        """Test that a truncated frame raises RuntimeError."""
+        with pytest.raises(RuntimeError, match="Truncated"):
+            DeltaStreamDecoder(SimpleDeltaCodec()).decode(b"\x01\x00")
+
+
+class TestDeltaCodecBank:
+    """Tests for DeltaCodecBank."""
+    
+    @staticmethod
+    def _envelope(source_node, topic, payload):
+        """Envelope on the given stream."""
+        return Envelope.create(
+            topic=topic, payload=payload, priority=Priority.P2,
+            source_node=source_node, sequence_number=0
+        )
+    
+    def test_interleaved_streams_stay_deltas(self):
+        """Test that interleaved topics each delta against their own previous payload."""
+        sender, receiver, codec = DeltaCodecBank(), DeltaCodecBank(), ProtobufCodec()
+        streams = [("rover", "camera/left"), ("rover", "camera/right"), ("lander", "camera/left")]
+        
+        for i in range(4):
+            for n, (source_node, topic) in enumerate(streams):
+                payload = bytes([n]) * 1000 + bytes([i]) * 8
+                envelope = sender.encode(self._envelope(source_node, topic, payload))
+                
+                assert envelope.metadata.is_delta == (i > 0)
+                
+                decoded = receiver.decode(codec.decode(codec.encode(envelope)))
+                assert decoded.payload == payload
+                assert not decoded.metadata.is_delta
+        
+        assert len(sender) == 3
+    
+    def test_lru_eviction_by_count_and_bytes(self):
+        """Test that the least recently used streams are evicted over either limit."""
+        bank = DeltaCodecBank(max_streams=2, max_bytes=2500)
+        
+        for topic in ("a", "b", "c"):
+            bank.encode(self._envelope("n", topic, bytes(1000)))
+        assert len(bank) == 2
+        
+        bank.encode(self._envelope("n", "b", bytes(1000)))
+        bank.encode(self._envelope("n", "d", bytes(2000)))
+        
+        assert len(bank) == 1
+        assert bank.state_bytes == 2000
+        assert bank.evictions == 3
+        # "b" was evicted, so it restarts with a full payload
+        assert not bank.encode(self._envelope("n", "b", bytes(1000))).metadata.is_delta
+    
+    def test_key_interval_and_request(self):
+        """Test that key frames are forced per stream by interval and on request."""
+        bank = DeltaCodecBank(key_interval=3)
+        flags = [
+            bank.encode(self._envelope("n", "t", bytes(100))).metadata.is_delta
+            for _ in range(5)
+        ]
+        
+        assert flags == [False, True, True, False, True]
+        
+        bank.request_key_frame("n", "t")
+        assert not bank.encode(self._envelope("n", "t", bytes(100))).metadata.is_delta
+    
+    def test_delta_without_reference(self):
+        """Test that a delta for an unknown stream raises RuntimeError."""
+        sender = DeltaCodecBank()
+        sender.encode(self._envelope("n", "t", bytes(100)))
+        delta = sender.encode(self._envelope("n", "t", bytes(100)))
+        
+        with pytest.raises(RuntimeError, match="reference missing"):
+            DeltaCodecBank().decode(delta)
+    
+    def test_lost_delta_raises_until_key_frame(self):
+        """Test that a gap in a stream raises instead of decoding wrong bytes, then resyncs."""
+        sender, receiver = DeltaCodecBank(), DeltaCodecBank()
+        envelopes = [
+            sender.encode(self._envelope("n", "t", bytes(200) + bytes([i]))) for i in range(4)
+        ]
+        
+        assert all(e.metadata.is_delta for e in envelopes[1:])
+        assert receiver.decode(envelopes[0]).payload == bytes(201)
+        # envelopes[1] is lost
+        with pytest.raises(RuntimeError, match="reference missing"):
+            receiver.decode(envelopes[2])
+        with pytest.raises(RuntimeError, match="reference missing"):
+            receiver.decode(envelopes[3])
+        assert not receiver.synced("n", "t")
+        
+        sender.request_key_frame("n", "t")
+        key = sender.encode(self._envelope("n", "t", bytes(200) + bytes([9])))
+        
+        assert not key.metadata.is_delta
+        assert receiver.decode(key).payload == bytes(200) + bytes([9])
+        assert receiver.synced("n", "t")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
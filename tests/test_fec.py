@@ -0,0 +1,362 @@
+"""
+Tests for telemetry FEC module.
+"""
+
+import itertools
+import math
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from aria_sdk.domain.entities import Envelope, Priority
+from aria_sdk.telemetry.codec import ProtobufCodec
+from aria_sdk.telemetry.fec import (
+    ReedSolomonFEC, AdaptiveFEC, FecBlockEncoder, FecBlockDecoder,
+    _GF_MUL, _gf_invert_matrix, _decode_matrix, _block_failure
+)
+from aria_sdk.telemetry.packetization import Packetizer, Defragmenter
+
+
+class TestGaloisField:
+    """Tests for the GF(256) tables."""
+    
+    def test_multiplication_matches_carryless_reference(self):
+        """Test the table against shift-and-add multiplication modulo 0x11D."""
+        def reference(a, b):
+            result = 0
+            while b:
+                if b & 1:
+                    result ^= a
+                a <<= 1
+                if a & 0x100:
+                    a ^= 0x11D
+                b >>= 1
+            return result
+        
+        for a, b in [(0, 7), (1, 200), (2, 128), (83, 202), (255, 255)]:
+            assert _GF_MUL[a, b] == reference(a, b)
+    
+    def test_matrix_inverse(self):
+        """Test that a matrix times its inverse is the identity."""
+        fec = ReedSolomonFEC(4, 2)
+        matrix = fec.matrix[[1, 3, 4, 5]]
+        inverse = _gf_invert_matrix(matrix)
+        
+        product = np.bitwise_xor.reduce(_GF_MUL[inverse[:, :, None], matrix[None, :, :]], axis=1)
+        
+        np.testing.assert_array_equal(product, np.eye(4, dtype=np.uint8))
+
+
+class TestReedSolomonFEC:
+    """Tests for ReedSolomonFEC."""
+    
+    @pytest.mark.parametrize("k,m", [(4, 2), (10, 4), (3, 5)])
+    def test_recovers_every_erasure_pattern(self, k, m):
+        """Test recovery from every combination of up to m lost packets."""
+        fec = ReedSolomonFEC(k, m)
+        packets = [os.urandom(100) for _ in range(k)]
+        encoded = fec.encode(packets)
+        
+        for count in range(m + 1):
+            for lost in itertools.combinations(range(k + m), count):
+                received = [None if i in lost else p for i, p in enumerate(encoded)]
+                
+                assert fec.decode(received, list(lost)) == packets
+    
+    def test_systematic(self):
+        """Test that the data packets are sent unchanged, followed by m parity packets."""
+        fec = ReedSolomonFEC(4, 2)
+        packets = [bytes([i]) * 64 for i in range(4)]
+        
+        encoded = fec.encode(packets)
+        
+        assert encoded[:4] == packets
+        assert [len(p) for p in encoded[4:]] == [64, 64]
+    
+    def test_unequal_packet_lengths(self):
+        """Test that recovered short packets come back zero-padded to the longest."""
+        fec = ReedSolomonFEC(3, 2)
+        packets = [b"short", b"a much longer packet", b"mid-length"]
+        encoded = fec.encode(packets)
+        
+        decoded = fec.decode([None, encoded[1], None, encoded[3], encoded[4]], [0, 2])
+        
+        assert decoded[0] == b"short".ljust(20, b"\x00")
+        assert decoded[1] == packets[1]
+        assert decoded[2] == b"mid-length".ljust(20, b"\x00")
+    
+    def test_too_many_losses(self):
+        """Test that more than m losses raise RuntimeError."""
+        fec = ReedSolomonFEC(4, 2)
+        encoded = fec.encode([bytes(10)] * 4)
+        
+        with pytest.raises(RuntimeError, match="Cannot recover"):
+            fec.decode([None, None, None] + encoded[3:], [0, 1, 2])
+    
+    def test_decode_matrix_cached_per_pattern(self):
+        """Test that a repeated erasure pattern reuses its inverted matrix."""
+        fec = ReedSolomonFEC(5, 3)
+        encoded = fec.encode([os.urandom(32) for _ in range(5)])
+        _decode_matrix.cache_clear()
+        
+        for lost in ([1, 6], [1, 6], [6, 1], [2, 6], [1, 6]):
+            received = [None if i in lost else p for i, p in enumerate(encoded)]
+            fec.decode(received, lost)
+        
+        info = fec.decode_cache_info()
+        assert (info.hits, info.misses) == (3, 2)
+    
+    def test_parity_only_loss_skips_decode(self):
+        """Test that losing only parity packets needs no decode matrix."""
+        fec = ReedSolomonFEC(4, 2)
+        packets = [os.urandom(16) for _ in range(4)]
+        _decode_matrix.cache_clear()
+        
+        assert fec.decode(fec.encode(packets)[:4] + [None, None], [4, 5]) == packets
+        assert fec.decode_cache_info().currsize == 0
+    
+    def test_blocks_match_single_block_calls(self):
+        """Test that batched pool encode/decode match per-block encode/decode."""
+        fec = ReedSolomonFEC(4, 2, workers=2)
+        rng = np.random.default_rng(7)
+        blocks = [
+            [os.urandom(int(n)) for n in rng.integers(1, 64, size=4)]
+            for _ in range(3 * ReedSolomonFEC.BATCH_BLOCKS + 5)
+        ]
+        
+        encoded = fec.encode_blocks(blocks)
+        assert encoded == [fec.encode(block) for block in blocks]
+        
+        patterns = list(itertools.combinations(range(6), 2)) + [(), (5,)]
+        received = [
+            [None if i in patterns[n % len(patterns)] else p for i, p in enumerate(shards)]
+            for n, shards in enumerate(encoded)
+        ]
+        decoded = fec.decode_blocks(received)
+        assert decoded == [fec.decode(packets, []) for packets in received]
+        for block, result in zip(blocks, decoded):
+            assert all(r[:len(p)] == p for p, r in zip(block, result))
+        fec.close()
+    
+    def test_blocks_too_many_losses(self):
+        """Test that decode_blocks raises if any block is unrecoverable."""
+        fec = ReedSolomonFEC(4, 2, workers=1)
+        encoded = fec.encode_blocks([[bytes(8)] * 4] * 2)
+        encoded[1][:3] = [None] * 3
+        
+        with pytest.raises(RuntimeError, match="Cannot recover"):
+            fec.decode_blocks(encoded)
+    
+    def test_invalid_parameters(self):
+        """Test that k/m out of range are rejected."""
+        with pytest.raises(ValueError):
+            ReedSolomonFEC(0, 2)
+        with pytest.raises(ValueError, match="<= 256"):
+            ReedSolomonFEC(200, 57)
+
+
+class TestAdaptiveFEC:
+    """Tests for the loss-model-driven AdaptiveFEC."""
+    
+    @staticmethod
+    def _feed(fec, lost):
+        """Observe sequence numbers 0..len(lost)-1, skipping the lost ones."""
+        for seq, gone in enumerate(lost):
+            if not gone:
+                fec.observe(seq)
+        return fec.adapt()
+    
+    def test_independent_losses_match_binomial(self):
+        """Test the Gilbert model with r = 1 - p against the binomial tail."""
+        failure = _block_failure(0.1, 0.9, 12)
+        
+        for n, m in [(6, 2), (12, 4)]:
+            binomial = 1 - sum(math.comb(n, j) * 0.1 ** j * 0.9 ** (n - j) for j in range(m + 1))
+            assert failure[n, m] == pytest.approx(binomial)
+    
+    def test_clean_link_uses_minimum_overhead(self):
+        """Test that a loss-free window selects the largest k and smallest m."""
+        fec = AdaptiveFEC(min_m=1, max_m=4, k=8)
+        
+        assert self._feed(fec, [False] * 500) == (8, 1)
+        assert fec.recent_loss_rate == 0.0
+    
+    def test_bursts_need_more_parity_than_independent_loss(self):
+        """Test that the same loss rate in bursts selects a more robust code."""
+        independent = [i % 20 == 0 for i in range(1000)]
+        bursty = [i % 100 < 5 for i in range(1000)]
+        
+        spread, burst = AdaptiveFEC(max_m=6, k=8), AdaptiveFEC(max_m=6, k=8)
+        k1, m1 = self._feed(spread, independent)
+        k2, m2 = self._feed(burst, bursty)
+        
+        assert spread.recent_loss_rate == pytest.approx(burst.recent_loss_rate, abs=0.005)
+        assert burst.mean_burst_length == pytest.approx(5.0, abs=0.1)
+        assert m2 / k2 > m1 / k1
+        assert spread.residual_loss(k1, m1) <= spread.target_residual
+    
+    def test_sequence_wrap_and_reordering(self):
+        """Test uint32 wrap-around, and that late packets are not counted."""
+        fec = AdaptiveFEC(update_interval=10_000)
+        for seq in (0xFFFFFFFE, 0xFFFFFFFF, 1, 0, 2, 2):
+            fec.observe(seq)
+        fec.adapt()
+        
+        assert fec.recent_loss_rate == pytest.approx(1 / 4)
+    
+    def test_codecs_are_cached(self):
+        """Test that switching codes reuses ReedSolomonFEC instances."""
+        fec = AdaptiveFEC(max_m=4, k=4)
+        first = fec.fec
+        
+        fec.update_loss_rate(0.2)
+        assert fec.fec is not first
+        fec.update_loss_rate(0.0)
+        assert fec.fec is first
+    
+    @pytest.mark.parametrize("min_m, max_m", [(0, 4), (3, 2)])
+    def test_rejects_invalid_parity_range(self, min_m, max_m):
+        """Test that m ranges ReedSolomonFEC cannot build fail up front."""
+        with pytest.raises(ValueError, match="parity range"):
+            AdaptiveFEC(min_m=min_m, max_m=max_m)
+    
+    def test_codecs_share_one_bounded_pool(self):
+        """Test that every cached code runs on the same pool, shut down by close()."""
+        with AdaptiveFEC(max_m=4, k=4, workers=2) as fec:
+            for loss_rate in (0.0, 0.3):
+                fec.update_loss_rate(loss_rate)
+                fec.encode_blocks([[os.urandom(100) for _ in range(fec.k)] for _ in range(64)])
+            
+            assert len({codec._executor for codec in fec._codecs.values()}) == 1
+            assert self._fec_threads() <= 2
+        
+        assert self._fec_threads() == 0
+    
+    @staticmethod
+    def _fec_threads() -> int:
+        """Live FEC worker threads."""
+        return sum(t.name.startswith('aria-fec') for t in threading.enumerate())
+    
+    def test_decode_with_block_code(self):
+        """Test decoding a block encoded before the code changed."""
+        fec = AdaptiveFEC(max_m=4, k=4)
+        packets = [os.urandom(20) for _ in range(fec.k)]
+        encoded = fec.encode(packets)
+        k = fec.k
+        
+        fec.update_loss_rate(0.3)
+        encoded[0] = None
+        
+        assert fec.decode(encoded, [0], k=k) == packets
+
+
+class TestFecBlockStage:
+    """Tests for the Packetizer -> FEC -> Defragmenter pipeline."""
+    
+    @pytest.fixture
+    def envelope(self):
+        """Envelope large enough for 12 fragments at MTU 400."""
+        return Envelope.create(
+            topic="camera/left", payload=os.urandom(3500), priority=Priority.P2,
+            source_node="rover", sequence_number=7
+        )
+    
+    @staticmethod
+    def _transmit(envelopes, lost):
+        """Send through the wire codec, dropping the given positions."""
+        codec = ProtobufCodec()
+        return [codec.decode(codec.encode(e)) for i, e in enumerate(envelopes) if i not in lost]
+    
+    @staticmethod
+    def _receive(envelopes):
+        """FEC-decode and defragment; returns the reassembled envelopes."""
+        fec_stage, defragmenter = FecBlockDecoder(), Defragmenter()
+        out = []
+        for envelope in envelopes:
+            for fragment in fec_stage.receive(envelope):
+                message = defragmenter.defragment(fragment)
+                if message is not None:
+                    out.append(message)
+        return out, fec_stage
+    
+    def test_attaches_fec_info(self, envelope):
+        """Test block layout: k data envelopes per block, then m parity envelopes."""
+        sent = FecBlockEncoder(k=4, m=2).encode(Packetizer(mtu=400).packetize(envelope))
+        
+        infos = [(e.metadata.fec_info.block_id, e.metadata.fec_info.index) for e in sent[:6]]
+        assert infos == [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (0, 5)]
+        assert len(sent) == 12 + 3 * 2
+        assert all(e.metadata.fragment_info is not None for e in sent[:4])
+    
+    def test_recovers_lost_fragments(self, envelope):
+        """Test that up to m losses per block are recovered before defragmentation."""
+        sent = FecBlockEncoder(k=4, m=2).encode(Packetizer(mtu=400).packetize(envelope))
+        
+        messages, fec_stage = self._receive(self._transmit(sent, lost={0, 3, 7, 13, 14}))
+        
+        assert len(messages) == 1
+        assert messages[0].payload == envelope.payload
+        assert messages[0].metadata.source_node == "rover"
+        assert fec_stage.recovered == 5
+    
+    def test_interleaving_survives_bursts(self, envelope):
+        """Test that a burst of 4 consecutive losses is recovered with interleave=2."""
+        packets = Packetizer(mtu=400).packetize(envelope)
+        plain = FecBlockEncoder(k=4, m=2).encode(packets)
+        interleaved = FecBlockEncoder(k=4, m=2, interleave=2).encode(packets)
+        burst = {2, 3, 4, 5}
+        
+        assert self._receive(self._transmit(plain, burst))[0] == []
+        messages, _ = self._receive(self._transmit(interleaved, burst))
+        assert messages[0].payload == envelope.payload
+    
+    def test_flush_partial_block(self, envelope):
+        """Test that a flushed partial block is protected with its actual size."""
+        encoder = FecBlockEncoder(k=8, m=2)
+        sent = encoder.encode(Packetizer(mtu=1000).packetize(envelope)) + encoder.flush()
+        
+        assert [e.metadata.fec_info.k for e in sent[-2:]] == [4, 4]
+        messages, _ = self._receive(self._transmit(sent, lost={1, 2}))
+        assert messages[0].payload == envelope.payload
+
+    
+    def test_senders_sharing_a_decoder(self, envelope):
+        """Test that equal block IDs from two senders are kept apart."""
+        other = Envelope.create(
+            topic="camera/left", payload=os.urandom(3500), priority=Priority.P2,
+            source_node="lander", sequence_number=7
+        )
+        streams = [
+            self._transmit(
+                FecBlockEncoder(k=4, m=2).encode(Packetizer(mtu=400).packetize(e)), {0, 1}
+            )
+            for e in (envelope, other)
+        ]
+        
+        messages, fec_stage = self._receive([e for pair in zip(*streams) for e in pair])
+        
+        assert sorted(m.payload for m in messages) == sorted((envelope.payload, other.payload))
+        assert fec_stage.recovered == 4
+        assert len(fec_stage._fecs) == 1
+    
+    def test_encoder_restart_reuses_block_ids(self, envelope):
+        """Test that a restarted sender's block 0 is recovered, not taken for the old one."""
+        first = FecBlockEncoder(k=4, m=2).encode(Packetizer(mtu=400).packetize(envelope))
+        restarted = Envelope.create(
+            topic="camera/left", payload=os.urandom(3500), priority=Priority.P2,
+            source_node="rover", sequence_number=8
+        )
+        second = FecBlockEncoder(k=4, m=2).encode(Packetizer(mtu=400).packetize(restarted))
+        
+        messages, fec_stage = self._receive(
+            self._transmit(first, set()) + self._transmit(second, {0, 2})
+        )
+        
+        assert [m.payload for m in messages] == [envelope.payload, restarted.payload]
+        assert fec_stage.recovered == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,310 @@
+"""
+Tests for telemetry packetization module.
+"""
+
+import os
+import random
+import socket
+from dataclasses import replace
+
+import pytest
+
+from aria_sdk.domain.entities import Envelope, Priority
+from aria_sdk.telemetry import packetization
+from aria_sdk.telemetry.codec import ProtobufCodec
+from aria_sdk.telemetry.fec import FecBlockEncoder
+from aria_sdk.telemetry.packetization import Packetizer, Defragmenter
+
+
+@pytest.fixture
+def envelope():
+    """Envelope that splits into 4 fragments at MTU 400 (last one short)."""
+    return Envelope.create(
+        topic="camera/left", payload=os.urandom(1000), priority=Priority.P1,
+        source_node="rover", sequence_number=3
+    )
+
+
+class TestPacketizer:
+    """Tests for Packetizer header accounting."""
+    
+    @pytest.mark.parametrize("version", [1, 2])
+    def test_fragments_fill_mtu(self, envelope, version):
+        """Test that every fragment but the last is exactly one MTU on the wire."""
+        codec = ProtobufCodec(version=version)
+        
+        sizes = [len(codec.encode(f)) for f in Packetizer(mtu=300, codec=codec).packetize(envelope)]
+        
+        assert sizes[:-1] == [300] * (len(sizes) - 1)
+        assert sizes[-1] <= 300
+    
+    def test_interned_strings_fit(self, envelope):
+        """Test that frames fit the MTU when topic/source node are interned."""
+        codec = ProtobufCodec(intern_strings=True)
+        
+        sizes = [len(codec.encode(f)) for f in Packetizer(mtu=300, codec=codec).packetize(envelope)]
+        
+        assert sizes[0] == 300
+        assert max(sizes) <= 300
+    
+    def test_unfragmented_when_frame_fits(self):
+        """Test that an envelope whose whole frame fits is not fragmented."""
+        codec = ProtobufCodec()
+        probe = Envelope.create(topic="t", payload=b"")
+        overhead = codec.frame_overhead(probe)
+        packetizer = Packetizer(mtu=overhead + 200, codec=codec)
+        
+        assert len(packetizer.packetize(Envelope.create(topic="t", payload=bytes(200)))) == 1
+        assert len(packetizer.packetize(Envelope.create(topic="t", payload=bytes(201)))) == 2
+    
+    def test_fec_parity_fits_mtu(self, envelope):
+        """Test that FEC parity frames (the largest datagrams) fill the MTU exactly."""
+        codec, fec = ProtobufCodec(), FecBlockEncoder(k=2, m=1)
+        
+        packetizer = Packetizer(mtu=300, codec=codec, fec=fec)
+        sent = fec.encode(packetizer.packetize(envelope)) + fec.flush()
+        
+        sizes = [len(codec.encode(e)) for e in sent]
+        assert max(sizes) == 300
+        assert sent[2].metadata.fragment_info is None     # parity of the first (full) block
+        assert sizes[2] == 300
+    
+    def test_crypto_overhead(self, envelope):
+        """Test that encrypted datagrams fill the MTU exactly."""
+        crypto_module = pytest.importorskip("aria_sdk.telemetry.crypto")
+        codec, crypto = ProtobufCodec(), crypto_module.CryptoBox()
+        assert crypto.OVERHEAD == 24 + 16 + 64
+        
+        fragments = Packetizer(mtu=400, codec=codec, crypto=crypto).packetize(envelope)
+        
+        assert len(crypto.encrypt(codec.encode(fragments[0]))) == 400
+    
+    def test_crypto_without_overhead_rejected(self):
+        """Test that a crypto box that does not declare its overhead cannot undersize the MTU."""
+        class Box:
+            def encrypt(self, data):
+                return data
+        
+        with pytest.raises(ValueError, match="OVERHEAD"):
+            Packetizer(mtu=400, crypto=Box())
+    
+    def test_set_mtu(self, envelope):
+        """Test runtime MTU changes."""
+        packetizer = Packetizer(mtu=400)
+        before = len(packetizer.packetize(envelope))
+        
+        packetizer.set_mtu(1200)
+        
+        assert len(packetizer.packetize(envelope)) < before
+        with pytest.raises(ValueError, match="too small"):
+            packetizer.set_mtu(32)
+    
+    def test_mtu_below_overhead(self, envelope):
+        """Test that an MTU without room for payload is rejected."""
+        with pytest.raises(ValueError, match="no room for payload"):
+            Packetizer(mtu=64).packetize(envelope)
+
+
+class TestPacketizeFrames:
+    """Tests for the zero-copy Packetizer fast path."""
+    
+    @staticmethod
+    def _strip_ids(frame):
+        """Frame without the fragment envelope ID and message ID."""
+        return frame[:7] + frame[23:-16]
+    
+    def test_matches_packetize(self, envelope):
+        """Test that frames equal codec.encode() of packetize() fragments, IDs aside."""
+        codec = ProtobufCodec()
+        packetizer = Packetizer(mtu=400, codec=codec)
+        
+        frames = packetizer.packetize_frames(envelope)
+        expected = [codec.encode(f) for f in packetizer.packetize(envelope)]
+        
+        assert len(frames) == 4
+        assert [self._strip_ids(b''.join(parts)) for parts in frames] == [
+            self._strip_ids(f) for f in expected
+        ]
+        assert len({bytes(head[7:23]) for head, _, _ in frames}) == 4
+    
+    def test_payload_is_not_copied(self, envelope):
+        """Test that fragment payloads are views of the envelope payload."""
+        frames = Packetizer(mtu=400).packetize_frames(envelope)
+        
+        for _, payload, _ in frames:
+            assert isinstance(payload, memoryview)
+            assert payload.obj is envelope.payload
+    
+    def test_reassembles(self, envelope):
+        """Test decode + Defragmenter on the fast-path frames."""
+        codec, defragmenter = ProtobufCodec(), Defragmenter()
+        
+        results = [
+            defragmenter.defragment(codec.decode(b''.join(parts)))
+            for parts in Packetizer(mtu=400, codec=codec).packetize_frames(envelope)
+        ]
+        
+        assert results[-1].payload == envelope.payload
+        assert results[-1].topic == envelope.topic
+    
+    def test_unfragmented(self, envelope):
+        """Test that a small envelope is a single unfragmented frame."""
+        codec = ProtobufCodec()
+        
+        frames = Packetizer(mtu=1400, codec=codec).packetize_frames(envelope)
+        
+        assert len(frames) == 1
+        assert b''.join(frames[0]) == codec.encode(envelope)
+    
+    def test_refuses_crypto_and_fec(self, envelope):
+        """Test that the fast path never sends plaintext or unprotected frames."""
+        class Box:
+            OVERHEAD = 40
+        
+        packetizers = (
+            Packetizer(mtu=400, crypto=Box()),
+            Packetizer(mtu=400, fec=FecBlockEncoder())
+        )
+        for packetizer in packetizers:
+            with pytest.raises(ValueError, match="crypto or FEC"):
+                packetizer.packetize_frames(envelope)
+            with pytest.raises(ValueError, match="crypto or FEC"):
+                packetizer.send_fragments(None, envelope)
+    
+    @pytest.mark.skipif(not hasattr(socket.socket, 'sendmsg'), reason="sendmsg not available")
+    def test_send_fragments(self, envelope):
+        """Test scatter-gather sending, one datagram per fragment."""
+        tx, rx = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        codec, defragmenter = ProtobufCodec(), Defragmenter()
+        with tx, rx:
+            sent = Packetizer(mtu=400, codec=codec).send_fragments(tx, envelope)
+            datagrams = [rx.recv(2048) for _ in range(4)]
+        
+        assert sent == sum(len(d) for d in datagrams)
+        results = [defragmenter.defragment(codec.decode(d)) for d in datagrams]
+        assert results[-1].payload == envelope.payload
+
+
+class TestDefragmenter:
+    """Tests for Defragmenter."""
+    
+    @pytest.mark.parametrize("order", [[0, 1, 2, 3], [3, 1, 0, 2], [2, 3, 1, 0]])
+    def test_reassembles_any_order(self, envelope, order):
+        """Test reassembly whichever fragment arrives first."""
+        fragments = Packetizer(mtu=400).packetize(envelope)
+        defragmenter = Defragmenter()
+        
+        results = [defragmenter.defragment(fragments[i]) for i in order]
+        
+        assert results[:-1] == [None] * 3
+        message = results[-1]
+        assert message.payload == envelope.payload
+        assert (message.topic, message.priority, message.schema_id) == (
+            envelope.topic, envelope.priority, envelope.schema_id
+        )
+        assert message.metadata.fragment_info is None
+        assert message.metadata.sequence_number == 3
+        assert defragmenter.get_stats()['incomplete_messages'] == 0
+    
+    def test_interleaved_messages(self):
+        """Test many messages in flight with shuffled fragments."""
+        packetizer, defragmenter = Packetizer(mtu=200), Defragmenter()
+        envelopes = [
+            Envelope.create(topic=f"t/{i}", payload=os.urandom(150 + 97 * i)) for i in range(20)
+        ]
+        fragments = [f for e in envelopes for f in packetizer.packetize(e)]
+        random.Random(5).shuffle(fragments)
+        
+        messages = [m for m in map(defragmenter.defragment, fragments) if m is not None]
+        
+        by_topic = {m.topic: m.payload for m in messages}
+        assert by_topic == {e.topic: e.payload for e in envelopes}
+    
+    def test_duplicate_fragment_ignored(self, envelope):
+        """Test that a repeated fragment does not count towards completion."""
+        fragments = Packetizer(mtu=400).packetize(envelope)
+        defragmenter = Defragmenter()
+        
+        for fragment in fragments[:3] + fragments[:3]:
+            assert defragmenter.defragment(fragment) is None
+        assert defragmenter.get_stats() == {'incomplete_messages': 1, 'total_fragments': 3}
+        
+        assert defragmenter.defragment(fragments[3]).payload == envelope.payload
+    
+    def test_timeout(self, envelope, monkeypatch):
+        """Test that incomplete messages are dropped after the timeout."""
+        now = [100.0]
+        monkeypatch.setattr(packetization.time, 'monotonic', lambda: now[0])
+        fragments = Packetizer(mtu=400).packetize(envelope)
+        defragmenter = Defragmenter(timeout=5.0)
+        
+        defragmenter.defragment(fragments[0])
+        now[0] += 6.0
+        defragmenter.defragment(Packetizer(mtu=400).packetize(envelope)[0])
+        
+        assert defragmenter.get_stats()['incomplete_messages'] == 1
+        for fragment in fragments[1:]:
+            assert defragmenter.defragment(fragment) is None
+    
+    def test_capacity_drops_oldest(self, envelope):
+        """Test that the oldest message is dropped when max_messages is reached."""
+        packetizer, defragmenter = Packetizer(mtu=400), Defragmenter(max_messages=2)
+        oldest, middle, newest = (packetizer.packetize(envelope) for _ in range(3))
+        
+        for fragments in (oldest, middle, newest):
+            defragmenter.defragment(fragments[0])
+        
+        assert defragmenter.get_stats()['incomplete_messages'] == 2
+        assert [defragmenter.defragment(f) for f in middle[1:]][-1] is not None
+        assert all(defragmenter.defragment(f) is None for f in oldest[1:])
+    
+    def test_invalid_fragment_id(self, envelope):
+        """Test that a fragment ID outside the message is rejected."""
+        fragment = Packetizer(mtu=400).packetize(envelope)[0]
+        info = replace(fragment.metadata.fragment_info, fragment_id=4)
+        bad = replace(fragment, metadata=replace(fragment.metadata, fragment_info=info))
+        
+        with pytest.raises(ValueError, match="Invalid fragment"):
+            Defragmenter().defragment(bad)
+    
+    @staticmethod
+    def _with_info(fragment, **changes):
+        """Fragment with modified fragment info."""
+        info = replace(fragment.metadata.fragment_info, **changes)
+        return replace(fragment, metadata=replace(fragment.metadata, fragment_info=info))
+    
+    @pytest.mark.parametrize("changes", [
+        dict(total_fragments=2_000_000),
+        dict(total_fragments=100_000, fragment_id=99_999, offset=99_999 * 1300, length=1300),
+    ])
+    def test_oversize_message_not_allocated(self, envelope, changes):
+        """Test that a header announcing a huge message is dropped before allocating."""
+        fragment = Packetizer(mtu=400).packetize(envelope)[0]
+        defragmenter = Defragmenter(max_message_size=1024 * 1024)
+        
+        assert defragmenter.defragment(self._with_info(fragment, **changes)) is None
+        assert defragmenter.get_stats()['incomplete_messages'] == 0
+        assert defragmenter.rejected == 1
+    
+    @pytest.mark.parametrize("changes", [
+        dict(total_fragments=5), dict(offset=1), dict(length=10),
+    ])
+    def test_inconsistent_fragment_rejected(self, envelope, changes):
+        """Test that a fragment disagreeing with the first is dropped, not taken as a duplicate."""
+        fragments = Packetizer(mtu=400).packetize(envelope)
+        defragmenter = Defragmenter()
+        defragmenter.defragment(fragments[0])
+        
+        assert defragmenter.defragment(self._with_info(fragments[1], **changes)) is None
+        assert defragmenter.rejected == 1
+        for fragment in fragments[1:3]:
+            assert defragmenter.defragment(fragment) is None
+        assert defragmenter.defragment(fragments[3]).payload == envelope.payload
+    
+    def test_unfragmented_passthrough(self, envelope):
+        """Test that envelopes without fragment info are returned as-is."""
+        assert Defragmenter().defragment(envelope) is envelope
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,87 @@
+"""
+Tests for the generated-protobuf telemetry codec.
+"""
+
+import pytest
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from aria_sdk.domain.entities import (
+    Envelope, Priority, EnvelopeMetadata, FragmentInfo, FecInfo, CryptoInfo
+)
+from aria_sdk.telemetry.codec import ProtobufCodec
+from aria_sdk.telemetry.proto_codec import ProtoSchemaCodec
+
+
+class TestProtoSchemaCodec:
+    """Test suite for ProtoSchemaCodec."""
+    
+    @pytest.fixture
+    def codec(self):
+        """Create a codec instance."""
+        return ProtoSchemaCodec()
+    
+    @pytest.fixture
+    def sample_envelope(self):
+        """Create a sample envelope for testing."""
+        return Envelope(
+            id=uuid4(),
+            timestamp=datetime.now(timezone.utc),
+            schema_id=7,
+            priority=Priority.P1,
+            topic="mars/perseverance/meda/pressure",
+            payload=b"\x44\x36\x80\x00",
+            metadata=EnvelopeMetadata(
+                source_node="perseverance_rover",
+                sequence_number=42
+            )
+        )
+    
+    def test_encode_decode_roundtrip(self, codec, sample_envelope):
+        """Test that encoding and decoding preserves data."""
+        decoded = codec.decode(codec.encode(sample_envelope))
+        
+        assert decoded == sample_envelope
+    
+    def test_roundtrip_full_metadata(self, codec, sample_envelope):
+        """Test that fragment, FEC and crypto metadata survive the wire."""
+        sample_envelope.metadata.fragment_info = FragmentInfo(
+            fragment_id=2, total_fragments=5, offset=2600, length=1300, message_id=uuid4()
+        )
+        sample_envelope.metadata.fec_info = FecInfo(k=4, m=2, block_id=17)
+        sample_envelope.metadata.crypto_info = CryptoInfo(
+            signature=b"s" * 64, key_id="rover-key-1", nonce=b"n" * 24
+        )
+        sample_envelope.metadata.qos_class = "science"
+        sample_envelope.metadata.is_delta = True
+        
+        decoded = codec.decode(codec.encode(sample_envelope))
+        
+        assert decoded.metadata == sample_envelope.metadata
+    
+    def test_naive_timestamp_roundtrip(self, codec):
+        """Test that naive timestamps come back naive and unchanged."""
+        envelope = Envelope.create(topic="test/naive", payload=b"data")
+        
+        decoded = codec.decode(codec.encode(envelope))
+        
+        assert decoded.timestamp == envelope.timestamp
+        assert decoded.timestamp.tzinfo is None
+    
+    def test_frames_not_interchangeable(self, codec, sample_envelope):
+        """Test that each codec rejects the other's frames."""
+        with pytest.raises(ValueError, match="Unsupported version"):
+            ProtobufCodec().decode(codec.encode(sample_envelope))
+        with pytest.raises(ValueError, match="Unsupported version"):
+            codec.decode(ProtobufCodec().encode(sample_envelope))
+    
+    def test_decode_truncated_data(self, codec, sample_envelope):
+        """Test that decoding handles truncated data gracefully."""
+        encoded = codec.encode(sample_envelope)
+        
+        with pytest.raises(ValueError, match="Truncated frame"):
+            codec.decode(encoded[:-1])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])